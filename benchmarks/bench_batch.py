@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Batch geocoding: `GeoPIP.search` per point vs. `GeoPIP.search_batch`.
+
+python benchmarks/bench_batch.py [--backend pure] [--points 20000] [--features 20000]
+
+Measured for the default data (with a raster, including the `columns` of the
+results) and for an index of many small squares (without raster) with batches
+of different sizes.
+"""
+
+import argparse
+import math
+
+from common import backends, best_of, random_points
+
+from geopip import GeoPIP
+
+
+def _squares(count):
+    """`count` small squares in a grid around (0, 0)."""
+    side = math.ceil(math.sqrt(count))
+    features = []
+    for idx in range(count):
+        x, y = idx % side * 0.01, idx // side * 0.01
+        ring = [[x, y], [x + 0.008, y], [x + 0.008, y + 0.008], [x, y + 0.008], [x, y]]
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {"idx": idx},
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}, side * 0.01
+
+
+def _compare(name, geo, points, key):
+    """`search` vs. `search_batch` with the property `key` (`None`: the row)."""
+    lngs = [lng for lng, _lat in points]
+    lats = [lat for _lng, lat in points]
+
+    def per_point():
+        found = [geo.search(lng, lat) for lng, lat in points]
+        if key is None:
+            return [-1 if props is None else props["idx"] for props in found]
+        return [None if props is None else dict(props).get(key) for props in found]
+
+    def batch():
+        if key is None:
+            return list(geo.search_batch(lngs, lats))
+        return geo.columns(geo.search_batch(lngs, lats), [key])[key]
+
+    assert per_point() == batch()
+    base, elapsed = best_of(per_point), best_of(batch)
+    print(
+        "{:28} search {:10.0f} points/s  search_batch {:10.0f} points/s  (x{:.2f})".format(
+            name, len(points) / base, len(points) / elapsed, base / elapsed
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=20000)
+    args = parser.parse_args()
+
+    points = random_points(args.points)
+    squares, size = _squares(args.features)
+    for backend in args.backend or backends():
+        geo = GeoPIP(backend=backend)
+        geo.rasterize(0.1)  # the lookup itself is cheap, the results are not
+        _compare("{} default data".format(backend), geo, points, "ISO2")
+
+        geo = GeoPIP(geojson_dict=squares, backend=backend)
+        for count in sorted({1, 100, 1000, args.points}):
+            _compare(
+                "{} {} squares, {} points".format(backend, args.features, count),
+                geo,
+                random_points(count, bbox=(0, 0, size, size)),
+                None,  # the row is the property `idx`
+            )
+
+
+if __name__ == "__main__":
+    main()
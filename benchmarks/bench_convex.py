@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Point in polygon test of convex polygons: winding number vs. wedge search.
+
+python benchmarks/bench_convex.py [--points 20000]
+
+The pure backend tests convex polygons (without holes) by a binary search over
+the wedges from the first vertex in O(log n) instead of the O(n) winding number.
+"""
+
+import argparse
+import math
+
+from common import best_of, random_points
+
+from geopip._pure import p_in_polygon, prepare
+
+
+def _circle(n):
+    ring = [
+        (math.cos(2 * math.pi * i / n), math.sin(2 * math.pi * i / n)) for i in range(n)
+    ]
+    geometry = {"type": "Polygon", "coordinates": [[*ring, ring[0]]]}
+    return prepare({"type": "Feature", "geometry": geometry, "properties": {}})[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=20000)
+    args = parser.parse_args()
+
+    points = random_points(args.points, bbox=(-1, -1, 1, 1))
+    for n in [4, 8, 16, 64, 256, 1024]:
+        convex = _circle(n)
+        winding = dict(convex, convex=None)
+
+        def test(shp):
+            return [p_in_polygon(p, shp) for p in points]
+
+        assert test(winding) == test(convex)
+        base = best_of(lambda winding=winding: test(winding))
+        elapsed = best_of(lambda convex=convex: test(convex))
+        print(
+            "{:5} vertices  winding {:10.0f} tests/s  convex {:10.0f} tests/s  (x{:.2f}){}".format(
+                n,
+                len(points) / base,
+                len(points) / elapsed,
+                base / elapsed,
+                "" if convex["convex"] else "  (not used)",
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Single searches with the buckets ordered by area vs. by hit counts.
+
+python benchmarks/bench_hits.py [--points 20000] [--backend pure]
+
+The hits of the workload are counted with `GeoPIP.count_hits` and the index
+is reordered (see `GeoPIP.reorder`), then the same points are searched again.
+The results are the same, only the number of tested shapes differs.
+"""
+
+import argparse
+import time
+
+from common import backends, best_of, random_points
+
+from geopip import GeoPIP
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--points", type=int, default=20000)
+    args = parser.parse_args()
+
+    for backend in args.backend or backends():
+        for name, bbox in [
+            ("world", (-180, -60, 180, 75)),
+            ("europe", (-10, 35, 30, 60)),
+            ("caribbean", (-90, 10, -60, 27)),
+        ]:
+            points = random_points(args.points, bbox=bbox)
+            geo = GeoPIP(backend=backend, lazy=False)
+
+            def run(geo=geo, points=points):
+                return [geo.search(lng, lat) for lng, lat in points]
+
+            expected = run()
+            base = best_of(run)
+            geo.count_hits()
+            run()
+            geo.count_hits(False)
+            start = time.perf_counter()
+            geo.reorder()
+            reorder = time.perf_counter() - start
+            assert expected == run()
+            elapsed = best_of(run)
+            print(
+                "{:8} {:10} by area {:10.0f} points/s  by hits {:10.0f} points/s  (x{:.2f}, reorder {:.3f}s)".format(
+                    backend,
+                    name,
+                    len(points) / base,
+                    len(points) / elapsed,
+                    base / elapsed,
+                    reorder,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
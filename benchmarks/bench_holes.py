@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Point in polygon test of polygons with many holes / MultiPolygons with many parts.
+
+python benchmarks/bench_holes.py [--points 20000] [--backend pure]
+
+The pure backend only tests the holes in the grid cell of the point, the
+shapely backend only the parts of huge MultiPolygons, whose bounding box
+contains the point (STRtree). Both are compared with testing all rings.
+"""
+
+import argparse
+import math
+
+from common import backends, best_of, random_points
+
+from geopip import _pure
+
+
+def _rings(count, vertices):
+    """`count` small regular polygons in a square grid."""
+    side = math.ceil(math.sqrt(count))
+    regular = [
+        (
+            0.4 * math.cos(2 * math.pi * i / vertices),
+            0.4 * math.sin(2 * math.pi * i / vertices),
+        )
+        for i in range(vertices)
+    ]
+    rings = [
+        [(x + 0.5 + dx, y + 0.5 + dy) for dx, dy in regular]
+        for x in range(side)
+        for y in range(side)
+    ][:count]
+    return [[*ring, ring[0]] for ring in rings], side
+
+
+def _pure_shapes(count):
+    rings, side = _rings(count, 8)
+    outer = [(0, 0), (side, 0), (side, side), (0, side), (0, 0)]
+    geometry = {"type": "Polygon", "coordinates": [outer, *rings]}
+    feature = {"type": "Feature", "geometry": geometry, "properties": {}}
+    indexed = _pure.prepare(feature)[0]
+    return _pure, dict(indexed, holes=None), indexed, side
+
+
+def _shapely_shapes(count):
+    from geopip import _shapely  # noqa: PLC0415
+
+    rings, side = _rings(count, 64)
+    geometry = {"type": "MultiPolygon", "coordinates": [[ring] for ring in rings]}
+    feature = {"type": "Feature", "geometry": geometry, "properties": {}}
+    limits = _shapely._INDEXED_PARTS, _shapely._INDEXED_COORDINATES
+    _shapely._INDEXED_PARTS, _shapely._INDEXED_COORDINATES = 1, 1
+    try:
+        indexed = _shapely.prepare(feature)[0]
+    finally:
+        _shapely._INDEXED_PARTS, _shapely._INDEXED_COORDINATES = limits
+    return _shapely, dict(indexed, parts=None), indexed, side
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--points", type=int, default=20000)
+    args = parser.parse_args()
+
+    for backend in args.backend or backends():
+        if backend == "pure":
+            shapes, counts = _pure_shapes, [16, 256, 2048]
+        else:
+            shapes, counts = _shapely_shapes, [1024, 8192, 32768]
+        for count in counts:
+            module, plain, indexed, side = shapes(count)
+            points = random_points(args.points, bbox=(0, 0, side, side))
+
+            def test(shp, points=points, module=module):
+                return [module.p_in_polygon(p, shp) for p in points]
+
+            assert test(plain) == test(indexed)
+            base = best_of(lambda plain=plain, test=test: test(plain))
+            elapsed = best_of(lambda indexed=indexed, test=test: test(indexed))
+            print(
+                "{:8} {:6} rings  all {:10.0f} tests/s  indexed {:10.0f} tests/s  (x{:.2f})".format(
+                    backend,
+                    count,
+                    len(points) / base,
+                    len(points) / elapsed,
+                    base / elapsed,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
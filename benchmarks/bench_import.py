@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Startup time: `import geopip` and the first `geopip.instance()`.
+
+    python benchmarks/bench_import.py [--repeat 5]
+
+Every measurement runs in a fresh interpreter. The packaged default data is
+loaded from the prebuilt binary file (`globe.geo.bin`); the geojson variant
+shows the cost of parsing and preparing `globe.geo.json` instead.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from common import backends
+
+import geopip
+
+_GEOJSON = os.path.join(os.path.dirname(geopip.__file__), "globe.geo.json")
+
+CASES = [
+    ("import geopip", "import geopip"),
+    ("geopip.instance()", "import geopip; geopip.instance()"),
+    (
+        "GeoPIP(backend={backend!r})",
+        "from geopip import GeoPIP; GeoPIP(backend={backend!r})",
+    ),
+    (
+        "GeoPIP(filename=globe.geo.json, backend={backend!r})",
+        "from geopip import GeoPIP; GeoPIP(filename={geojson!r}, backend={backend!r})",
+    ),
+]
+
+
+def measure(code, repeat):
+    timer = (
+        "import time; _t = time.perf_counter(); {}; "
+        "print(time.perf_counter() - _t)".format(code)
+    )
+    return min(
+        float(subprocess.check_output([sys.executable, "-c", timer]))
+        for _i in range(repeat)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    done = set()
+    for backend in backends():
+        for title, code in CASES:
+            name = title.format(backend=backend)
+            if name in done:
+                continue
+            done.add(name)
+            elapsed = measure(
+                code.format(backend=backend, geojson=_GEOJSON), args.repeat
+            )
+            print("{:60} {:8.1f} ms".format(name, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Batch geocoding: points in random order vs. in geohash (Hilbert curve) order.
+
+python benchmarks/bench_order.py [--points 20000] [--rasterize 0.1]
+
+Only the points, that are not decided by the raster, are searched one by one
+(the vectorized shapely search does not depend on the order), hence the pure
+backend is measured.
+"""
+
+import argparse
+
+from common import best_of, random_points
+
+from geopip import GeoPIP
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--rasterize", type=float, default=None)
+    args = parser.parse_args()
+
+    for name, bbox in [
+        ("world", (-180, -60, 180, 75)),
+        ("europe", (-10, 35, 30, 60)),
+    ]:
+        points = random_points(args.points, bbox=bbox)
+        lngs = [lng for lng, _lat in points]
+        lats = [lat for _lng, lat in points]
+        geo = GeoPIP(backend="pure", lazy=False)
+        if args.rasterize:
+            geo.rasterize(args.rasterize)
+
+        def random_order(geo=geo, lngs=lngs, lats=lats):
+            return list(geo.search_batch(lngs, lats, ordered=False))
+
+        def hilbert_order(geo=geo, lngs=lngs, lats=lats):
+            return list(geo.search_batch(lngs, lats))
+
+        assert random_order() == hilbert_order()
+        base, elapsed = best_of(random_order), best_of(hilbert_order)
+        print(
+            "{:8} random {:10.0f} points/s  hilbert {:10.0f} points/s  (x{:.2f})".format(
+                name, len(points) / base, len(points) / elapsed, base / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
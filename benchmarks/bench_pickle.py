@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Pickle size and time of `GeoPIP` instances vs. nested geojson lists.
+
+python benchmarks/bench_pickle.py [--backend pure]
+"""
+
+import argparse
+import importlib.resources
+import json
+import pickle
+
+from common import backends, best_of
+
+from geopip import GeoPIP
+
+
+def _row(name, data, dump, load):
+    print(
+        "  {:24} {:10,d} bytes  dumps {:8.1f} ms  loads {:8.1f} ms".format(
+            name, len(data), 1000 * dump, 1000 * load
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    args = parser.parse_args()
+
+    features = json.loads(
+        importlib.resources.files("geopip").joinpath("globe.geo.json").read_bytes()
+    )["features"]
+    data = pickle.dumps(features)
+    print("geojson features")
+    _row(
+        "nested lists",
+        data,
+        best_of(lambda: pickle.dumps(features)),
+        best_of(lambda: pickle.loads(data)),
+    )
+
+    for backend in args.backend or backends():
+        print(backend)
+        geo = GeoPIP(
+            geojson_dict={"type": "FeatureCollection", "features": features},
+            backend=backend,
+        )
+        data = pickle.dumps(geo)
+        _row(
+            "flat binary format (new)",
+            data,
+            best_of(lambda geo=geo: pickle.dumps(geo)),
+            best_of(lambda data=data: pickle.loads(data)),
+        )
+
+        geo = GeoPIP(backend=backend)  # loaded from the binary format
+        data = pickle.dumps(geo)
+        _row(
+            "flat binary format",
+            data,
+            best_of(lambda geo=geo: pickle.dumps(geo)),
+            best_of(lambda data=data: pickle.loads(data)),
+        )
+
+        geo.to_shared_memory()
+        data = pickle.dumps(geo)
+        _row(
+            "shared memory name",
+            data,
+            best_of(lambda geo=geo: pickle.dumps(geo)),
+            best_of(lambda data=data: pickle.loads(data)),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Searches with and without the raster of `GeoPIP.rasterize`.
+
+python benchmarks/bench_raster.py [--backend pure] [--resolution 0.1]
+"""
+
+import argparse
+import time
+
+from common import backends, best_of, random_points
+
+from geopip import GeoPIP
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--resolution", type=float, nargs="+", default=[1, 0.1])
+    parser.add_argument("--points", type=int, default=20000)
+    args = parser.parse_args()
+
+    points = random_points(args.points)
+    for backend in args.backend or backends():
+        geo = GeoPIP(backend=backend)
+
+        def run(geo=geo):
+            search = geo.search
+            for lng, lat in points:
+                search(lng, lat)
+
+        run()  # prepare all touched shapes
+        print(
+            "{:8} exact           {:10.0f} queries/s".format(
+                backend, len(points) / best_of(run)
+            )
+        )
+        for resolution in args.resolution:
+            start = time.perf_counter()
+            counts = geo.rasterize(resolution)
+            build = time.perf_counter() - start
+            ambiguous = counts["ambiguous"] / sum(counts.values())
+            print(
+                "{:8} raster {:<8} {:10.0f} queries/s  (build {:.2f}s, {:.1%} ambiguous)".format(
+                    backend, resolution, len(points) / best_of(run), build, ambiguous
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
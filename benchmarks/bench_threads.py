@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Throughput of concurrent `GeoPIP.search` calls from several threads.
+
+    python benchmarks/bench_threads.py [--backend pure] [--threads 1 2 4 8]
+
+Searches are lock-free readers of the index. With the GIL the throughput stays
+roughly constant with more threads; on free-threaded builds (e.g. CPython 3.13t)
+it should scale with the number of cores.
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from common import backends, best_of, random_points
+
+from geopip import GeoPIP
+
+
+def run(geo, points, threads):
+    chunks = [points[i::threads] for i in range(threads)]
+
+    def work(chunk):
+        search = geo.search
+        for lng, lat in chunk:
+            search(lng, lat)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return best_of(lambda: list(pool.map(work, chunks)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--points", type=int, default=20000)
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("python {} (GIL {})".format(sys.version.split()[0], "on" if gil else "off"))
+
+    points = random_points(args.points)
+    for backend in args.backend or backends():
+        geo = GeoPIP(backend=backend)
+        base = None
+        for threads in args.threads:
+            elapsed = run(geo, points, threads)
+            qps = len(points) / elapsed
+            base = base or qps
+            print(
+                "{:8} threads={:3} {:10.0f} queries/s  (x{:.2f})".format(
+                    backend, threads, qps, qps / base
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
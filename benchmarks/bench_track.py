@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Reverse geocoding of GPS tracks: `GeoPIP.search_track` vs. `GeoPIP.search`.
+
+    python benchmarks/bench_track.py [--backend pure] [--step 0.01]
+
+The tracks are random walks with `--step` degrees between consecutive points.
+"""
+
+import argparse
+import random
+
+from common import backends, best_of, random_points
+
+from geopip import GeoPIP
+
+
+def random_tracks(n, length, step, seed=42):
+    """`n` random walks of `length` points starting on the continents."""
+    rnd = random.Random(seed)
+    tracks = []
+    for start in random_points(n, seed=seed, bbox=(-10, 35, 30, 60)):
+        lng, lat = start
+        track = []
+        for _i in range(length):
+            lng = min(max(lng + rnd.uniform(-step, step), -180), 180)
+            lat = min(max(lat + rnd.uniform(-step, step), -90), 90)
+            track.append((lng, lat))
+        tracks.append(track)
+    return tracks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument("--length", type=int, default=1000)
+    parser.add_argument("--step", type=float, default=0.01)
+    args = parser.parse_args()
+
+    tracks = random_tracks(args.tracks, args.length, args.step)
+    n = args.tracks * args.length
+    for backend in args.backend or backends():
+        geo = GeoPIP(backend=backend)
+
+        def per_point(geo=geo):
+            for track in tracks:
+                [geo.search(lng, lat) for lng, lat in track]
+
+        def per_track(geo=geo):
+            for track in tracks:
+                geo.search_track(track)
+
+        per_point()  # prepare all touched shapes
+        base = best_of(per_point)
+        elapsed = best_of(per_track)
+        print(
+            "{:8} search {:10.0f} points/s  search_track {:10.0f} points/s  (x{:.2f})".format(
+                backend, n / base, n / elapsed, base / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
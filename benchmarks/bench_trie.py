@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Searches with and without the trie of `GeoPIP.build_trie`.
+
+python benchmarks/bench_trie.py [--backend pure] [--depth 3 4 5] [--clip]
+
+With `--clip`, the shapes of mixed leaves are clipped to the leaves.
+"""
+
+import argparse
+import time
+
+from common import backends, best_of, random_points
+
+from geopip import GeoPIP
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["pure", "shapely"], action="append")
+    parser.add_argument("--depth", type=int, nargs="+", default=[3, 4, 5])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--clip", action="store_true")
+    args = parser.parse_args()
+
+    points = random_points(args.points)
+    for backend in args.backend or backends():
+        geo = GeoPIP(backend=backend)
+
+        def run(geo=geo):
+            search = geo.search
+            for lng, lat in points:
+                search(lng, lat)
+
+        run()  # prepare all touched shapes
+        qps = len(points) / best_of(run)
+        print("{:8} exact    {:10.0f} queries/s".format(backend, qps))
+        for depth in args.depth:
+            start = time.perf_counter()
+            counts = geo.build_trie(depth, clip=args.clip)
+            build = time.perf_counter() - start
+            print(
+                "{:8} depth {:<2} {:10.0f} queries/s  (build {:.2f}s, {nodes} nodes, {mixed} mixed leaves, {edges} edges)".format(
+                    backend, depth, len(points) / best_of(run), build, **counts
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
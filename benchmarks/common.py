@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Helpers shared by the benchmark scripts in this directory."""
+
+import random
+import time
+
+from geopip._geopip import SHAPELY_AVAILABLE
+
+
+def random_points(n, seed=42, bbox=(-180, -60, 180, 75)):
+    """`n` reproducible random (lng, lat) points within `bbox`."""
+    rnd = random.Random(seed)
+    minlng, minlat, maxlng, maxlat = bbox
+    return [
+        (rnd.uniform(minlng, maxlng), rnd.uniform(minlat, maxlat)) for _i in range(n)
+    ]
+
+
+def best_of(fkt, repeat=3):
+    """Minimal wall time in seconds of `repeat` calls of `fkt`."""
+    best = float("inf")
+    for _i in range(repeat):
+        start = time.perf_counter()
+        fkt()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def backends():
+    """Available backends."""
+    return ["pure", "shapely"] if SHAPELY_AVAILABLE else ["pure"]
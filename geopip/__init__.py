@@ -22,51 +22,87 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
-from ._geopip import GeoPIP
-
-__all__ = ["GeoPIP", "instance", "search", "search_all"]
+import threading
+
+__all__ = [
+    "FeatureRow",
+    "GeoPIP",
+    "instance",
+    "search",
+    "search_all",
+    "search_all_batch",
+    "search_batch",
+]
 
 _INSTANCE = None
+_INSTANCE_LOCK = threading.Lock()
+
+
+def __getattr__(name):
+    # import the implementation (and shapely) only when it is used
+    if name == "GeoPIP":
+        from ._geopip import GeoPIP  # noqa: PLC0415
+
+        return GeoPIP
+    if name == "FeatureRow":
+        from ._geopip import FeatureRow  # noqa: PLC0415
+
+        return FeatureRow
+    if name == "enrich":  # requires numpy
+        from .pandas import enrich  # noqa: PLC0415
+
+        return enrich
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
 
 def instance():
     """Singleton GeoPIP instance (lazy loading)
 
-    Is used in the `search_all` and `search` functions.
+    Is used in the `search_all` and `search` functions. Thread-safe: concurrent
+    first calls build exactly one instance, all others wait for it.
     """
     global _INSTANCE  # noqa: PLW0603
-    if _INSTANCE is not None:
-        return _INSTANCE
+    inst = _INSTANCE
+    if inst is not None:
+        return inst
 
-    _INSTANCE = GeoPIP()
+    with _INSTANCE_LOCK:
+        if _INSTANCE is None:
+            from ._geopip import GeoPIP  # noqa: PLC0415
 
-    return _INSTANCE
+            _INSTANCE = GeoPIP()
+        return _INSTANCE
 
 
-def search_all(lng, lat):
+def search_all(lng, lat, limit=None):
     """Reverse geocode lng/lat coordinate within the features from `instance().shapes`.
 
     Look within the features from the `instance().shapes` function for all polygon that
     contains the point (lng, lat). From all found feature the `properties`
-    will be returned (more or less sorted from smallest to largest feature).
+    will be returned (sorted from smallest to largest feature, see `GeoPIP.search_all`).
     `None`, if no feature contains the point.
 
     Parameters:
         lng: float  Longitude (-180, 180) of point. (WGS84)
         lat: float  Latitude (-90, 90) of point. (WGS84)
+        limit: int  Stop looking after `limit` found features (default: all).
 
     Returns:
         Iterator[Dict[Any, Any]]  Iterator for `properties` of found features.
     """
-    return instance().search_all(lng, lat)
+    return instance().search_all(lng, lat, limit=limit)
 
 
 def search(lng, lat):
     """Reverse geocode lng/lat coordinate within the features from `instance().shapes`.
 
     Look within the features from the `instance().shapes` function for a polygon that
-    contains the point (lng, lat). From the first found feature the `properties`
-    will be returned. `None`, if no feature contains the point.
+    contains the point (lng, lat). From the first (i.e. smallest) found feature
+    the `properties` will be returned. `None`, if no feature contains the point.
 
     Parameters:
         lng: float  Longitude (-180, 180) of point. (WGS84)
@@ -76,3 +112,34 @@ def search(lng, lat):
         Dict[Any, Any]  `Properties` of found feature. `None` if nothing is found.
     """
     return instance().search(lng, lat)
+
+
+def search_batch(lngs, lats):
+    """Reverse geocode many lng/lat coordinates within the features from `instance().shapes`.
+
+    See `GeoPIP.search_batch`.
+
+    Parameters:
+        lngs: Sequence[float]  Longitudes (-180, 180) of the points. (WGS84)
+        lats: Sequence[float]  Latitudes (-90, 90) of the points. (WGS84)
+
+    Returns:
+        numpy.ndarray  Feature index (row of `instance().properties`) for every
+                       point, -1 if nothing is found.
+    """
+    return instance().search_batch(lngs, lats)
+
+
+def search_all_batch(lngs, lats):
+    """Find all features containing the points for many lng/lat coordinates.
+
+    See `GeoPIP.search_all_batch`.
+
+    Parameters:
+        lngs: Sequence[float]  Longitudes (-180, 180) of the points. (WGS84)
+        lats: Sequence[float]  Latitudes (-90, 90) of the points. (WGS84)
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray]  CSR `offsets` and feature `indices`.
+    """
+    return instance().search_all_batch(lngs, lats)
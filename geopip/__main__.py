@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Command line interface: `python -m geopip <command> ...`
+import argparse
+import csv
+import json
+import sys
+
+
+def _pack(args):
+    from ._properties import PropertyTable  # noqa: PLC0415
+    from ._store import dumps  # noqa: PLC0415
+
+    with open(args.geojson, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("type") != "FeatureCollection":
+        raise ValueError("Only `FeatureCollections` are allowed as input!")
+
+    features = data["features"]
+    if args.properties:
+        table = PropertyTable(args.properties)
+        features = [
+            dict(feat, properties=dict(table.row(table.append(feat.get("properties")))))
+            for feat in features
+        ]
+
+    with open(args.output, "wb") as f:
+        f.write(dumps(features))
+
+
+def _serve(args):
+    from ._geopip import GeoPIP  # noqa: PLC0415
+    from .server import serve  # noqa: PLC0415
+
+    geo = GeoPIP(filename=args.file, properties=args.properties, backend=args.backend)
+    if args.rasterize:
+        geo.rasterize(args.rasterize)
+    serve(
+        geo,
+        host=args.host,
+        port=args.port,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay,
+    )
+
+
+def _memory(args):
+    from ._geopip import GeoPIP  # noqa: PLC0415
+    from ._memory import human  # noqa: PLC0415
+
+    geo = GeoPIP(
+        filename=args.file,
+        properties=args.properties,
+        backend=args.backend,
+        lazy=args.lazy,
+    )
+    if args.rasterize:
+        geo.rasterize(args.rasterize)
+    if args.trie is not None:
+        geo.build_trie(args.trie)
+
+    usage = geo.memory_usage()
+    if args.json:
+        sys.stdout.write(json.dumps(usage) + "\n")
+        return
+    sys.stdout.write("{}\n".format(geo))
+    for part, size in usage.items():
+        sys.stdout.write("{:12} {:>10}  ({} bytes)\n".format(part, human(size), size))
+
+
+_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def _size(value):
+    """Parse a size in bytes with an optional K, M or G suffix."""
+    unit = _UNITS.get(value[-1:].upper())
+    if unit is None:
+        return int(value)
+    return int(float(value[:-1]) * unit)
+
+
+def _sample(filename):
+    """Longitudes and latitudes of a csv file with `lng,lat` rows."""
+    lngs, lats = [], []
+    with open(filename, "r", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            try:
+                lng, lat = float(row[0]), float(row[1])
+            except (IndexError, ValueError):
+                continue  # header or empty line
+            lngs.append(lng)
+            lats.append(lat)
+    return lngs, lats
+
+
+def _tune(args):
+    from ._geopip import GeoPIP  # noqa: PLC0415
+    from ._memory import human  # noqa: PLC0415
+
+    geo = GeoPIP(filename=args.file, properties=args.properties)
+    lngs, lats = _sample(args.sample)
+    config, results = geo.tune(
+        lngs,
+        lats,
+        memory_budget=args.memory_budget,
+        backends=args.backend,
+        batch=args.batch,
+    )
+    geo.save(args.output, config=config)
+
+    if args.json:
+        sys.stdout.write(json.dumps({"config": config, "results": results}) + "\n")
+        return
+    for result in results:
+        sys.stdout.write(
+            "{:>12.0f} points/s {:>10}  {}{}\n".format(
+                result["points_per_second"],
+                human(result["memory"]),
+                json.dumps(result["config"], sort_keys=True),
+                "  *" if result["config"] == config else "",
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="geopip", description="Geojson Point in Polygon (PIP)"
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    pack = commands.add_parser(
+        "pack",
+        help="convert a geojson FeatureCollection into the indexed binary format",
+    )
+    pack.add_argument("geojson", help="path to the geojson FeatureCollection")
+    pack.add_argument("output", help="path of the binary file")
+    pack.add_argument(
+        "--properties", nargs="+", help="keep only these keys of the properties"
+    )
+    pack.set_defaults(fkt=_pack)
+
+    serve = commands.add_parser(
+        "serve", help="serve lookups over HTTP (see `geopip.server`)"
+    )
+    serve.add_argument(
+        "file", nargs="?", help="geojson or binary file (default: packaged data)"
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    serve.add_argument("--port", type=int, default=8080, help="port to listen on")
+    serve.add_argument(
+        "--properties", nargs="+", help="keep only these keys of the properties"
+    )
+    serve.add_argument("--backend", choices=["pure", "shapely"])
+    serve.add_argument(
+        "--rasterize", type=float, help="resolution of the raster lookup grid"
+    )
+    serve.add_argument(
+        "--max-batch", type=int, default=1024, help="maximal points per lookup"
+    )
+    serve.add_argument(
+        "--max-delay",
+        type=float,
+        default=0.001,
+        help="maximal seconds a search waits for concurrent ones",
+    )
+    serve.set_defaults(fkt=_serve)
+
+    memory = commands.add_parser(
+        "memory", help="print the memory usage of the index by part"
+    )
+    memory.add_argument(
+        "file", nargs="?", help="geojson or binary file (default: packaged data)"
+    )
+    memory.add_argument(
+        "--properties", nargs="+", help="keep only these keys of the properties"
+    )
+    memory.add_argument("--backend", choices=["pure", "shapely"])
+    memory.add_argument(
+        "--lazy",
+        action="store_const",
+        const=True,
+        help="prepare the shapes on first use (default for binary files)",
+    )
+    memory.add_argument(
+        "--eager",
+        dest="lazy",
+        action="store_const",
+        const=False,
+        help="prepare all shapes (default for geojson files)",
+    )
+    memory.add_argument(
+        "--rasterize", type=float, help="resolution of the raster lookup grid"
+    )
+    memory.add_argument("--trie", type=int, help="maximal depth of the trie")
+    memory.add_argument("--json", action="store_true", help="print as json")
+    memory.set_defaults(fkt=_memory)
+
+    tune = commands.add_parser(
+        "tune",
+        help="find the fastest configuration for a sample of points and save it",
+    )
+    tune.add_argument("file", help="geojson or binary file")
+    tune.add_argument("output", help="path of the binary file with the configuration")
+    tune.add_argument(
+        "--sample", required=True, help="csv file with `lng,lat` rows to search"
+    )
+    tune.add_argument(
+        "--memory-budget",
+        type=_size,
+        help="maximal memory usage in bytes (suffixes K, M and G allowed)",
+    )
+    tune.add_argument(
+        "--backend",
+        choices=["pure", "shapely"],
+        action="append",
+        help="backends to try (default: all available)",
+    )
+    tune.add_argument(
+        "--properties", nargs="+", help="keep only these keys of the properties"
+    )
+    tune.add_argument(
+        "--batch", action="store_true", help="measure batch instead of single searches"
+    )
+    tune.add_argument("--json", action="store_true", help="print as json")
+    tune.set_defaults(fkt=_tune)
+
+    args = parser.parse_args(argv)
+    args.fkt(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
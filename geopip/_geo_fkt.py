@@ -22,9 +22,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
-from os.path import commonprefix
-
-from geohash_hilbert import encode
+import math
 
 
 def bbox(shp):
@@ -77,27 +75,42 @@ def in_bbox(p, bbox):
     return minlng <= lng <= maxlng and minlat <= lat <= maxlat
 
 
-def bbox_hash(bbox):
-    """Get geohash from rectangle covering the complete bbox.
+def area(polygon):
+    """Compute the (planar) area of the polygon in square degrees.
+
+    The area is only used for ordering shapes, hence the planar approximation
+    in lng/lat space suffices.
 
     Parameters:
-        bbox: Tuple[float, float, float, float]  Bounding box, (minlng, minlat, maxlng, maxlat)
+        polygon: List[List[Tuple[float, float]]]  Polygon, i.e. one exterior ring,
+                                                  and multiple interior rings (holes).
 
     Returns:
-        str: geohash covering the complete bbox.
+        float: Area of the exterior ring minus the area of the holes.
     """
-    minlng, minlat, maxlng, maxlat = bbox
+    assert len(polygon) >= 1
 
-    # ensure values are in range
-    minlng = max(-180, minlng)
-    maxlng = min(180, maxlng)
-    minlat = max(-90, minlat)
-    maxlat = min(90, maxlat)
+    res = ring_area(polygon[0])
+    for hole in polygon[1:]:
+        res -= ring_area(hole)
+    return res
 
-    ll = encode(lng=minlng, lat=minlat, precision=16, bits_per_char=4)
-    ur = encode(lng=maxlng, lat=maxlat, precision=16, bits_per_char=4)
 
-    return commonprefix((ll, ur))
+def ring_area(ring):
+    """Compute the (planar) area of the ring with the shoelace formula.
+
+    Parameters:
+        ring: List[Tuple[float, float]]  Ring of Points (ring[0] == ring[-1]).
+
+    Returns:
+        float: Area of the ring (independent of the orientation).
+    """
+    res = 0.0
+    for i in range(1, len(ring)):
+        p1 = ring[i - 1]
+        p2 = ring[i]
+        res += p1[0] * p2[1] - p2[0] * p1[1]
+    return abs(res) / 2
 
 
 def ccw(a, b, c):
@@ -111,15 +124,78 @@ def ccw(a, b, c):
     return (b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])
 
 
-# def is_convex(ring):  # TODO not used: maybe use for faster p_in_p test
-#     n = len(ring)
-#     for i in range(2, n):
-#         p0 = ring[(i - 2) % n]
-#         p1 = ring[(i - 1) % n]
-#         p2 = ring[i % n]
-#         if ccw(p0, p1, p2) > 0:
-#             return False
-#     return True
+def _sign_changes(values):
+    """Number of sign changes in the cyclic sequence `values` (ignoring zeros)."""
+    signs = [value > 0 for value in values if value != 0]
+    return sum(1 for i in range(len(signs)) if signs[i - 1] != signs[i])
+
+
+def convex_vertices(ring):
+    """Vertices of `ring` in CCW orientation, if the ring is strictly convex.
+
+    A ring is convex, if all turns have the same orientation and it winds
+    around only once (the x and y directions of its edges change their sign at
+    most twice). Duplicate and collinear points are not supported.
+
+    Parameters:
+        ring: List[Tuple[float, float]]  Ring of Points (ring[0] == ring[-1]).
+
+    Returns:
+        List[Tuple[float, float]]  Vertices for `p_in_convex` (without repeating
+                                   the first one) or `None`, if not convex.
+    """
+    vertices = list(ring[:-1]) if ring[0] == ring[-1] else list(ring)
+    n = len(vertices)
+    if n < 3:  # noqa: PLR2004
+        return None
+
+    turns = [ccw(vertices[i - 2], vertices[i - 1], vertices[i]) for i in range(n)]
+    if all(turn < 0 for turn in turns):
+        vertices.reverse()
+    elif not all(turn > 0 for turn in turns):
+        return None
+
+    dxs = [vertices[i][0] - vertices[i - 1][0] for i in range(n)]
+    dys = [vertices[i][1] - vertices[i - 1][1] for i in range(n)]
+    if _sign_changes(dxs) > 2 or _sign_changes(dys) > 2:  # noqa: PLR2004
+        return None  # winds more than once
+    return vertices
+
+
+def p_in_convex(p, vertices):
+    """Test, whether `p` is in the convex polygon in O(log n).
+
+    Binary search for the wedge (fan triangle from the first vertex) containing
+    `p` and test against its outer edge.
+
+    Parameters:
+        p: Tuple[float, float]               2D Point.
+        vertices: List[Tuple[float, float]]  Vertices from `convex_vertices`.
+
+    Returns:
+        bool: True, if `p` is strictly inside, False, if it is strictly outside,
+              `None`, if it is on a border of the wedges (use `p_in_polygon`).
+    """
+    v0 = vertices[0]
+    first = ccw(v0, vertices[1], p)
+    last = ccw(v0, vertices[-1], p)
+    if first < 0 or last > 0:
+        return False
+    if first == 0 or last == 0:
+        return None
+
+    lo, hi = 1, len(vertices) - 1  # ccw(v0, v_lo, p) > 0 >= ccw(v0, v_hi, p)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if ccw(v0, vertices[mid], p) > 0:
+            lo = mid
+        else:
+            hi = mid
+
+    turn = ccw(vertices[lo], vertices[hi], p)
+    if turn == 0:
+        return None
+    return turn > 0
 
 
 def winding_number(p, ring):
@@ -172,3 +248,293 @@ def p_in_polygon(p, polygon):
         return True
 
     return False
+
+
+def _cell(value, origin, size, count):
+    return min(max(int((value - origin) / size), 0), count - 1)
+
+
+def hole_index(polygon):
+    """Grid over the holes of `polygon` for `p_in_polygon_indexed`.
+
+    The bounding box of the exterior ring is divided into about one cell per
+    hole and every cell lists the holes, whose bounding box intersects it.
+
+    Parameters:
+        polygon: List[List[Tuple[float, float]]]  Polygon with holes.
+
+    Returns:
+        Tuple  (minlng, minlat, cell width, cell height, columns, rows, cells)
+               with the (bounding box, ring) of the holes in every cell.
+    """
+    minlng, minlat, maxlng, maxlat = bbox({"type": "Polygon", "coordinates": polygon})
+    count = max(1, int(math.sqrt(len(polygon) - 1)))
+    width = (maxlng - minlng) / count or 1.0
+    height = (maxlat - minlat) / count or 1.0
+
+    cells = [[] for _i in range(count * count)]
+    for ring in polygon[1:]:
+        bounds = bbox({"type": "Polygon", "coordinates": [ring]})
+        hminlng, hminlat, hmaxlng, hmaxlat = bounds
+        cols = range(
+            _cell(hminlng, minlng, width, count),
+            _cell(hmaxlng, minlng, width, count) + 1,
+        )
+        for row in range(
+            _cell(hminlat, minlat, height, count),
+            _cell(hmaxlat, minlat, height, count) + 1,
+        ):
+            for col in cols:
+                cells[row * count + col].append((bounds, ring))
+    return minlng, minlat, width, height, count, count, cells
+
+
+def p_in_polygon_indexed(p, polygon, holes):
+    """`p_in_polygon` testing only the holes, whose bounding box contains `p`.
+
+    Parameters:
+        p: Tuple[float, float]                    2D Point.
+        polygon: List[List[Tuple[float, float]]]  Polygon with holes.
+        holes: Tuple                              `hole_index(polygon)`.
+
+    Returns:
+        bool: True, if `p` in `polygon`, False otherwise.
+    """
+    if winding_number(p, polygon[0]) == 0:
+        return False
+
+    minlng, minlat, width, height, cols, rows, cells = holes
+    row = _cell(p[1], minlat, height, rows)
+    for bounds, ring in cells[row * cols + _cell(p[0], minlng, width, cols)]:
+        if in_bbox(p, bounds) and winding_number(p, ring) != 0:
+            return False  # in hole of polygon
+    return True
+
+
+def bbox_intersects(a, b):
+    """Test, whether the bounding boxes `a` and `b` intersect (or touch).
+
+    Parameters:
+        a: Tuple[float, float, float, float]  Bounding box, (minlng, minlat, maxlng, maxlat)
+        b: Tuple[float, float, float, float]  Bounding box, (minlng, minlat, maxlng, maxlat)
+
+    Returns:
+        bool: True, if the bounding boxes intersect, False otherwise.
+    """
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _on_segment(a, b, c):
+    """`c` is collinear to a, b; test, whether it is within the segment a, b."""
+    lng_ok = min(a[0], b[0]) <= c[0] <= max(a[0], b[0])
+    return lng_ok and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+
+
+def segments_intersect(p1, p2, q1, q2):
+    """Test, whether the segments p1, p2 and q1, q2 intersect (or touch).
+
+    Returns:
+        bool: True, if the segments have at least one point in common.
+    """
+    d1 = ccw(q1, q2, p1)
+    d2 = ccw(q1, q2, p2)
+    d3 = ccw(p1, p2, q1)
+    d4 = ccw(p1, p2, q2)
+
+    if ((d1 > 0 and d2 < 0) or (d1 < 0 and d2 > 0)) and (
+        (d3 > 0 and d4 < 0) or (d3 < 0 and d4 > 0)
+    ):
+        return True
+
+    return (
+        (d1 == 0 and _on_segment(q1, q2, p1))
+        or (d2 == 0 and _on_segment(q1, q2, p2))
+        or (d3 == 0 and _on_segment(p1, p2, q1))
+        or (d4 == 0 and _on_segment(p1, p2, q2))
+    )
+
+
+def _segments(lines, bounds):
+    """All segments of `lines`, whose bounding box intersects `bounds`."""
+    for line in lines:
+        for i in range(1, len(line)):
+            a, b = line[i - 1], line[i]
+            if bbox_intersects(
+                (min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1])),
+                bounds,
+            ):
+                yield a, b
+
+
+def lines_intersect(a, a_bounds, b, b_bounds):
+    """Test, whether any segment of the lines (or rings) `a` crosses one of `b`.
+
+    Parameters:
+        a: List[List[Tuple[float, float]]]          Lines (or rings).
+        a_bounds: Tuple[float, float, float, float]  Bounding box of `a`.
+        b: List[List[Tuple[float, float]]]          Lines (or rings).
+        b_bounds: Tuple[float, float, float, float]  Bounding box of `b`.
+
+    Returns:
+        bool: True, if there is an intersection, False otherwise.
+    """
+    b_segments = list(_segments(b, a_bounds))
+    if not b_segments:
+        return False
+    for p1, p2 in _segments(a, b_bounds):
+        for q1, q2 in b_segments:
+            if segments_intersect(p1, p2, q1, q2):
+                return True
+    return False
+
+
+_GEOMETRY_TYPES = frozenset(
+    ("Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon")
+)
+
+
+def geometry_parts(geometry):
+    """Split a geojson geometry into its points, lines and polygons.
+
+    Parameters:
+        geometry: Dict[str, Any]  Geojson geometry (no `GeometryCollection`).
+
+    Returns:
+        Tuple[List, List, List]: points, lines and polygons of the geometry.
+    """
+    kind = geometry["type"]
+    if kind not in _GEOMETRY_TYPES:
+        raise ValueError("Unsupported geometry type: {}".format(kind))
+
+    coords = geometry["coordinates"]
+    if kind == "Point":
+        return [coords], [], []
+    if kind == "MultiPoint":
+        return list(coords), [], []
+    if kind == "LineString":
+        return [], [coords], []
+    if kind == "MultiLineString":
+        return [], list(coords), []
+    if kind == "Polygon":
+        return [], [], [coords]
+    return [], [], list(coords)
+
+
+def geometry_bounds(geometry):
+    """Compute the bounding box of any geojson geometry (no `GeometryCollection`).
+
+    Parameters:
+        geometry: Dict[str, Any]  Geojson geometry.
+
+    Returns:
+        Tuple[float, float, float, float]: minlng, minlat, maxlng, maxlat
+    """
+    points, lines, polygons = geometry_parts(geometry)
+    coords = points + [
+        p for line in lines + [poly[0] for poly in polygons] for p in line
+    ]
+    if not coords:
+        raise ValueError("Empty geometry.")
+    lngs = [p[0] for p in coords]
+    lats = [p[1] for p in coords]
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+
+def polygon_intersects(polygon, bounds, points, lines, polygons):
+    """Test, whether `polygon` intersects the geometry given by its parts.
+
+    Parameters:
+        polygon: List[List[Tuple[float, float]]]  Polygon (exterior ring and holes).
+        bounds: Tuple[float, float, float, float]  Bounding box of the geometry.
+        points: List[Tuple[float, float]]          Points of the geometry.
+        lines: List[List[Tuple[float, float]]]     Lines of the geometry.
+        polygons: List[List[List[Tuple[float, float]]]]  Polygons of the geometry.
+
+    Returns:
+        bool: True, if `polygon` and the geometry intersect, False otherwise.
+    """
+    for p in points:
+        if p_in_polygon(p, polygon):
+            return True
+
+    p_bounds = bbox({"type": "Polygon", "coordinates": polygon})
+    for line in lines:
+        if line and p_in_polygon(line[0], polygon):
+            return True
+    if lines and lines_intersect(polygon, p_bounds, lines, bounds):
+        return True
+
+    for other in polygons:
+        # one contains a vertex of the other or their boundaries cross
+        if p_in_polygon(other[0][0], polygon) or p_in_polygon(polygon[0][0], other):
+            return True
+        o_bounds = bbox({"type": "Polygon", "coordinates": other})
+        if lines_intersect(polygon, p_bounds, other, o_bounds):
+            return True
+
+    return False
+
+
+def _clip_half_plane(points, axis, value, keep_greater):
+    """Part of the closed path `points` on one side of the line `p[axis] == value`."""
+    res = []
+    prev = points[-1]
+    prev_in = prev[axis] >= value if keep_greater else prev[axis] <= value
+    for cur in points:
+        cur_in = cur[axis] >= value if keep_greater else cur[axis] <= value
+        if cur_in != prev_in:
+            t = (value - prev[axis]) / (cur[axis] - prev[axis])
+            other = prev[1 - axis] + t * (cur[1 - axis] - prev[1 - axis])
+            res.append((value, other) if axis == 0 else (other, value))
+        if cur_in:
+            res.append(cur)
+        prev, prev_in = cur, cur_in
+    return res
+
+
+def clip_ring(ring, bounds):
+    """Clip the ring to the rectangle `bounds` (Sutherland-Hodgman).
+
+    Parts of the ring outside of `bounds` are replaced by paths along the
+    border of `bounds`, hence the winding number of all points within `bounds`
+    does not change.
+
+    Parameters:
+        ring: List[Tuple[float, float]]          Ring of Points (ring[0] == ring[-1]).
+        bounds: Tuple[float, float, float, float]  Rectangle (minlng, minlat, maxlng, maxlat).
+
+    Returns:
+        List[Tuple[float, float]]: The clipped ring (empty, if nothing is left).
+    """
+    minlng, minlat, maxlng, maxlat = bounds
+    points = list(ring[:-1])
+    for axis, value, keep_greater in (
+        (0, minlng, True),
+        (0, maxlng, False),
+        (1, minlat, True),
+        (1, maxlat, False),
+    ):
+        if not points:
+            break
+        points = _clip_half_plane(points, axis, value, keep_greater)
+    if len(points) < 3:  # noqa: PLR2004
+        return []
+    return [*points, points[0]]
+
+
+def clip_polygon(polygon, bounds):
+    """Clip the polygon to the rectangle `bounds`.
+
+    Parameters:
+        polygon: List[List[Tuple[float, float]]]  Polygon, i.e. one exterior ring,
+                                                  and multiple interior rings (holes).
+        bounds: Tuple[float, float, float, float]  Rectangle (minlng, minlat, maxlng, maxlat).
+
+    Returns:
+        List[List[Tuple[float, float]]]: The clipped polygon (`None`, if nothing is left).
+    """
+    exterior = clip_ring(polygon[0], bounds)
+    if not exterior:
+        return None
+    holes = [clip_ring(hole, bounds) for hole in polygon[1:]]
+    return [exterior] + [hole for hole in holes if hole]
@@ -22,29 +22,316 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
-import importlib.resources
+import heapq
 import json
+import mmap
+import os
 import sys
-from os import environ
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from functools import partial
 
-from geohash_hilbert import encode
-
-from ._geo_fkt import bbox_hash, in_bbox
-
-try:
-    from ._shapely import p_in_polygon, prepare
-
-    SHAPELY_AVAILABLE = True
-except ImportError:
-    from ._pure import p_in_polygon, prepare
-
-    SHAPELY_AVAILABLE = False
+from . import _hilbert, _pure, _store
+from ._geo_fkt import bbox_intersects, geometry_bounds, geometry_parts, in_bbox
+from ._memory import deep_size
+from ._properties import PropertyTable
+from ._raster import AMBIGUOUS_CELL, UNKNOWN_FEATURE, Raster
+from ._trie import Trie
 
 _MIN_LNG = -180
 _MAX_LNG = 180
 _MIN_LAT = -90
 _MAX_LAT = 90
 
+_SHAPELY = None  # `geopip._shapely` module, `False` if shapely is not installed
+
+# shared memory block opened by `GeoPIP.attach()` without `SharedMemory`
+_AttachedBlock = namedtuple("_AttachedBlock", ["name", "buf"])
+
+
+class FeatureRow(namedtuple("FeatureRow", ["row"])):
+    """Id of a feature without (unique) geojson `id`: its row in `GeoPIP.properties`.
+
+    A separate type, such that geojson ids (e.g. `1`) never collide with rows.
+    """
+
+    __slots__ = ()
+
+
+# `search_batch` searches fewer points within one rectangle of the deepest
+# level of the index point by point
+_VECTORIZED_MIN_POINTS = 16
+
+# default candidates of `GeoPIP.tune`
+TUNE_CANDIDATES = [
+    {},
+    *({"raster": resolution} for resolution in (1.0, 0.5, 0.25, 0.1)),
+    *({"trie": {"max_depth": depth, "clip": False}} for depth in (4, 6)),
+    {"trie": {"max_depth": 6, "clip": True}},
+    {"raster": 0.25, "trie": {"max_depth": 6, "clip": False}},
+]
+
+
+def _shapely_backend():
+    """Import the shapely backend on first use (importing shapely is slow)."""
+    global _SHAPELY  # noqa: PLW0603
+    if _SHAPELY is None:
+        try:
+            from . import _shapely  # noqa: PLC0415
+        except ImportError:
+            _shapely = False
+        _SHAPELY = _shapely
+    return _SHAPELY
+
+
+def __getattr__(name):
+    if name == "SHAPELY_AVAILABLE":
+        return bool(_shapely_backend())
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def _backend(name):
+    """Get the backend module (`geopip._pure` or `geopip._shapely`) for `name`.
+
+    Parameters:
+        name: str  `"pure"`, `"shapely"` or `None` (shapely, if available).
+
+    Returns:
+        module: Backend providing `prepare` and `p_in_polygon`.
+    """
+    if name is None:
+        name = "shapely" if _shapely_backend() else "pure"
+
+    if name == "pure":
+        return _pure
+    if name == "shapely":
+        if not _shapely_backend():
+            raise ImportError("Backend `shapely` requires the shapely package.")
+        return _SHAPELY
+    raise ValueError("Unknown backend: {!r}".format(name))
+
+
+def _configured_backend(store):
+    """Backend of the tuned configuration of `store` (`None`, if not available)."""
+    name = None if store is None else store.meta.get("config", {}).get("backend")
+    if name == "shapely" and not _shapely_backend():
+        return None
+    return name
+
+
+def _load_file(filename):
+    """Load a geojson or geopip binary file.
+
+    Returns:
+        Tuple[Dict[str, Any], Store]  Either the geojson or the (memory mapped) store.
+    """
+    with open(filename, "rb") as f:
+        if _store.is_store(f.read(len(_store.MAGIC))):
+            return None, _store.Store(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        f.seek(0)
+        return json.loads(f.read().decode("utf-8")), None
+
+
+def _package_data():
+    """The default data (packaged) in the geopip binary format."""
+    import importlib.resources  # noqa: PLC0415 (slow import)
+
+    if sys.version_info >= (3, 9):
+        data = (
+            importlib.resources.files("geopip").joinpath("globe.geo.bin").read_bytes()
+        )
+    else:
+        data = importlib.resources.read_binary("geopip", "globe.geo.bin")
+    return _store.Store(data)
+
+
+def _coordinates(values):
+    """`values` as list (converts NumPy arrays to python floats)."""
+    return values.tolist() if hasattr(values, "tolist") else values
+
+
+def _numpy():
+    """The numpy module (`None`, if it is not installed)."""
+    try:
+        import numpy  # noqa: PLC0415
+    except ImportError:
+        return None
+    return numpy
+
+
+def _int_array(values):
+    """`values` (`array("q")`) as NumPy array, if NumPy is installed."""
+    try:
+        import numpy  # noqa: PLC0415
+    except ImportError:
+        return values
+    return numpy.array(values, dtype=numpy.int64)
+
+
+def _unlink(shm):
+    """Release the shared memory block `shm` created by `GeoPIP.to_shared_memory()`."""
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass  # already unlinked (e.g. by the resource tracker of another process)
+
+
+def _attach_block(name):
+    """Open the shared memory block `name` without tracking it.
+
+    The exporting process owns the block. Before Python 3.13, `SharedMemory`
+    registers every opened block with the resource tracker, which unlinks it
+    when the process exits (or, for workers sharing the tracker of their
+    parent, drops the registration of the owner); hence POSIX blocks are
+    mapped directly.
+    """
+    from multiprocessing import shared_memory  # noqa: PLC0415
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    try:
+        import _posixshmem  # noqa: PLC0415
+    except ImportError:
+        return shared_memory.SharedMemory(name=name)  # not tracked on Windows
+
+    fd = _posixshmem.shm_open("/" + name, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        block = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+    return _AttachedBlock(name, memoryview(block))
+
+
+def _check_collection(data, store):
+    """Raise a `ValueError`, if neither `store` nor `data` is a `FeatureCollection`."""
+    if store is None and (
+        not isinstance(data, dict) or data.get("type") != "FeatureCollection"
+    ):
+        raise ValueError("Only `FeatureCollections` are allowed as input!")
+
+
+def _layer_source(source):
+    """(geojson, store) of a layer given as path or geojson dict."""
+    if isinstance(source, dict):
+        data, store = source, None
+    else:
+        data, store = _load_file(source)
+    _check_collection(data, store)
+    return data, store
+
+
+def _unpickle(data, backend, properties, lazy, partition_by=None, meta=None):  # noqa: PLR0913, PLR0917
+    """Load a `GeoPIP` pickled in the binary format (see `GeoPIP.__reduce__`).
+
+    `meta` contains the pickled ids and `properties` of the features, that are
+    missing in the meta data of `data`.
+    """
+    store = _store.Store(data)
+    if meta is not None:
+        store.meta.update(meta)
+    geo = GeoPIP.__new__(GeoPIP)
+    geo._backend = _backend(backend)
+    geo._source = "<pickle>"
+    geo._load(None, store, properties, True, partition_by=partition_by)
+    geo._lazy = lazy  # of features added later
+    if meta is not None:
+        geo._origin = (None, None)  # the bytes of `data` lack ids and properties
+    return geo
+
+
+def _level_probes(shapes):
+    """(shift, tag) of all levels of the keys of `shapes`, deepest first."""
+    levels = sorted({_hilbert.level(key) for key in shapes}, reverse=True)
+    return [(_hilbert.SHIFTS[level], _hilbert.TAGS[level]) for level in levels]
+
+
+def _throughput(geo, lngs, lats, batch, repeat):
+    """Searched points per second of `geo` (best of `repeat` runs after a warm up)."""
+    if batch:
+
+        def run():
+            geo.search_batch(lngs, lats)
+
+    else:
+        search = geo.search
+
+        def run():
+            for lng, lat in zip(lngs, lats):  # noqa: B905 (py3.9)
+                search(lng, lat)
+
+    run()  # prepares the lazy shapes
+    best = float("inf")
+    for _i in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return len(lngs) / max(best, 1e-9)
+
+
+def _intersecting_pairs(boxes):
+    """Pairs (j, i) with j < i of the intersecting (or touching) `boxes`.
+
+    Sweeps over the boxes ordered by their minimal longitude, hence only boxes
+    overlapping in longitude are compared.
+    """
+    active = []  # positions of the boxes reaching the current longitude
+    for i in sorted(range(len(boxes)), key=lambda i: boxes[i][0]):
+        box = boxes[i]
+        active = [j for j in active if boxes[j][2] >= box[0]]
+        for j in active:
+            if boxes[j][1] <= box[3] and box[1] <= boxes[j][3]:
+                yield (j, i) if j < i else (i, j)
+        active.append(i)
+
+
+def _hit_order(bucket, hits):
+    """`bucket` with the shapes of the most hit features first.
+
+    Shapes with intersecting (or touching) bounding boxes keep their relative
+    order, hence every point still finds the same first shape, only with
+    fewer tests. A shape is as urgent as the most hit shape it precedes in
+    this way; ties keep the order of `bucket`.
+
+    Parameters:
+        bucket: List[Dict[str, Any]]  Shapes of one key of the index.
+        hits: Dict[int, int]          Hits by feature row.
+    """
+    before = [0] * len(bucket)  # number of intersecting shapes before the shape
+    after = [[] for _shp in bucket]  # positions of intersecting shapes after it
+    for j, i in _intersecting_pairs([shp["bounds"] for shp in bucket]):
+        before[i] += 1
+        after[j].append(i)
+
+    priority = [-hits.get(shp["feature"], 0) for shp in bucket]
+    for i in reversed(range(len(bucket))):
+        for j in after[i]:
+            priority[i] = min(priority[i], priority[j])
+
+    ready = [(priority[i], i) for i in range(len(bucket)) if not before[i]]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _priority, i = heapq.heappop(ready)
+        ordered.append(bucket[i])
+        for j in after[i]:
+            before[j] -= 1
+            if not before[j]:
+                heapq.heappush(ready, (priority[j], j))
+    return ordered
+
+
+def _same_feature(shp1, shp2):
+    """Test, whether both shapes (or `None`) belong to the same feature."""
+    if shp1 is None or shp2 is None:
+        return shp1 is shp2
+    return shp1["feature"] == shp2["feature"]
+
 
 class GeoPIP(object):
     """GeoPIP: Geojson Point in Polygon (PIP)
@@ -53,89 +340,696 @@ class GeoPIP(object):
     return information about the containing polygon.
     """
 
-    def __init__(self, filename=None, geojson_dict=None):
+    def __init__(  # noqa: PLR0913
+        self,
+        filename=None,
+        geojson_dict=None,
+        properties=None,
+        backend=None,
+        lazy=None,
+        *,
+        layers=None,
+        partition_by=None,
+    ):
         """Provide the geojson either as a file (`filename`) or as a geojson
         dict (`geojson_dict`). If none of both is given, it tries to load the
         file pointed to in the environment variable `REVERSE_GEOCODE_DATA`. If the
         variable is not set, a default geojson will be loaded (packaged):
             http://thematicmapping.org/downloads/world_borders.php
 
+        Files may also be in the binary format of `python -m geopip pack` (the
+        packaged default is), which is memory mapped and already indexed.
+
         During init, the geojson will be prepared (see pure / shapely implementation)
-        and indexed with geohashes.
+        and indexed with geohashes. The `properties` of the features are stored
+        compactly (see `PropertyTable`); the searches return read-only mappings.
 
         Parameters:
-            filename: str                 Path to a geojson file.
+            filename: str                 Path to a geojson (or geopip binary) file.
+                                          Binary files saved with a tuned
+                                          configuration (see `tune`) apply it.
             geojson_dict: Dict[str, Any]  Geojson dictionary. `FeatureCollection` required!
+            properties: List[str]         Keep only these keys of the `properties` of
+                                          the features (default: keep all).
+            backend: str                  `"pure"` or `"shapely"` implementation
+                                          (default: the tuned backend of a binary
+                                          file or shapely, if installed).
+            lazy: bool                    Only compute bounding boxes and geohashes
+                                          during init; prepare the shapes on their
+                                          first point in polygon test (default: lazy
+                                          for binary files, eager for geojson).
+            layers: Dict[str, Any]        Named layers (name -> path or geojson dict)
+                                          in one index instead of `filename` or
+                                          `geojson_dict` (see `search_layers`). The
+                                          ids of their features are (name, id).
+            partition_by: str             Key of the `properties` to partition the
+                                          features by: every value gets its own
+                                          index for `search(..., where=...)`.
         """
         if filename and geojson_dict:
             raise ValueError("Only one of `filename` or `geojson_dict` is allowed!")
+        if partition_by is not None and properties is not None:
+            if partition_by not in properties:
+                raise ValueError("`partition_by` must be one of the `properties`.")
+
+        if layers is not None:
+            if filename or geojson_dict:
+                raise ValueError("Either `layers` or `filename` / `geojson_dict`!")
+            self._backend = _backend(backend)
+            self._source = "<layers {}>".format(", ".join(layers))
+            sources = {name: _layer_source(source) for name, source in layers.items()}
+            self._load(
+                None, None, properties, lazy, layers=sources, partition_by=partition_by
+            )
+            return
 
         self._source = None
         data = None
+        store = None
         if filename is not None:
-            with open(filename, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data, store = _load_file(filename)
             self._source = filename
         elif geojson_dict is not None:
             data = geojson_dict
             self._source = "<dict>"
-        elif environ.get("REVERSE_GEOCODE_DATA"):
+        elif os.environ.get("REVERSE_GEOCODE_DATA"):
             # load default
-            with open(environ["REVERSE_GEOCODE_DATA"], "r", encoding="utf-8") as f:
-                data = json.load(f)
-            self._source = "<env = " + environ["REVERSE_GEOCODE_DATA"] + " >"
+            data, store = _load_file(os.environ["REVERSE_GEOCODE_DATA"])
+            self._source = "<env = " + os.environ["REVERSE_GEOCODE_DATA"] + " >"
         else:
-            if sys.version_info >= (3, 9):
-                data = json.loads(
-                    importlib.resources.files("geopip")
-                    .joinpath("globe.geo.json")
-                    .read_bytes()
-                )
-            else:
-                data = json.loads(
-                    importlib.resources.read_binary("geopip", "globe.geo.json")
-                )
+            store = _package_data()
             self._source = "<package-data>"
 
-        if not isinstance(data, dict) or data.get("type") != "FeatureCollection":
-            raise ValueError("Only `FeatureCollections` are allowed as input!")
+        _check_collection(data, store)
+        self._backend = _backend(
+            _configured_backend(store) if backend is None else backend
+        )
+        self._load(data, store, properties, lazy, partition_by=partition_by)
+        if store is not None and "config" in store.meta:
+            self._configure(store.meta["config"])  # see `tune`
+
+    def _load(  # noqa: PLR0913
+        self, data, store, properties=None, lazy=None, *, layers=None, partition_by=None
+    ):
+        """Initialize the index with the geojson `data` or the binary `store` (or
+        with the `(data, store)` of all `layers` by name)."""
+        self._lazy = store is not None if lazy is None else bool(lazy)
+        self._keep = properties
+        self._layers = None if layers is None else list(layers)  # names
+        self._partition_by = partition_by
 
         # initialize during init!
-        self._shapes = GeoPIP._initialize_shapes(data)
+        self._lock = threading.Lock()  # serializes writers, readers are lock-free
+        self._properties = PropertyTable(properties)
+        self._features = {}  # feature id -> (row, prepared shapes)
+        self._shapes = {}  # key (see `_hilbert`) -> shapes
+        self._partitions = {}  # value of `partition_by` -> (shapes, probes)
+        self._geohashes = ({}, {})  # (shapes, shapes by geohash)
+        self._levels = ({}, [])  # (shapes, (shift, tag) of their levels, deepest first)
+        self._sorted_keys = ({}, [])  # (shapes, sorted keys of shapes)
+        self._raster = (None, None)  # (shapes, raster of the shapes)
+        self._trie = (None, None)  # (shapes, trie of the shapes)
+        self._shared = (None, None, None)  # (shapes, shared memory, finalizer)
+        self._origin = (None, None)  # (shapes, binary store they were loaded from)
+        self._stores = []  # binary stores of lazy shapes
+        self._hits = {}  # feature row -> number of `search` results (see `count_hits`)
+        self._counting = False  # count the hits of `search`
+        if layers is None:
+            self._add_source(data, store, self._lazy)
+            if store is not None:
+                self._origin = (self._shapes, store)
+                if store.meta.get("hits"):
+                    # static ordering by the hits saved with the index
+                    hits = enumerate(store.meta["hits"])
+                    self._hits = {row: count for row, count in hits if count}
+                    self.reorder()
+        else:
+            for name, (layer_data, layer_store) in layers.items():
+                layer_lazy = layer_store is not None if lazy is None else bool(lazy)
+                self._add_source(layer_data, layer_store, layer_lazy, name)
+
+    def _add_source(self, data, store, lazy, layer=None):
+        """Add the features of the geojson `data` or the binary `store`."""
+        if store is None:
+            self._update(
+                entries=(
+                    self._prepare(feat, layer=layer, lazy=lazy)
+                    for feat in data["features"]
+                ),
+                unique=False,
+            )
+            return
+
+        entries = list(self._prepare_store(store, layer))
+        self._stores.append(store)
+        self._update(entries=entries, unique=False)
+        if not lazy:
+            for _fid, _row, shps in entries:
+                for shp in shps:
+                    self._backend.materialize(shp)
+
+    def _layer(self, layer):
+        """Position of `layer` in `self._layers` (`None` for indices without layers)."""
+        if self._layers is None:
+            if layer is not None:
+                raise ValueError("The index has no layers.")
+            return None
+        if layer is None:
+            raise ValueError("The layer of the features is required.")
+        if layer not in self._layers:
+            raise ValueError("Unknown layer: {!r}".format(layer))
+        return self._layers.index(layer)
+
+    def _prepare(self, feat, fid=None, layer=None, lazy=None, props=None):
+        """Prepare the feature `feat` and annotate the shapes for the index.
+
+        The `properties` are stored in a new row, unless the staged `props` of a
+        replaced row are given (see `PropertyTable.stage`).
+        """
+        position = self._layer(layer)
+        if props is None:
+            row = self._properties.append(feat.get("properties"))
+            props = self._properties.row(row)
+        else:
+            row = props._row
+        if fid is None:
+            fid = feat.get("id")
+            fid = FeatureRow(row) if fid is None else fid
+            if position is not None:
+                fid = (layer, fid)
+        shapes = self._backend.prepare(
+            dict(feat, properties=props), lazy=self._lazy if lazy is None else lazy
+        )
+        for shp in shapes:
+            shp["key"] = _hilbert.bbox_key(shp["bounds"])
+            shp["feature"] = row
+            if position is not None:
+                shp["layer"] = position
+        return fid, row, shapes
+
+    def _prepare_store(self, store, layer=None):
+        """Lazily prepared features of the binary `store` (see `_prepare`)."""
+        ids = store.meta["ids"]
+        properties = store.meta["properties"]
+
+        removed = frozenset(store.meta.get("removed", ()))
+        if layer is None and "layers" in store.meta:
+            # pickled index with layers
+            self._layers = list(store.meta["layers"]["names"])
+            layers = [self._layers[i] for i in store.meta["layers"]["features"]]
+        else:
+            layers = [layer] * len(store)
+
+        for idx in range(len(store)):
+            row = self._properties.append(properties[idx])
+            if idx in removed:
+                continue
+            fid = FeatureRow(row) if ids[idx] is None else ids[idx]
+            position = self._layer(layers[idx])
+            if position is not None:
+                fid = (layers[idx], fid)
+            props = self._properties.row(row)
+            if self._backend.MULTIPOLYGON_PARTS:
+                shapes = [
+                    {
+                        "shape": None,
+                        "geometry": partial(store.part_geometry, part),
+                        "properties": props,
+                        "bounds": store.part_bounds(part),
+                        "area": store.part_area(part),
+                        "key": store.part_key(part),
+                        "feature": row,
+                    }
+                    for part in store.feature_parts(idx)
+                ]
+            elif len(store.feature_parts(idx)):
+                shapes = [
+                    {
+                        "shape": None,
+                        "geometry": partial(store.feature_geometry, idx),
+                        "properties": props,
+                        "bounds": store.feature_bounds(idx),
+                        "area": store.feature_area(idx),
+                        "key": store.feature_key(idx),
+                        "feature": row,
+                    }
+                ]
+            else:
+                shapes = []
+            if position is not None:
+                for shp in shapes:
+                    shp["layer"] = position
+            yield fid, row, shapes
+
+    def _update(self, remove_ids=(), entries=(), unique=True, staged=()):
+        """Copy-on-write update of the index.
+
+        All new features are prepared first, then the touched buckets are copied,
+        modified and the new index is published with a single assignment. Hence,
+        concurrent searches either see the old or the new index.
+
+        Parameters:
+            remove_ids: List[Any]                      Ids of features to remove.
+            entries: Iterable[Tuple[Any, int, List]]  Prepared (id, row, shapes) of
+                                                      the features to add (consumed
+                                                      while holding the lock).
+            unique: bool                               Raise on duplicate ids (else
+                                                      the duplicates are identified
+                                                      by their `FeatureRow`).
+            staged: List[PropertyView]                 Staged properties of replaced
+                                                      rows (see `PropertyTable.stage`),
+                                                      stored with the update.
+        """
+        with self._lock:
+            features = dict(self._features)
+            removed = []
+            for fid in remove_ids:
+                if fid not in features:
+                    raise KeyError("Unknown feature id: {!r}".format(fid))
+                removed += features.pop(fid)[1]
+            removed = [(shp, self._partition_value(shp)) for shp in removed]
+
+            added = []
+            for fid, row, shps in entries:
+                if fid in features:
+                    if unique:
+                        raise ValueError("Duplicate feature id: {!r}".format(fid))
+                    fid = self._row_id(fid, row)  # noqa: PLW2901
+                features[fid] = (row, shps)
+                added += shps
+            for props in staged:
+                self._properties.commit(props)
+
+            self._shapes = GeoPIP._updated_shapes(
+                self._shapes, [shp for shp, _value in removed], added
+            )
+            if self._partition_by is not None:
+                self._partitions = self._updated_partitions(removed, added)
+            self._features = features
+            self._raster = (None, None)
+            self._trie = (None, None)
 
     @staticmethod
-    def _initialize_shapes(data):
-        shapes = {}  # geohash -> shapes
-        for feat in data["features"]:
-            for shp in prepare(feat):
-                key = bbox_hash(shp["bounds"])
-                shp["geohash"] = key
-                if key not in shapes:
-                    shapes[key] = []
-                shapes[key].append(shp)
+    def _updated_shapes(shapes, removed, added):
+        """Copy of the index `shapes` without `removed` and with `added` shapes."""
+        shapes = dict(shapes)
+        touched = {}  # key -> new bucket
+
+        removed_ids = {id(shp) for shp in removed}
+        for shp in removed:
+            key = shp["key"]
+            if key not in touched:
+                touched[key] = [
+                    s for s in shapes.get(key, ()) if id(s) not in removed_ids
+                ]
+
+        for shp in added:
+            key = shp["key"]
+            if key not in touched:
+                touched[key] = list(shapes.get(key, ()))
+            touched[key].append(shp)
+
+        for key, shps in touched.items():
+            # smallest shapes first within one resolution (stable for equal areas)
+            shps.sort(key=lambda shp: shp["area"])
+            if shps:
+                shapes[key] = shps
+            else:
+                shapes.pop(key, None)
 
         return shapes
 
+    def _row_id(self, fid, row):
+        """`FeatureRow` id of `row` (within the layer of `fid` for indices with layers)."""
+        return FeatureRow(row) if self._layers is None else (fid[0], FeatureRow(row))
+
+    def _partition_value(self, shp):
+        """Value of the `partition_by` property of `shp` (`None` without partitions)."""
+        if self._partition_by is None:
+            return None
+        return shp["properties"].get(self._partition_by)
+
+    def _updated_partitions(self, removed, added):
+        """Copy of `self._partitions` without `removed` and with `added` shapes.
+
+        `removed` are the (shape, partition value) before the update.
+        """
+        changes = {}  # value -> (removed, added) shapes
+        for shp, value in removed:
+            changes.setdefault(value, ([], []))[0].append(shp)
+        for shp in added:
+            changes.setdefault(self._partition_value(shp), ([], []))[1].append(shp)
+
+        partitions = dict(self._partitions)
+        for value, (partition_removed, partition_added) in changes.items():
+            shapes = partitions.get(value, ({}, []))[0]
+            shapes = GeoPIP._updated_shapes(shapes, partition_removed, partition_added)
+            if shapes:
+                partitions[value] = (shapes, _level_probes(shapes))
+            else:
+                partitions.pop(value, None)
+        return partitions
+
+    def add_features(self, features, layer=None):
+        """Add geojson features to the index (without rebuilding it).
+
+        The id of a feature is its geojson `id` member or, if it is missing, its
+        row in `self.properties` as `FeatureRow`. In indices with layers, the id
+        is the tuple (layer, id). Unlike the init, which identifies features with
+        a repeated geojson `id` by their `FeatureRow`, duplicate ids are rejected.
+
+        Parameters:
+            features: Iterable[Dict[str, Any]]  Geojson features.
+            layer: str                          Name of the layer of the features
+                                                (required for indices with layers).
+        """
+        self._update(entries=(self._prepare(feat, layer=layer) for feat in features))
+
+    def remove_features(self, ids):
+        """Remove the features with the given ids from the index.
+
+        Parameters:
+            ids: Iterable[Any]  Ids of the features (see `add_features`).
+        """
+        self._update(remove_ids=list(ids))
+
+    def replace_feature(self, fid, feature):
+        """Replace the feature with id `fid` by `feature` (keeping the id and row).
+
+        Parameters:
+            fid: Any                 Id of the feature to replace.
+            feature: Dict[str, Any]  Geojson feature.
+        """
+        if fid not in self._features:
+            raise KeyError("Unknown feature id: {!r}".format(fid))
+        layer = None if self._layers is None else fid[0]
+        props = self._properties.stage(
+            self._features[fid][0], feature.get("properties")
+        )
+        self._update(
+            remove_ids=[fid],
+            entries=(
+                self._prepare(feat, fid, layer=layer, props=props) for feat in [feature]
+            ),
+            staged=[props],
+        )
+
+    def compact(self):
+        """Drop the rows of removed features from `self.properties`.
+
+        The rows of removed features are kept (and stored as empty features in
+        pickles, shared memory and binary files), such that the rows returned by
+        `search_batch` stay valid across processes. `compact` renumbers the rows
+        (and the `FeatureRow` ids), hence rows and exports of earlier states must
+        not be mixed with the compacted index.
+        """
+        with self._lock:
+            live = sorted(row for row, _shps in self._features.values())
+            if len(live) == len(self._properties):
+                return
+            rows = {row: new_row for new_row, row in enumerate(live)}
+            properties = PropertyTable(self._keep)
+            for row in live:
+                properties.append(self._properties.row(row))
+
+            features, shapes = {}, []
+            for fid, (row, old_shps) in self._features.items():
+                new_row = rows[row]
+                props = properties.row(new_row)
+                shps = [
+                    dict(shp, properties=props, feature=new_row) for shp in old_shps
+                ]
+                if isinstance(fid if self._layers is None else fid[1], FeatureRow):
+                    features[self._row_id(fid, new_row)] = (new_row, shps)
+                else:
+                    features[fid] = (new_row, shps)
+                shapes += shps
+
+            self._properties = properties
+            self._hits = {rows[row]: n for row, n in self._hits.items() if row in rows}
+            self._shapes = GeoPIP._updated_shapes({}, [], shapes)
+            if self._partition_by is not None:
+                self._partitions = {}
+                self._partitions = self._updated_partitions([], shapes)
+            self._features = features
+            self._raster = (None, None)
+            self._trie = (None, None)
+
+    @property
+    def feature_ids(self):
+        """Ids of all features in the index (in the order of their rows)."""
+        features = self._features
+        return sorted(features, key=lambda fid: features[fid][0])
+
+    def _polygons(self, shp):
+        """Coordinates of the polygons of `shp` (without preparing lazy shapes)."""
+        geometry = shp.get("geometry")
+        if geometry is None:
+            return self._backend.polygons(shp)
+        if callable(geometry):
+            geometry = geometry()
+        return geometry_parts(geometry)[2]
+
+    def _geojson_features(self):
+        """Geojson features of all rows of `self.properties` for `_store.dumps`.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[int], Dict[str, List]]  Features, the
+                rows of removed features and the layers (`None` without layers).
+        """
+        rows = {row: (fid, shps) for fid, (row, shps) in self._features.items()}
+        features, removed, positions = [], [], []
+        for row in range(len(self._properties)):
+            feat = {"type": "Feature", "properties": dict(self._properties.row(row))}
+            if row not in rows:
+                removed.append(row)
+                features.append(dict(feat, geometry=None))
+                positions.append(0)
+                continue
+
+            fid, shps = rows[row]
+            if self._layers is not None:
+                positions.append(self._layer(fid[0]))
+                fid = fid[1]
+            if isinstance(fid, FeatureRow):
+                fid = None  # the row stays the same when loading
+            polygons = [polygon for shp in shps for polygon in self._polygons(shp)]
+            if not polygons:
+                geometry = None
+            elif len(polygons) == 1:
+                geometry = {"type": "Polygon", "coordinates": polygons[0]}
+            else:
+                geometry = {"type": "MultiPolygon", "coordinates": polygons}
+            features.append(dict(feat, id=fid, geometry=geometry))
+
+        layers = None
+        if self._layers is not None:
+            layers = {"names": self._layers, "features": positions}
+        return features, removed, layers
+
+    def _dumps(self):
+        """The index in the binary format (requires `self._lock`).
+
+        Unmodified indices loaded from a binary file reuse its bytes.
+        """
+        shapes, store = self._origin
+        if store is not None and shapes is self._shapes:
+            return store.buffer
+        return _store.dumps(*self._geojson_features())
+
+    def to_shared_memory(self):
+        """Copy the index into shared memory for `GeoPIP.attach()` in other processes.
+
+        The features are stored in the binary format (see `python -m geopip pack`)
+        in a `multiprocessing.shared_memory.SharedMemory` block. Repeated calls
+        return the same block as long as the index is not modified, a new block
+        replaces the previous one. The block is unlinked, when this instance is
+        garbage collected. Afterwards, pickling this instance only transfers the
+        name of the block.
+
+        Returns:
+            str  Name of the shared memory block.
+        """
+        from multiprocessing import shared_memory  # noqa: PLC0415
+
+        with self._lock:
+            shapes, shm, release = self._shared
+            if shm is not None and shapes is self._shapes:
+                return shm.name
+
+            data = self._dumps()
+            block = shared_memory.SharedMemory(create=True, size=len(data))
+            block.buf[: len(data)] = data
+            if release is not None:
+                release()
+            self._shared = (self._shapes, block, weakref.finalize(self, _unlink, block))
+        return block.name
+
+    @classmethod
+    def attach(cls, name, backend=None, partition_by=None):
+        """Instance over an index in shared memory (see `GeoPIP.to_shared_memory()`).
+
+        The coordinates, bounding boxes and geohashes are read from the (read-only)
+        shared block without copying; the shapes are prepared on their first point
+        in polygon test. The feature indices are the same as in the exporting
+        instance. Modifications of the returned instance stay local.
+
+        Parameters:
+            name: str     Name of the shared memory block.
+            backend: str  `"pure"` or `"shapely"` (default: shapely, if installed).
+            partition_by: str  Key of the `properties` to partition by (see `GeoPIP`).
+
+        Returns:
+            GeoPIP  The attached instance.
+        """
+        shm = _attach_block(name)
+        geo = cls.__new__(cls)
+        geo._backend = _backend(backend)
+        geo._source = "<shared memory {}>".format(name)
+        geo._load(
+            None,
+            _store.Store(shm.buf.toreadonly(), owner=shm),
+            partition_by=partition_by,
+        )
+        geo._shared = (geo._shapes, shm, None)
+        return geo
+
+    def __reduce__(self):
+        """Pickle the index as name of its shared memory block (see
+        `GeoPIP.to_shared_memory()`) or in the flat binary format.
+
+        The binary format contains the coordinates, offsets, bounds, geohashes and
+        properties in a few flat arrays; the receiving side prepares the shapes
+        on their first point in polygon test. Rasters and tries are not pickled.
+        The ids and properties are pickled as they are (instead of the JSON of
+        binary files), unless the index is an unmodified binary file.
+        """
+        shapes, shm, _release = self._shared
+        if shm is not None and shapes is self._shapes:
+            return GeoPIP.attach, (shm.name, self.backend, self._partition_by)
+
+        with self._lock:
+            shapes, store = self._origin
+            if store is not None and shapes is self._shapes:
+                data, meta = bytes(store.buffer), None
+            else:
+                features, removed, layers = self._geojson_features()
+                meta = {"ids": [], "properties": []}
+                for feat in features:
+                    meta["ids"].append(feat.pop("id", None))
+                    meta["properties"].append(feat.pop("properties"))
+                data = bytes(_store.dumps(features, removed, layers))
+        return _unpickle, (
+            data,
+            self.backend,
+            self._keep,
+            self._lazy,
+            self._partition_by,
+            meta,
+        )
+
     def __str__(self):
+        shapes = self._shapes
         return "GeoPIP from {}: {} hashes, {} polygons".format(
-            self._source, len(self.shapes), sum(len(ps) for ps in self.shapes.values())
+            self._source, len(shapes), sum(len(ps) for ps in shapes.values())
         )
 
+    @property
+    def backend(self):
+        """Name of the used backend: `"pure"` or `"shapely"`."""
+        return self._backend.__name__.rsplit("._", 1)[-1]
+
     @property
     def shapes(self):
-        return self._shapes
+        """The index: geohash (4 bits per character) -> shapes within its rectangle."""
+        shapes, geohashes = self._geohashes
+        if shapes is not self._shapes:
+            shapes = self._shapes
+            geohashes = {_hilbert.geohash(key): shps for key, shps in shapes.items()}
+            self._geohashes = (shapes, geohashes)
+        return geohashes
+
+    def _probes(self, shapes):
+        """(shift, tag) of all levels of the keys of `shapes`, deepest first."""
+        cached_shapes, probes = self._levels
+        if cached_shapes is not shapes:
+            probes = _level_probes(shapes)
+            self._levels = (shapes, probes)
+        return probes
+
+    @property
+    def properties(self):
+        """Compact `PropertyTable` with the `properties` of all features."""
+        return self._properties
 
-    def search_all(self, lng, lat):
+    @property
+    def layers(self):
+        """Names of the layers (`None` for indices without layers)."""
+        return None if self._layers is None else list(self._layers)
+
+    def memory_usage(self):
+        """Approximate memory of the index in bytes by part.
+
+        Objects are counted once (e.g. coordinates shared with the geojson dict
+        the index was built from). The GEOS memory of the shapely backend is
+        estimated from the number of coordinates.
+
+        Returns:
+            Dict[str, int]  Bytes of
+                `coordinates`: coordinates of the prepared (or lazy geojson) shapes,
+                `geometries`:  geometry objects (geojson dicts, prepared geometries),
+                `bounds`:      bounding boxes of the shapes,
+                `index`:       keys, buckets and shape dictionaries of the index
+                               (and of the partitions, see `partition_by`),
+                `properties`:  columns of `self.properties`,
+                `store`:       binary files (memory mapped) or shared memory the
+                               lazy shapes are loaded from,
+                `raster`:      raster (see `rasterize`),
+                `trie`:        trie (see `build_trie`),
+                `total`:       sum of all parts.
+        """
+        shapes = self._shapes  # one consistent snapshot of the index
+        seen = set()
+        usage = dict.fromkeys(["coordinates", "geometries", "bounds"], 0)
+        for shps in shapes.values():
+            for shp in shps:
+                coordinates, geometries = self._backend.memory_usage(shp, seen)
+                usage["coordinates"] += coordinates
+                usage["geometries"] += geometries
+                usage["bounds"] += deep_size(shp["bounds"], seen)
+
+        usage["index"] = (
+            deep_size(shapes, seen)
+            + deep_size(self._features, seen)
+            + deep_size(self._partitions, seen)
+        )
+        usage["properties"] = self._properties.nbytes
+        usage["store"] = sum(store.buffer.nbytes for store in self._stores)
+
+        raster_shapes, raster = self._raster
+        usage["raster"] = raster.nbytes if raster_shapes is shapes else 0
+        trie_shapes, trie = self._trie
+        usage["trie"] = deep_size(trie.root, seen) if trie_shapes is shapes else 0
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def search_all(self, lng, lat, limit=None, where=None):
         """Reverse geocode lng/lat coordinate within the features from `self.shapes`.
 
         Look within the features from `self.shapes` for all polygon that
         contains the point (lng, lat). From all found feature the `porperties`
-        will be returned (more or less sorted from smallest to largest feature).
+        will be returned, sorted from smallest to largest feature: the geohash
+        rectangles are visited from the highest to the lowest resolution and
+        within one rectangle the shapes are ordered by area. For nested features
+        (e.g. country > state > county) the order is strictly by area.
         `None`, if no feature containes the point.
 
         Parameters:
             lng: float  Longitude (-180, 180) of point. (WGS84)
             lat: float  Latitude (-90, 90) of point. (WGS84)
+            limit: int  Stop looking after `limit` found features (default: all).
+            where: Dict[str, Any]  Only features with these `properties` (see
+                                   `search`).
 
         Returns:
             Iterator[Dict[Any, Any]]  Iterator for `properties` of found features.
@@ -145,33 +1039,834 @@ class GeoPIP(object):
         if not (_MIN_LAT <= lat <= _MAX_LAT):
             raise ValueError("Latitude must be between -90 and 90.")
 
-        key = encode(lng=lng, lat=lat, precision=16, bits_per_char=4)
-        for sub_key in [key] + [key[:-i] for i in range(1, len(key) + 1)]:
+        if limit is not None and limit <= 0:
+            return
+
+        if where is not None:
+            found_shapes = self._where_shapes(lng, lat, where)
+        else:
+            shapes = self._shapes  # one consistent snapshot of the index
+            properties = self._raster_lookup(shapes, lng, lat)
+            if properties is not AMBIGUOUS_CELL:
+                if properties is not None:
+                    yield properties
+                return
+            found_shapes = self._find_shapes(shapes, lng, lat)
+
+        for found, shp in enumerate(found_shapes, 1):
+            yield shp["properties"]
+            if found == limit:
+                return
+
+    def _find_shapes(self, shapes, lng, lat):
+        """All shapes of `shapes` containing (lng, lat) in the order of `search_all`."""
+        trie_shapes, trie = self._trie
+        if trie_shapes is shapes:
+            yield from trie.find(lng, lat)
+            return
+
+        p_in_polygon = self._backend.p_in_polygon
+        code = _hilbert.encode(lng, lat)
+        for shift, tag in self._probes(shapes):
             # look withing geohash rectangles of increasing resolution
-            for shp in self.shapes.get(sub_key, []):
+            for shp in shapes.get((code >> shift) | tag, ()):
                 # look through all shapes within one resolution
-                if in_bbox((lng, lat), shp["bounds"]):
-                    # first check if point in bbox
-                    if p_in_polygon((lng, lat), shp):
-                        # ensure point is in polygon
-                        yield shp["properties"]
-                        # look for other overlaps
-
-    def search(self, lng, lat):
+                # first check if point in bbox, then ensure point is in polygon
+                if in_bbox((lng, lat), shp["bounds"]) and p_in_polygon((lng, lat), shp):
+                    yield shp
+                    # look for other overlaps
+
+    def search(self, lng, lat, where=None):
         """Reverse geocode lng/lat coordinate within the features from `self.shapes`.
 
         Look within the features from `self.shapes` for a polygon that
-        contains the point (lng, lat). From the first found feature the `porperties`
-        will be returned. `None`, if no feature containes the point.
+        contains the point (lng, lat). From the first (i.e. smallest) found
+        feature the `porperties` will be returned. `None`, if no feature containes the point.
+
+        With `where`, only features with the given `properties` are considered;
+        their shapes are filtered before any geometric test. If the index is
+        partitioned by one of the keys (see `GeoPIP(partition_by=...)`), only
+        the index of the partition is searched (the raster and trie are not used).
 
         Parameters:
             lng: float  Longitude (-180, 180) of point. (WGS84)
             lat: float  Latitude (-90, 90) of point. (WGS84)
+            where: Dict[str, Any]  Required values of `properties` (default: all features).
 
         Returns:
             Dict[Any, Any]  `Properties` of found feature. `None` if nothing is found.
         """
-        try:
-            return next(self.search_all(lng, lat))
-        except StopIteration:
+        if not (_MIN_LNG <= lng <= _MAX_LNG):
+            raise ValueError("Longitude must be between -180 and 180.")
+        if not (_MIN_LAT <= lat <= _MAX_LAT):
+            raise ValueError("Latitude must be between -90 and 90.")
+
+        if where is not None:
+            shp = next(self._where_shapes(lng, lat, where), None)
+            return None if shp is None else shp["properties"]
+
+        shapes = self._shapes  # one consistent snapshot of the index
+        properties = self._raster_lookup(shapes, lng, lat)
+        if properties is not AMBIGUOUS_CELL:
+            return properties
+
+        shp = self._first_shape(shapes, lng, lat)
+        if shp is None:
+            return None
+        if self._counting:
+            # concurrent searches might lose some counts, fine for an ordering
+            row = shp["feature"]
+            self._hits[row] = self._hits.get(row, 0) + 1
+        return shp["properties"]
+
+    def count_hits(self, enabled=True):
+        """Count the results of `search` per feature to adapt the index to the queries.
+
+        `reorder()` moves the shapes of the most hit features to the front of
+        their buckets, such that the containing shape is found with fewer point
+        in polygon tests. Counting is cheap, reordering is not: call `reorder`
+        outside of the query path, e.g. from a maintenance thread. Searches served
+        by the raster or the trie are neither counted nor affected.
+
+        Parameters:
+            enabled: bool  Count the hits (`False` stops counting; the counts are kept).
+        """
+        self._counting = bool(enabled)
+
+    def hit_counts(self):
+        """Number of `search` results by feature id (see `count_hits`).
+
+        Pass them to `save(filename, hits=...)` for a static ordering of the index.
+
+        Returns:
+            Dict[Any, int]  Hits of all features found at least once.
+        """
+        hits = self._hits
+        return {
+            fid: hits[row]
+            for fid, (row, _shps) in self._features.items()
+            if row in hits
+        }
+
+    def reorder(self, hits=None):
+        """Move the shapes of the most hit features to the front of their buckets.
+
+        The buckets are replaced one by one in the current index; concurrent
+        searches see either order, as both give the same results. Buckets changed
+        by later updates return to the order by area until the next reorder.
+
+        Parameters:
+            hits: Dict[Any, int]  Hits by feature id (default: the counted hits).
+        """
+        with self._lock:
+            if hits is not None:
+                self._hits = {self._row(fid): count for fid, count in hits.items()}
+            hits = self._hits
+            shapes = self._shapes
+            for key, bucket in list(shapes.items()):
+                if len(bucket) > 1 and any(shp["feature"] in hits for shp in bucket):
+                    shapes[key] = _hit_order(bucket, hits)
+            self._geohashes = (None, None)
+
+    def _row(self, fid):
+        """Row of the feature `fid` in `self.properties`."""
+        if fid not in self._features:
+            raise KeyError("Unknown feature id: {!r}".format(fid))
+        return self._features[fid][0]
+
+    def _where_shapes(self, lng, lat, where):
+        """Shapes containing (lng, lat) with the `properties` in `where` in search order."""
+        conditions = dict(where)
+        if self._partition_by is not None and self._partition_by in conditions:
+            partition = conditions.pop(self._partition_by)
+            shapes, probes = self._partitions.get(partition, ({}, []))
+        else:
+            shapes = self._shapes
+            probes = self._probes(shapes)
+        conditions = list(conditions.items())
+
+        p_in_polygon = self._backend.p_in_polygon
+        code = _hilbert.encode(lng, lat)
+        for shift, tag in probes:
+            for shp in shapes.get((code >> shift) | tag, ()):
+                properties = shp["properties"]
+                if (
+                    all(properties.get(key) == value for key, value in conditions)
+                    and in_bbox((lng, lat), shp["bounds"])
+                    and p_in_polygon((lng, lat), shp)
+                ):
+                    yield shp
+
+    def search_layers(self, lng, lat):
+        """Reverse geocode lng/lat coordinate within every layer of the index.
+
+        One search over the shared index (one geohash, one traversal of the
+        candidates) finds the first feature of every layer (see `search`).
+        Shapes of layers with a found feature are not tested anymore and the
+        search stops, once all layers have a feature.
+
+        Parameters:
+            lng: float  Longitude (-180, 180) of point. (WGS84)
+            lat: float  Latitude (-90, 90) of point. (WGS84)
+
+        Returns:
+            Dict[str, Dict[Any, Any]]  `properties` of the found feature for every
+                                       layer (`None`, if nothing is found).
+        """
+        if self._layers is None:
+            raise ValueError("The index has no layers.")
+        if not (_MIN_LNG <= lng <= _MAX_LNG):
+            raise ValueError("Longitude must be between -180 and 180.")
+        if not (_MIN_LAT <= lat <= _MAX_LAT):
+            raise ValueError("Latitude must be between -90 and 90.")
+
+        layers = self._layers
+        result = dict.fromkeys(layers)
+        missing = set(range(len(layers)))
+        for shp in self._layer_shapes(self._shapes, lng, lat, missing):
+            result[layers[shp["layer"]]] = shp["properties"]
+            missing.discard(shp["layer"])
+            if not missing:
+                break
+        return result
+
+    def _layer_shapes(self, shapes, lng, lat, missing):
+        """Shapes of the layers in `missing` containing (lng, lat) in search order."""
+        trie_shapes, trie = self._trie
+        if trie_shapes is shapes:
+            for shp in trie.find(lng, lat):
+                if shp["layer"] in missing:
+                    yield shp
+            return
+
+        p_in_polygon = self._backend.p_in_polygon
+        code = _hilbert.encode(lng, lat)
+        for shift, tag in self._probes(shapes):
+            for shp in shapes.get((code >> shift) | tag, ()):
+                if (
+                    shp["layer"] in missing
+                    and in_bbox((lng, lat), shp["bounds"])
+                    and p_in_polygon((lng, lat), shp)
+                ):
+                    yield shp
+
+    def rasterize(self, resolution):
+        """Precompute a grid of `resolution` degrees for constant time searches.
+
+        Every cell of the grid stores, whether it is empty, completely within
+        exactly one feature (and no other shape intersects it) or ambiguous.
+        `search` and `search_all` answer points in empty and covered cells with
+        a single array lookup and fall back to the exact search in ambiguous
+        cells (borders, overlaps), hence the results do not change. The grid
+        needs 2 bytes per cell (4 bytes for more than 65533 features), i.e.
+        13 MB for a resolution of 0.1 degrees. Updates of the features discard
+        the grid.
+
+        Parameters:
+            resolution: float  Width and height of the cells in degrees.
+
+        Returns:
+            Dict[str, int]  Number of `empty`, `ambiguous` and `covered` cells.
+        """
+        shapes = self._shapes
+        features = {shp["feature"] for shps in shapes.values() for shp in shps}
+        raster = Raster(resolution, len(features))
+        for shps in shapes.values():
+            for shp in shps:
+                polygons = self._backend.polygons(shp)
+                raster.add(shp["feature"], shp["properties"], polygons)
+        self._raster = (shapes, raster)
+        return raster.counts()
+
+    def build_trie(self, max_depth=4, clip=False):
+        """Build an adaptive trie over the geohash characters for fast searches.
+
+        Starting with the complete world, every geohash rectangle is split into
+        its 16 children, until all remaining shapes contain the complete
+        rectangle (or none is left) or `max_depth` is reached. Only the edges
+        within a rectangle are passed on to its children, hence the trie grows
+        only along the borders. Searches walk down the trie and test only the
+        shapes of the leaf: shapes containing the complete leaf without any
+        geometry test, the others with the exact point in polygon test. The
+        results do not change. Updates of the features discard the trie.
+
+        With `clip`, the shapes of mixed leaves are clipped to the leaf and the
+        point in polygon test only examines the edges of the fragment, i.e. the
+        edges near the point, instead of the complete (e.g. country) border.
+        This trades build time and memory for faster tests on detailed borders.
+
+        Parameters:
+            max_depth: int  Maximal depth, i.e. geohash length, of the trie. The
+                            leaves of depth 4 are about 1.4 x 0.7 degrees, every
+                            level divides them by 4.
+            clip: bool      Clip the shapes to the leaves.
+
+        Returns:
+            Dict[str, int]  Number of `nodes`, `leaves`, `mixed` leaves (with
+                            shapes requiring the exact test), `candidates`
+                            (shapes over all leaves) and `edges` (edges of the
+                            shapes, or fragments, over all mixed leaves).
+        """
+        shapes = self._shapes
+        trie = Trie(shapes, self._backend, max_depth, clip=clip)
+        self._trie = (shapes, trie)
+        return dict(trie.counts)
+
+    def configure(self, config):
+        """Apply a configuration of `tune`: build its raster and trie.
+
+        Previous rasters and tries are discarded.
+
+        Parameters:
+            config: Dict[str, Any]  `backend` (must be the backend of this
+                                    instance), `raster` (resolution or `None`)
+                                    and `trie` (`max_depth` and `clip` or `None`).
+        """
+        if config.get("backend", self.backend) != self.backend:
+            raise ValueError(
+                "The configuration requires the backend {!r}.".format(config["backend"])
+            )
+        self._configure(config)
+
+    def _configure(self, config):
+        self._raster = (None, None)
+        self._trie = (None, None)
+        if config.get("raster"):
+            self.rasterize(config["raster"])
+        if config.get("trie"):
+            self.build_trie(config["trie"]["max_depth"], clip=config["trie"]["clip"])
+
+    def tune(  # noqa: PLR0913
+        self,
+        lngs,
+        lats,
+        *,
+        memory_budget=None,
+        backends=None,
+        candidates=None,
+        batch=False,
+        repeat=3,
+    ):
+        """Find the fastest configuration for a representative sample of queries.
+
+        Every candidate (raster resolution and / or trie) is built for every
+        backend on a copy of the index and the sample is searched `repeat`
+        times (after one warm up run, which prepares the visited lazy shapes).
+        The fastest configuration, whose `memory_usage()` fits into the budget,
+        is returned; apply it with `configure` or persist it with
+        `save(filename, config=...)`, such that loading the file applies it.
+
+        Parameters:
+            lngs: Sequence[float]            Longitudes of the sample points.
+            lats: Sequence[float]            Latitudes of the sample points.
+            memory_budget: int               Maximal total memory in bytes
+                                             (default: unlimited).
+            backends: List[str]              Backends to try (default: all
+                                             available).
+            candidates: List[Dict[str, Any]]  Configurations (`raster`, `trie`) to
+                                             try (default: `TUNE_CANDIDATES`).
+            batch: bool                      Measure `search_batch` instead of
+                                             `search` per point.
+            repeat: int                      Number of timed runs (best counts).
+
+        Returns:
+            Tuple[Dict[str, Any], List[Dict[str, Any]]]  The best configuration and
+                the measurements (`config`, `points_per_second`, `memory`) of all
+                candidates, fastest first.
+        """
+        lngs, lats = _coordinates(lngs), _coordinates(lats)
+        if len(lngs) != len(lats) or not lngs:
+            raise ValueError(
+                "Same (positive) number of longitudes and latitudes required."
+            )
+        if backends is None:
+            backends = ["pure", "shapely"] if _shapely_backend() else ["pure"]
+        if candidates is None:
+            candidates = TUNE_CANDIDATES
+
+        with self._lock:
+            data = bytes(self._dumps())
+
+        results = []
+        for backend in backends:
+            geo = _unpickle(data, backend, self._keep, True, self._partition_by)
+            for candidate in candidates:
+                config = {"backend": backend, "raster": None, "trie": None}
+                config.update(candidate)
+                geo._configure(config)
+                results.append(
+                    {
+                        "config": config,
+                        "points_per_second": _throughput(
+                            geo, lngs, lats, batch, repeat
+                        ),
+                        "memory": geo.memory_usage()["total"],
+                    }
+                )
+
+        results.sort(key=lambda result: -result["points_per_second"])
+        for result in results:
+            if memory_budget is None or result["memory"] <= memory_budget:
+                return dict(result["config"]), results
+        raise ValueError("No configuration fits into the memory budget.")
+
+    def save(self, filename, config=None, hits=None):
+        """Write the index in the binary format (see `python -m geopip pack`).
+
+        Parameters:
+            filename: str           Path of the binary file.
+            config: Dict[str, Any]  Configuration (see `tune`) applied, when the
+                                    file is loaded.
+            hits: Dict[Any, int]    Hits by feature id (see `hit_counts`) to order
+                                    the buckets by, when the file is loaded.
+        """
+        with self._lock:
+            if config is None and hits is None:
+                data = self._dumps()
+            else:
+                if hits is not None:
+                    rows = [0] * len(self._properties)
+                    for fid, count in hits.items():
+                        rows[self._row(fid)] = count
+                    hits = rows
+                data = _store.dumps(*self._geojson_features(), config=config, hits=hits)
+        with open(filename, "wb") as f:
+            f.write(data)
+
+    def search_batch(self, lngs, lats, ordered=True):
+        """Reverse geocode many lng/lat coordinates at once.
+
+        Same result as `search` for every point, but returns the index of the
+        found feature, i.e. its row in `self.properties`, instead of creating
+        the `properties` for every point. Use `columns` to get the properties.
+
+        With NumPy, the raster (see `rasterize`) is looked up vectorized and the
+        shapely backend tests the remaining points of every rectangle of the
+        index with the vectorized `shapely.contains_xy` on the candidates of the
+        rectangle; the pure backend, the trie (see `build_trie`) and rectangles
+        with few points search them one by one. With `ordered`, these points are
+        searched in the order of their geohash (along the Hilbert curve), such
+        that consecutive points share the candidates of their geohash rectangle
+        and mostly hit the same polygons; the result is in the order of the
+        input either way.
+
+        Parameters:
+            lngs: Sequence[float]  Longitudes (-180, 180) of the points. (WGS84)
+            lats: Sequence[float]  Latitudes (-90, 90) of the points. (WGS84)
+            ordered: bool          Search the points in geohash order.
+
+        Returns:
+            numpy.ndarray  int64 feature index for every point (-1 if nothing is
+                           found); `array.array("q")` if NumPy is not installed.
+        """
+        np = _numpy()
+        if np is None:
+            return self._search_batch(lngs, lats, ordered)
+        if len(lngs) < _VECTORIZED_MIN_POINTS:
+            # NumPy costs more than it saves for a few points
+            return np.asarray(self._search_batch(lngs, lats, ordered), dtype=np.int64)
+        return self._search_batch_numpy(np, lngs, lats, ordered)
+
+    def _search_batch(self, lngs, lats, ordered):
+        lngs, lats = _coordinates(lngs), _coordinates(lats)
+        if len(lngs) != len(lats):
+            raise ValueError("Same number of longitudes and latitudes required.")
+
+        shapes = self._shapes  # one consistent snapshot of the index
+        raster_shapes, raster = self._raster
+        lookup = raster.lookup_feature if raster_shapes is shapes else None
+
+        result = array("q", [-1]) * len(lngs)
+        pending = []  # (code, idx, lng, lat) of points not found in the raster
+        for idx, (lng, lat) in enumerate(zip(lngs, lats)):  # noqa: B905 (py3.9)
+            if not (_MIN_LNG <= lng <= _MAX_LNG):
+                raise ValueError("Longitude must be between -180 and 180.")
+            if not (_MIN_LAT <= lat <= _MAX_LAT):
+                raise ValueError("Latitude must be between -90 and 90.")
+
+            feature = None if lookup is None else lookup(lng, lat)
+            if feature is None:
+                pending.append((_hilbert.encode(lng, lat), idx, lng, lat))
+            else:
+                result[idx] = feature
+
+        if ordered:
+            pending.sort()
+        points = ((lng, lat, code) for code, _idx, lng, lat in pending)
+        for (_code, idx, _lng, _lat), shp in zip(  # noqa: B905 (py3.9)
+            pending, self._first_shapes(shapes, points)
+        ):
+            if shp is not None:
+                result[idx] = shp["feature"]
+        return result
+
+    def _search_batch_numpy(self, np, lngs, lats, ordered):
+        lngs = np.asarray(lngs, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        if lngs.ndim != 1 or lngs.shape != lats.shape:
+            raise ValueError("Same number of longitudes and latitudes required.")
+        if not np.all((_MIN_LNG <= lngs) & (lngs <= _MAX_LNG)):
+            raise ValueError("Longitude must be between -180 and 180.")
+        if not np.all((_MIN_LAT <= lats) & (lats <= _MAX_LAT)):
+            raise ValueError("Latitude must be between -90 and 90.")
+
+        shapes = self._shapes  # one consistent snapshot of the index
+        raster_shapes, raster = self._raster
+        if raster_shapes is shapes:
+            result = raster.lookup_features(lngs, lats)
+        else:
+            result = np.full(len(lngs), UNKNOWN_FEATURE, dtype=np.int64)
+
+        unknown = np.flatnonzero(result == UNKNOWN_FEATURE)
+        lngs, lats = lngs[unknown], lats[unknown]
+        codes = _hilbert.encode_numpy(lngs, lats)
+        trie_shapes, _trie = self._trie
+        if self._backend.VECTORIZED and trie_shapes is not shapes:
+            result[unknown] = self._contains_batch(np, shapes, lngs, lats, codes)
+        else:
+            order = (
+                np.argsort(codes, kind="stable") if ordered else np.arange(len(codes))
+            )
+            result[unknown[order]] = self._first_features(
+                np, shapes, lngs[order], lats[order], codes[order]
+            )
+        return result
+
+    def _first_features(self, np, shapes, lngs, lats, codes):
+        """Feature of `_first_shapes` (or -1) for every point in the given order."""
+        points = zip(lngs.tolist(), lats.tolist(), codes.tolist())  # noqa: B905 (py3.9)
+        return np.fromiter(
+            (
+                -1 if shp is None else shp["feature"]
+                for shp in self._first_shapes(shapes, points)
+            ),
+            dtype=np.int64,
+            count=len(codes),
+        )
+
+    def _contains_batch(self, np, shapes, lngs, lats, codes):
+        """Feature of the first shape containing the points (or -1).
+
+        The points are grouped by their rectangle of the deepest level of the
+        index. The candidates of a large group (the shapes of all rectangles
+        containing it) are visited in search order and test all pending points
+        of the group within their bounding box at once; the points of small
+        groups are searched one by one.
+        """
+        result = np.full(len(lngs), -1, dtype=np.int64)
+        probes = self._probes(shapes)
+        if not probes:
+            return result
+
+        order = np.argsort(codes, kind="stable")
+        cells = codes[order] >> np.uint64(probes[0][0])
+        starts = np.flatnonzero(cells[1:] != cells[:-1]) + 1
+
+        small = []
+        for group in np.split(order, starts):
+            if len(group) < _VECTORIZED_MIN_POINTS:
+                small.append(group)
+                continue
+            code = int(codes[group[0]])
+            candidates = [
+                shp
+                for shift, tag in probes
+                for shp in shapes.get((code >> shift) | tag, ())
+            ]
+            result[group] = self._contains_group(
+                np, candidates, lngs[group], lats[group]
+            )
+
+        if small:
+            small = np.concatenate(small)
+            result[small] = self._first_features(
+                np, shapes, lngs[small], lats[small], codes[small]
+            )
+        return result
+
+    def _contains_group(self, np, candidates, lngs, lats):
+        """Feature of the first of the `candidates` containing the points (or -1)."""
+        result = np.full(len(lngs), -1, dtype=np.int64)
+        pending = np.ones(len(lngs), dtype=bool)
+        group_bounds = (lngs.min(), lats.min(), lngs.max(), lats.max())
+        contains_xy = self._backend.contains_xy
+        for shp in candidates:
+            minlng, minlat, maxlng, maxlat = bounds = shp["bounds"]
+            if not bbox_intersects(bounds, group_bounds):
+                continue
+            inside = np.flatnonzero(
+                pending
+                & (minlng <= lngs)
+                & (lngs <= maxlng)
+                & (minlat <= lats)
+                & (lats <= maxlat)
+            )
+            if len(inside) == 0:
+                continue
+            found = inside[contains_xy(shp, lngs[inside], lats[inside])]
+            result[found] = shp["feature"]
+            pending[found] = False
+            if not pending.any():
+                break
+        return result
+
+    def search_all_batch(self, lngs, lats):
+        """Find all features containing the points for many lng/lat coordinates.
+
+        Same result as `search_all` for every point in compressed sparse row
+        (CSR) format: the features of point `i` are
+        `indices[offsets[i]:offsets[i + 1]]` (in the order of `search_all`).
+
+        Parameters:
+            lngs: Sequence[float]  Longitudes (-180, 180) of the points. (WGS84)
+            lats: Sequence[float]  Latitudes (-90, 90) of the points. (WGS84)
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]  int64 `offsets` (one more than
+                                                 points) and feature `indices`.
+        """
+        lngs, lats = _coordinates(lngs), _coordinates(lats)
+        if len(lngs) != len(lats):
+            raise ValueError("Same number of longitudes and latitudes required.")
+
+        shapes = self._shapes  # one consistent snapshot of the index
+        offsets, indices = array("q", [0]), array("q")
+        for lng, lat in zip(lngs, lats):  # noqa: B905 (py3.9)
+            if not (_MIN_LNG <= lng <= _MAX_LNG):
+                raise ValueError("Longitude must be between -180 and 180.")
+            if not (_MIN_LAT <= lat <= _MAX_LAT):
+                raise ValueError("Latitude must be between -90 and 90.")
+
+            feature = self._raster_feature(shapes, lng, lat)
+            if feature is None:
+                indices.extend(
+                    shp["feature"] for shp in self._find_shapes(shapes, lng, lat)
+                )
+            elif feature >= 0:
+                indices.append(feature)
+            offsets.append(len(indices))
+        return _int_array(offsets), _int_array(indices)
+
+    def columns(self, indices, keys, default=None, numpy=False):
+        """Property columns for the feature indices of `search_batch`.
+
+        Parameters:
+            indices: Sequence[int]  Feature indices (-1 for nothing found).
+            keys: List[str]         Keys of the properties.
+            default: Any            Value for -1 and features without the key.
+            numpy: bool             Return NumPy arrays instead of lists.
+
+        Returns:
+            Dict[str, List[Any]]  Values of every key for all `indices`.
+        """
+        indices = _coordinates(indices)
+        result = {}
+        for key in keys:
+            values = self._properties.column(key, default=default)
+            values.append(default)  # for index -1
+            if numpy:
+                import numpy as np  # noqa: PLC0415
+
+                result[key] = np.array(values)[np.asarray(indices, dtype=np.int64)]
+            else:
+                result[key] = [values[idx] for idx in indices]
+        return result
+
+    def _raster_feature(self, shapes, lng, lat):
+        """Feature row from the raster of `shapes` (`None`, if unknown)."""
+        raster_shapes, raster = self._raster
+        if raster_shapes is not shapes:
             return None
+        return raster.lookup_feature(lng, lat)
+
+    def _raster_lookup(self, shapes, lng, lat):
+        """`properties` from the raster of `shapes` (`AMBIGUOUS_CELL`, if unknown)."""
+        raster_shapes, raster = self._raster
+        if raster_shapes is not shapes:
+            return AMBIGUOUS_CELL
+        return raster.lookup(lng, lat)
+
+    def _first_shape(self, shapes, lng, lat, code=None):
+        """First shape of `shapes` containing (lng, lat) in the order of `search_all`.
+
+        `code` is the (precomputed) `_hilbert.encode(lng, lat)`.
+        """
+        if code is None:
+            code = _hilbert.encode(lng, lat)
+        trie_shapes, trie = self._trie
+        if trie_shapes is shapes:
+            return next(trie.find(lng, lat, code), None)
+
+        p_in_polygon = self._backend.p_in_polygon
+        for shift, tag in self._probes(shapes):
+            for shp in shapes.get((code >> shift) | tag, ()):
+                if in_bbox((lng, lat), shp["bounds"]) and p_in_polygon((lng, lat), shp):
+                    return shp
+        return None
+
+    def _first_shapes(self, shapes, points):
+        """`_first_shape` for every (lng, lat, code) of `points`.
+
+        Consecutive points within the same rectangle of the deepest level of the
+        index reuse its candidates (all shapes of the rectangles containing it).
+        """
+        trie_shapes, trie = self._trie
+        if trie_shapes is shapes:
+            for lng, lat, code in points:
+                yield next(trie.find(lng, lat, code), None)
+            return
+
+        probes = self._probes(shapes)
+        deepest = probes[0][0] if probes else _hilbert.BITS
+        p_in_polygon = self._backend.p_in_polygon
+        cell, candidates = None, []
+        for lng, lat, code in points:
+            if code >> deepest != cell:
+                cell = code >> deepest
+                candidates = [
+                    shp
+                    for shift, tag in probes
+                    for shp in shapes.get((code >> shift) | tag, ())
+                ]
+            found = None
+            for shp in candidates:
+                if in_bbox((lng, lat), shp["bounds"]) and p_in_polygon((lng, lat), shp):
+                    found = shp
+                    break
+            yield found
+
+    def search_track(self, points, runs=False):
+        """Reverse geocode an ordered sequence of points (e.g. a GPS track).
+
+        Consecutive points of a track mostly fall into the same polygon. Hence,
+        the polygon found for the previous point is tested first and the index
+        is only searched, if it does not contain the point anymore. For
+        non-overlapping features the results equal `search` for every point;
+        for overlapping features a track stays within the previously found
+        feature as long as it contains the points.
+
+        Parameters:
+            points: Iterable[Tuple[float, float]]  Points (lng, lat) in WGS84.
+            runs: bool                             Return runs of points within
+                                                   the same feature instead of
+                                                   one result per point.
+
+        Returns:
+            List[Dict[Any, Any]]  `properties` of the found feature for every point
+                                  (`None` if nothing is found), or, if `runs`:
+            List[Tuple[int, int, Dict[Any, Any]]]  (start, end, properties) for every
+                                  run of points `points[start:end]` within the
+                                  same feature (`None` outside of all features).
+        """
+        shapes = self._shapes  # one consistent snapshot of the index
+        p_in_polygon = self._backend.p_in_polygon
+
+        matched = []
+        shp = None
+        for lng, lat in points:
+            if not (_MIN_LNG <= lng <= _MAX_LNG):
+                raise ValueError("Longitude must be between -180 and 180.")
+            if not (_MIN_LAT <= lat <= _MAX_LAT):
+                raise ValueError("Latitude must be between -90 and 90.")
+
+            if not (
+                shp is not None
+                and in_bbox((lng, lat), shp["bounds"])
+                and p_in_polygon((lng, lat), shp)
+            ):
+                shp = self._first_shape(shapes, lng, lat)
+            matched.append(shp)
+
+        if not runs:
+            return [None if shp is None else shp["properties"] for shp in matched]
+
+        result = []
+        start = 0
+        for idx in range(1, len(matched) + 1):
+            first = matched[start]
+            if idx < len(matched) and _same_feature(first, matched[idx]):
+                continue
+            result.append((start, idx, None if first is None else first["properties"]))
+            start = idx
+        return result
+
+    def _region_candidates(self, shapes, key):
+        """Shapes of `shapes`, whose geohash rectangle intersects the one of `key`.
+
+        These are all shapes within a geohash rectangle of `key` (geohashes with
+        prefix `key`) and all shapes in rectangles containing it (prefixes of `key`).
+        """
+        cached_shapes, keys = self._sorted_keys
+        if cached_shapes is not shapes:
+            keys = sorted(shapes)
+            self._sorted_keys = (shapes, keys)
+
+        level = _hilbert.level(key)
+        prefix = key ^ _hilbert.TAGS[level]
+        for sub_level in range(level, _hilbert.PRECISION + 1):
+            # keys of `sub_level` with prefix `key` are within [start, end)
+            shift = 4 * (sub_level - level)
+            start = _hilbert.TAGS[sub_level] + (prefix << shift)
+            end = _hilbert.TAGS[sub_level] + ((prefix + 1) << shift)
+            idx = bisect_left(keys, start)
+            while idx < len(keys) and keys[idx] < end:
+                yield from shapes[keys[idx]]
+                idx += 1
+        for sub_level in range(level):
+            shift = 4 * (level - sub_level)
+            yield from shapes.get((prefix >> shift) | _hilbert.TAGS[sub_level], ())
+
+    def search_geometry(self, geometry):
+        """Find all features intersecting the geojson `geometry`.
+
+        The geohash index restricts the candidates to the shapes within the
+        geohash rectangle of the bounding box of `geometry` or within rectangles
+        containing it; only their bounding boxes and then the shapes themselves
+        are tested against `geometry`.
+
+        Parameters:
+            geometry: Dict[str, Any]  Geojson geometry (`Point`, `LineString`,
+                                      `Polygon` and their `Multi` variants).
+
+        Returns:
+            Iterator[Dict[Any, Any]]  Iterator for `properties` of found features
+                                      (every feature at most once).
+        """
+        bounds = geometry_bounds(geometry)
+        query = self._backend.query_geometry(geometry)
+        intersects = self._backend.intersects
+
+        found = set()
+        shapes = self._shapes  # one consistent snapshot of the index
+        for shp in self._region_candidates(shapes, _hilbert.bbox_key(bounds)):
+            if shp["feature"] in found:
+                continue  # other polygon of a found feature
+            if bbox_intersects(shp["bounds"], bounds) and intersects(shp, query):
+                found.add(shp["feature"])
+                yield shp["properties"]
+
+    def search_bbox(self, minlng, minlat, maxlng, maxlat):
+        """Find all features intersecting the bounding box.
+
+        Parameters:
+            minlng: float  Minimal longitude (-180, 180). (WGS84)
+            minlat: float  Minimal latitude (-90, 90). (WGS84)
+            maxlng: float  Maximal longitude (-180, 180). (WGS84)
+            maxlat: float  Maximal latitude (-90, 90). (WGS84)
+
+        Returns:
+            Iterator[Dict[Any, Any]]  Iterator for `properties` of found features.
+        """
+        if not (_MIN_LNG <= minlng <= maxlng <= _MAX_LNG):
+            raise ValueError("Longitudes must be between -180 and 180 and min <= max.")
+        if not (_MIN_LAT <= minlat <= maxlat <= _MAX_LAT):
+            raise ValueError("Latitudes must be between -90 and 90 and min <= max.")
+
+        ring = [
+            (minlng, minlat),
+            (maxlng, minlat),
+            (maxlng, maxlat),
+            (minlng, maxlat),
+            (minlng, minlat),
+        ]
+        return self.search_geometry({"type": "Polygon", "coordinates": [ring]})
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Geohash-hilbert codes (16 characters of 4 bit) as 64 bit integers.
+#
+# The index uses `key`s of the geohash rectangles: the first `level` characters
+# (`4 * level` bits) of the code with a marker bit above them, i.e.
+#
+#     key = (code >> 4 * (PRECISION - level)) | (1 << 4 * level)
+#
+# Hence, keys of different levels are distinct, the key of the root rectangle
+# (empty geohash) is 1 and the level of a key follows from its bit length.
+from math import floor
+
+try:
+    from geohash_hilbert._hilbert_cython import MAX_BITS, xy2hash_cython
+except ImportError:
+    xy2hash_cython = None
+
+PRECISION = 16  # characters of the codes
+BITS = 4 * PRECISION
+_DIM = 1 << (BITS // 2)  # coding points per axis
+
+# marker bit and shift of the key for every level
+TAGS = tuple(1 << (4 * level) for level in range(PRECISION + 1))
+SHIFTS = tuple(4 * (PRECISION - level) for level in range(PRECISION + 1))
+
+if xy2hash_cython is not None and MAX_BITS < BITS:
+    xy2hash_cython = None
+
+
+def _xy2hash(x, y, dim):
+    """Hilbert code of the grid cell (x, y) (see `geohash_hilbert._hilbert`)."""
+    d = 0
+    lvl = dim >> 1
+    while lvl > 0:
+        rx = 1 if x & lvl else 0
+        ry = 1 if y & lvl else 0
+        d += lvl * lvl * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = lvl - 1 - x
+                y = lvl - 1 - y
+            x, y = y, x
+        lvl >>= 1
+    return d
+
+
+def encode(lng, lat):
+    """Code of the point (lng, lat), i.e. the geohash-hilbert of precision 16
+    (4 bits per character) as integer.
+
+    Parameters:
+        lng: float  Longitude (-180, 180) of point. (WGS84)
+        lat: float  Latitude (-90, 90) of point. (WGS84)
+
+    Returns:
+        int  64 bit code.
+    """
+    x = min(_DIM - 1, floor((lng + 180.0) / 360.0 * _DIM))
+    y = min(_DIM - 1, floor((lat + 90.0) / 180.0 * _DIM))
+    if xy2hash_cython is not None:
+        return xy2hash_cython(x, y, _DIM)
+    return _xy2hash(x, y, _DIM)
+
+
+def encode_numpy(lngs, lats):
+    """Vectorized `encode` for NumPy arrays of coordinates.
+
+    Returns:
+        numpy.ndarray  uint64 code for every point.
+    """
+    import numpy as np  # noqa: PLC0415
+
+    lngs = np.asarray(lngs, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    x = np.minimum(_DIM - 1, np.floor((lngs + 180.0) / 360.0 * _DIM)).astype(np.int64)
+    y = np.minimum(_DIM - 1, np.floor((lats + 90.0) / 180.0 * _DIM)).astype(np.int64)
+
+    d = np.zeros(x.shape, dtype=np.uint64)
+    lvl = _DIM >> 1
+    while lvl > 0:
+        rx = (x & lvl) != 0
+        ry = (y & lvl) != 0
+        d += np.uint64(lvl * lvl) * ((3 * rx) ^ ry).astype(np.uint64)
+        flip = ~ry & rx
+        x = np.where(flip, lvl - 1 - x, x)
+        y = np.where(flip, lvl - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        lvl >>= 1
+    return d
+
+
+def key(code, level):
+    """Key of the rectangle of `level` characters containing the point of `code`."""
+    return (code >> SHIFTS[level]) | TAGS[level]
+
+
+def level(key):
+    """Number of characters of the rectangle of `key`."""
+    return (key.bit_length() - 1) >> 2
+
+
+def _common_level(code1, code2):
+    """Length of the common prefix (in characters) of two codes."""
+    return PRECISION - (((code1 ^ code2).bit_length() + 3) >> 2)
+
+
+def _clamp(bbox):
+    minlng, minlat, maxlng, maxlat = bbox
+    return max(-180, minlng), max(-90, minlat), min(180, maxlng), min(90, maxlat)
+
+
+def bbox_key(bbox):
+    """Key of the smallest rectangle covering the complete bbox.
+
+    Parameters:
+        bbox: Tuple[float, float, float, float]  Bounding box, (minlng, minlat, maxlng, maxlat)
+
+    Returns:
+        int  Key of the rectangle.
+    """
+    minlng, minlat, maxlng, maxlat = _clamp(bbox)
+    ll = encode(minlng, minlat)
+    ur = encode(maxlng, maxlat)
+    return key(ll, _common_level(ll, ur))
+
+
+def bbox_keys(bboxes):
+    """`bbox_key` for many bounding boxes (vectorized, if NumPy is installed).
+
+    Parameters:
+        bboxes: List[Tuple[float, float, float, float]]  Bounding boxes.
+
+    Returns:
+        List[int]  Key of the rectangle of every bounding box.
+    """
+    try:
+        import numpy as np  # noqa: PLC0415
+    except ImportError:
+        return [bbox_key(bbox) for bbox in bboxes]
+
+    bounds = np.array([_clamp(bbox) for bbox in bboxes], dtype=np.float64)
+    bounds = bounds.reshape(-1, 4)
+    ll = encode_numpy(bounds[:, 0], bounds[:, 1])
+    ur = encode_numpy(bounds[:, 2], bounds[:, 3])
+    diff = ll ^ ur
+    levels = np.zeros(len(bounds), dtype=np.int64)
+    for lvl in range(1, PRECISION + 1):
+        levels += (diff >> np.uint64(SHIFTS[lvl])) == 0
+    return [key(code, lvl) for code, lvl in zip(ll.tolist(), levels.tolist())]  # noqa: B905 (py3.9)
+
+
+def geohash(key):
+    """Geohash (4 bits per character) of the rectangle of `key`."""
+    lvl = level(key)
+    if lvl == 0:
+        return ""
+    return format(key ^ TAGS[lvl], "0{}x".format(lvl))
+
+
+def from_geohash(geohash):
+    """Key of the rectangle of `geohash` (4 bits per character)."""
+    return int(geohash, 16) | TAGS[len(geohash)] if geohash else TAGS[0]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Approximate memory usage of python objects (see `GeoPIP.memory_usage`).
+#
+# `sys.getsizeof` only counts the object itself; `deep_size` follows the items
+# of containers. Every object is counted once: objects in `seen` (e.g. interned
+# strings or shapes counted before) are skipped.
+import sys
+
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+_KIB = 1024
+
+
+def deep_size(obj, seen):
+    """Bytes of `obj` and all items of (nested) containers not in `seen`.
+
+    Objects, that are not builtin containers, are not followed (only their own
+    size is counted).
+
+    Parameters:
+        obj: Any       The object.
+        seen: Set[int]  `id`s of already counted objects (updated).
+
+    Returns:
+        int  Size in bytes.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, _CONTAINERS):
+            stack.extend(obj)
+    return size
+
+
+def human(size):
+    """`size` in bytes as human readable string (e.g. `1.5 MiB`)."""
+    if size < _KIB:
+        return "{} B".format(size)
+    for unit in ("KiB", "MiB"):
+        size /= _KIB
+        if size < _KIB:
+            return "{:.1f} {}".format(size, unit)
+    return "{:.1f} GiB".format(size / _KIB)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+import sys
+from collections.abc import Mapping
+
+from ._memory import deep_size
+
+
+def _intern(value):
+    """Intern strings, return everything else unchanged."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class PropertyTable(object):
+    """Compact storage of the `properties` of features.
+
+    Every feature is one row of the table. Only the keys from `keys` are kept
+    (all keys, if `keys` is `None`) and string values are interned, such that
+    repeated values (e.g. region names) are only stored once. A row is stored
+    sparsely as its schema (the keys present in the row, shared by all rows
+    with the same keys) and the tuple of its values, hence rows only pay for
+    their own keys, also for datasets with a large vocabulary of keys (e.g.
+    OpenStreetMap tags).
+    """
+
+    def __init__(self, keys=None):
+        """Create an empty table.
+
+        Parameters:
+            keys: List[str]  Keys of the properties to keep (default: all).
+        """
+        self._keys = None if keys is None else frozenset(keys)
+        self._schemas = {}  # keys of a row -> (keys, key -> position)
+        self._columns = {}  # key -> None, all keys in the order of appearance
+        self._rows = []  # (schema, values) per row
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def nbytes(self):
+        """Approximate size of the rows in bytes (shared values counted once)."""
+        seen = set()
+        return deep_size(self._rows, seen) + deep_size(self._columns, seen)
+
+    @property
+    def keys(self):
+        """Keys of all columns in the order of their first appearance."""
+        return list(self._columns)
+
+    def append(self, properties):
+        """Add the `properties` of a feature as new row.
+
+        Parameters:
+            properties: Dict[str, Any]  `properties` of a geojson feature (may be `None`).
+
+        Returns:
+            int: Index of the new row.
+        """
+        # a single append: views might read the rows concurrently
+        self._rows.append(self._entry(properties))
+        return len(self._rows) - 1
+
+    def stage(self, idx, properties):
+        """View of row `idx` with new `properties` (e.g. of an updated feature).
+
+        The row itself is unchanged until the view is passed to `commit`.
+
+        Parameters:
+            idx: int                    Index of the row.
+            properties: Dict[str, Any]  New `properties` (may be `None`).
+
+        Returns:
+            PropertyView: Mapping of the new properties.
+        """
+        if not (0 <= idx < len(self._rows)):
+            raise IndexError("Row index out of range.")
+        return PropertyView(self, idx, self._entry(properties))
+
+    def commit(self, view):
+        """Store the properties of the staged `view` (see `stage`) in its row."""
+        self._rows[view._row] = view._entry
+
+    def _entry(self, properties):
+        """(schema, values) of the kept `properties`."""
+        properties = properties or {}
+
+        keys, values = [], []
+        for key, value in properties.items():
+            if self._keys is None or key in self._keys:
+                keys.append(_intern(key))
+                values.append(_intern(value))
+
+        keys = tuple(keys)
+        schema = self._schemas.get(keys)
+        if schema is None:
+            schema = (keys, {key: pos for pos, key in enumerate(keys)})
+            self._schemas[keys] = schema
+            for key in keys:
+                self._columns.setdefault(key, None)
+        return schema, tuple(values)
+
+    def row(self, idx):
+        """Read-only `properties` view of row `idx`.
+
+        Parameters:
+            idx: int  Index of the row.
+
+        Returns:
+            PropertyView: Mapping of the properties of the feature in row `idx`.
+        """
+        if not (0 <= idx < len(self._rows)):
+            raise IndexError("Row index out of range.")
+        return PropertyView(self, idx, self._rows[idx])
+
+    def column(self, key, default=None):
+        """All values of the column `key`.
+
+        Parameters:
+            key: str      Key of the column.
+            default: Any  Value for rows, that do not have `key` (or unknown `key`).
+
+        Returns:
+            List[Any]: Value of `key` for every row.
+        """
+        column = []
+        for (_keys, positions), values in self._rows:
+            pos = positions.get(key)
+            column.append(default if pos is None else values[pos])
+        return column
+
+
+class PropertyView(Mapping):
+    """Read-only view onto one row of a `PropertyTable`.
+
+    Behaves like the (projected) `properties` dict of the feature: it can be
+    compared to dicts and converted with `dict(view)`. A view keeps the
+    properties of the row at its creation, later replacements of the row do
+    not change it.
+    """
+
+    __slots__ = ("_entry", "_row", "_table")
+
+    def __init__(self, table, row, entry):
+        self._table = table
+        self._row = row
+        self._entry = entry  # (schema, values) of the row
+
+    def __getitem__(self, key):
+        (_keys, positions), values = self._entry
+        return values[positions[key]]
+
+    def __iter__(self):
+        (keys, _positions), _values = self._entry
+        return iter(keys)
+
+    def __len__(self):
+        (keys, _positions), _values = self._entry
+        return len(keys)
+
+    def __repr__(self):
+        return repr(dict(self))
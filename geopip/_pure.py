@@ -22,41 +22,121 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
-from ._geo_fkt import bbox
+import threading
+
+from ._geo_fkt import (
+    area,
+    bbox,
+    bbox_intersects,
+    clip_polygon,
+    convex_vertices,
+    geometry_bounds,
+    geometry_parts,
+    hole_index,
+    p_in_convex,
+    p_in_polygon_indexed,
+    polygon_intersects,
+)
 from ._geo_fkt import p_in_polygon as pure_p_in_polygon
+from ._memory import deep_size
+
+_LOCK = threading.Lock()
+
+# the index contains one shape per polygon of a MultiPolygon
+MULTIPOLYGON_PARTS = True
+
+# no vectorized `contains_xy()`
+VECTORIZED = False
+
+# convex polygons with at least this many vertices are tested in O(log n)
+_CONVEX_MIN_VERTICES = 8
+
+# polygons with at least this many holes only test the holes near the point
+_INDEXED_HOLES = 8
+
+
+def _convex(polygon):
+    """Vertices for `p_in_convex`, if `polygon` is large, convex and has no holes."""
+    rings = polygon["coordinates"]
+    if len(rings) != 1 or len(rings[0]) <= _CONVEX_MIN_VERTICES:
+        return None
+    return convex_vertices(rings[0])
 
 
-def prepare(feat):
+def _holes(polygon):
+    """`hole_index` of `polygon`, if it has many holes."""
+    rings = polygon["coordinates"]
+    if len(rings) <= _INDEXED_HOLES:
+        return None
+    return hole_index(rings)
+
+
+def prepare(feat, lazy=False):
     """Prepare geojson feature for further processing in `geopip._pure.p_in_polygon()`
 
     Parameters:
         feat: Dict[str, Any]  Geojson feature (only Polygon and MultiPolygon will
                               be processed).
+        lazy: bool            Only compute `bounds` and `area`, defer the preparation
+                              of the `shape` to the first `p_in_polygon()` call.
 
     Returns:
         List[Dict[str, Any]]  Prepared shapes for `geopip._pure.p_in_polygon()`
     """
     shp = feat["geometry"]
-    res = []
     if shp["type"] == "MultiPolygon":
-        for p_coords in shp["coordinates"]:
-            polygon = {"type": "Polygon", "coordinates": p_coords}
-            res += [
-                {
-                    "shape": polygon,
-                    "properties": feat["properties"],
-                    "bounds": bbox(polygon),
-                }
-            ]
+        polygons = [
+            {"type": "Polygon", "coordinates": p_coords}
+            for p_coords in shp["coordinates"]
+        ]
     elif shp["type"] == "Polygon":
-        res += [{"shape": shp, "properties": feat["properties"], "bounds": bbox(shp)}]
+        polygons = [shp]
+    else:
+        polygons = []
+
+    res = []
+    for polygon in polygons:
+        shp = {
+            "shape": polygon,
+            "properties": feat["properties"],
+            "bounds": bbox(polygon),
+            "area": area(polygon["coordinates"]),
+        }
+        if lazy:
+            shp["shape"], shp["geometry"] = None, polygon
+        else:
+            shp["convex"], shp["holes"] = _convex(polygon), _holes(polygon)
+        res += [shp]
     return res
 
 
+def materialize(shp):
+    """Prepare the `shape` of a lazily prepared shape dictionary (thread-safe).
+
+    The `geometry` of the shape is either a geojson geometry or a function
+    loading it.
+
+    Parameters:
+        shp: Dict[str, Any]  Shape dictionary from `geopip._pure.prepare()`.
+
+    Returns:
+        Dict[str, Any]  The prepared `shape`.
+    """
+    with _LOCK:
+        if shp["shape"] is None:
+            geometry = shp.pop("geometry")
+            polygon = geometry() if callable(geometry) else geometry
+            # before publishing the shape
+            shp["convex"], shp["holes"] = _convex(polygon), _holes(polygon)
+            shp["shape"] = polygon
+    return shp["shape"]
+
+
 def p_in_polygon(p, shp):
     """Test, whether point `p` is in shape `shp`.
 
-    Use the pure python implementation.
+    Use the pure python implementation (in O(log n) for convex polygons, only
+    the holes near `p` for polygons with many holes).
 
     Parameters:
         p:   Tuple[float, float]  Point (lng, lat) in WGS84.
@@ -65,4 +145,112 @@ def p_in_polygon(p, shp):
     Returns:
         boolean: True, if p in shp, False otherwise
     """
-    return pure_p_in_polygon(p, shp["shape"]["coordinates"])
+    polygon = shp["shape"]
+    if polygon is None:
+        polygon = materialize(shp)
+    vertices = shp["convex"]
+    if vertices is not None:
+        inside = p_in_convex(p, vertices)
+        if inside is not None:
+            return inside
+    holes = shp["holes"]
+    if holes is not None:
+        return p_in_polygon_indexed(p, polygon["coordinates"], holes)
+    return pure_p_in_polygon(p, polygon["coordinates"])
+
+
+def memory_usage(shp, seen):
+    """Approximate bytes of the coordinates and the geometry objects of `shp`.
+
+    Lazy shapes of binary files only hold a function loading the geometry (the
+    coordinates are in the file).
+
+    Parameters:
+        shp: Dict[str, Any]  Prepared shape dictionary from `geopip._pure.prepare()`.
+        seen: Set[int]       `id`s of already counted objects (see `deep_size`).
+
+    Returns:
+        Tuple[int, int]  Bytes of the coordinates and of the geometry objects.
+    """
+    polygon = shp["shape"]
+    if polygon is None:
+        polygon = shp["geometry"]
+        if callable(polygon):
+            return 0, deep_size(polygon, seen)
+    coordinates = deep_size(polygon["coordinates"], seen)
+    objects = deep_size(polygon, seen) + deep_size(shp.get("convex"), seen)
+    return coordinates, objects + deep_size(shp.get("holes"), seen)
+
+
+def polygons(shp):
+    """Coordinates of the polygons of shape `shp`.
+
+    Parameters:
+        shp: Dict[str, Any]  Prepared shape dictionary from `geopip._pure.prepare()`.
+
+    Returns:
+        List[List[List[Tuple[float, float]]]]  Polygons, i.e. lists of rings.
+    """
+    polygon = shp["shape"]
+    if polygon is None:
+        polygon = materialize(shp)
+    return [polygon["coordinates"]]
+
+
+def clip(shp, bounds):
+    """Clip shape `shp` to the rectangle `bounds` for `geopip._pure.p_in_fragment()`.
+
+    Parameters:
+        shp: Dict[str, Any]                        Prepared shape dictionary from
+                                                   `geopip._pure.prepare()`.
+        bounds: Tuple[float, float, float, float]  Rectangle (minlng, minlat, maxlng, maxlat).
+
+    Returns:
+        List[List[List[Tuple[float, float]]]]  The clipped polygons.
+    """
+    clipped = (clip_polygon(polygon, bounds) for polygon in polygons(shp))
+    return [polygon for polygon in clipped if polygon]
+
+
+def p_in_fragment(p, fragment):
+    """Test, whether point `p` (within the clip rectangle) is in the clipped shape.
+
+    Parameters:
+        p: Tuple[float, float]  Point (lng, lat) in WGS84.
+        fragment: List          Clipped shape from `geopip._pure.clip()`.
+
+    Returns:
+        boolean: True, if p in the shape, False otherwise
+    """
+    return any(pure_p_in_polygon(p, polygon) for polygon in fragment)
+
+
+def query_geometry(geometry):
+    """Prepare a geojson geometry for `geopip._pure.intersects()`.
+
+    Parameters:
+        geometry: Dict[str, Any]  Geojson geometry (no `GeometryCollection`).
+
+    Returns:
+        Tuple  Bounding box, points, lines and polygons of the geometry.
+    """
+    return (geometry_bounds(geometry), *geometry_parts(geometry))
+
+
+def intersects(shp, query):
+    """Test, whether shape `shp` intersects the query geometry.
+
+    Parameters:
+        shp: Dict[str, Any]  Prepared shape dictionary from `geopip._pure.prepare()`.
+        query: Tuple         Query geometry from `geopip._pure.query_geometry()`.
+
+    Returns:
+        boolean: True, if shp and the geometry intersect, False otherwise
+    """
+    bounds, points, lines, polygons = query
+    if not bbox_intersects(shp["bounds"], bounds):
+        return False
+    polygon = shp["shape"]
+    if polygon is None:
+        polygon = materialize(shp)
+    return polygon_intersects(polygon["coordinates"], bounds, points, lines, polygons)
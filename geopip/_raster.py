@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Fixed resolution lookup table of the features covering lng/lat cells.
+#
+# Every cell of the grid is either empty (no shape intersects it), completely
+# within exactly one feature (and no other shape intersects it) or ambiguous.
+# Only ambiguous cells (borders, overlaps) need the exact search.
+import math
+from array import array
+
+EMPTY = 0
+AMBIGUOUS = 1
+_FIRST = 2  # value of the first feature
+UNKNOWN_FEATURE = -2  # feature of ambiguous cells in `Raster.lookup_features()`
+
+_EPS = 1e-9  # border cells are widened by this to be robust against rounding
+_MAX_UINT16 = 0xFFFF
+
+
+class _Ambiguous(object):
+    """Marker for cells, that require the exact search."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<ambiguous>"
+
+
+AMBIGUOUS_CELL = _Ambiguous()
+
+
+def _edges(polygon):
+    """All edges (x1, y1, x2, y2) of the rings of `polygon` with y1 <= y2."""
+    for ring in polygon:
+        for i in range(len(ring) - 1):
+            (x1, y1), (x2, y2) = ring[i], ring[i + 1]
+            if y1 > y2:
+                yield x2, y2, x1, y1
+            else:
+                yield x1, y1, x2, y2
+
+
+class Raster(object):
+    """Grid of `resolution` degrees with the feature covering every cell."""
+
+    def __init__(self, resolution, features):
+        """Create an empty grid.
+
+        Parameters:
+            resolution: float  Width and height of the cells in degrees.
+            features: int      Number of features to be added (the cells are
+                               stored as uint16, if possible, else uint32).
+        """
+        if not resolution > 0:
+            raise ValueError("Resolution must be positive.")
+
+        self.resolution = float(resolution)
+        self.cols = math.ceil(360 / self.resolution)
+        self.rows = math.ceil(180 / self.resolution)
+        typecode = "H" if features + _FIRST <= _MAX_UINT16 else "I"
+        self.cells = array(typecode, [EMPTY]) * (self.rows * self.cols)
+        # `properties` and feature row for every cell value
+        self.properties = [None, AMBIGUOUS_CELL]
+        self.features = [-1, None]
+        self._values = {}  # feature row -> cell value
+
+    @property
+    def nbytes(self):
+        """Size of the grid in bytes."""
+        return self.cells.itemsize * len(self.cells)
+
+    def _col(self, lng):
+        return min(max(int((lng + 180) / self.resolution), 0), self.cols - 1)
+
+    def _row(self, lat):
+        return min(max(int((lat + 90) / self.resolution), 0), self.rows - 1)
+
+    def add(self, feature, properties, polygons):
+        """Add the polygons of one shape.
+
+        Parameters:
+            feature: int                  Row of the feature of the shape.
+            properties: Dict[Any, Any]    `properties` of the feature.
+            polygons: List[List[List[Tuple[float, float]]]]  Polygons of the shape.
+        """
+        value = self._values.get(feature)
+        if value is None:
+            value = self._values[feature] = len(self.properties)
+            self.properties.append(properties)
+            self.features.append(feature)
+
+        cells = self.cells
+        for polygon in polygons:
+            border = self._border(polygon)
+            for idx in border:
+                cells[idx] = AMBIGUOUS
+            for idx in self._interior(polygon, border):
+                current = cells[idx]
+                if current == EMPTY:
+                    cells[idx] = value
+                elif current != value:
+                    cells[idx] = AMBIGUOUS  # overlapping features
+
+    def _border(self, polygon):
+        """Indices of all cells touched by an edge of `polygon`."""
+        res, cols = self.resolution, self.cols
+        border = set()
+        for x1, y1, x2, y2 in _edges(polygon):
+            slope = (x2 - x1) / (y2 - y1) if y1 != y2 else 0.0
+            for row in range(self._row(y1 - _EPS), self._row(y2 + _EPS) + 1):
+                # part of the edge within the latitudes of the row
+                lo = max(y1, -90 + row * res)
+                hi = min(y2, -90 + (row + 1) * res)
+                xa, xb = x1 + (lo - y1) * slope, x1 + (hi - y1) * slope
+                if y1 == y2:
+                    xa, xb = x1, x2
+                if xa > xb:
+                    xa, xb = xb, xa
+                base = row * cols
+                border.update(
+                    range(base + self._col(xa - _EPS), base + self._col(xb + _EPS) + 1)
+                )
+        return border
+
+    def _crossings(self, polygon):
+        """Longitudes, where the edges of `polygon` cross the center line of a row."""
+        res, rows = self.resolution, self.rows
+        crossings = {}  # row -> lngs
+        for x1, y1, x2, y2 in _edges(polygon):
+            if y1 == y2:
+                continue
+            row = max(0, math.ceil((y1 + 90) / res - 0.5))
+            while row < rows:
+                center = -90 + (row + 0.5) * res
+                if center >= y2:
+                    break
+                if center >= y1:
+                    lng = x1 + (center - y1) * (x2 - x1) / (y2 - y1)
+                    crossings.setdefault(row, []).append(lng)
+                row += 1
+        return crossings
+
+    def _interior(self, polygon, border):
+        """Indices of all cells within `polygon`, that are not in `border`.
+
+        Such a cell is not touched by any edge, hence it is completely inside
+        the polygon, if its center is.
+        """
+        res, cols = self.resolution, self.cols
+        for row, lngs in self._crossings(polygon).items():
+            lngs.sort()
+            base = row * cols
+            for i in range(0, len(lngs) - 1, 2):
+                start, end = lngs[i], lngs[i + 1]
+                col = max(0, math.ceil((start + 180) / res - 0.5))
+                while col < cols and -180 + (col + 0.5) * res < end:
+                    if base + col not in border:
+                        yield base + col
+                    col += 1
+
+    def lookup(self, lng, lat):
+        """`properties` of the feature covering the cell of (lng, lat).
+
+        Returns:
+            Dict[Any, Any]  `properties` of the feature, `None` for empty cells or
+                            `AMBIGUOUS_CELL`, if the exact search is required.
+        """
+        return self.properties[self.cells[self._row(lat) * self.cols + self._col(lng)]]
+
+    def lookup_feature(self, lng, lat):
+        """Row of the feature covering the cell of (lng, lat).
+
+        Returns:
+            int  Row of the feature, -1 for empty cells or `None`, if the exact
+                 search is required.
+        """
+        return self.features[self.cells[self._row(lat) * self.cols + self._col(lng)]]
+
+    def lookup_features(self, lngs, lats):
+        """Vectorized `lookup_feature` for NumPy arrays (`UNKNOWN_FEATURE` instead of `None`)."""
+        import numpy as np  # noqa: PLC0415
+
+        cols = ((lngs + 180) / self.resolution).astype(np.int64)
+        rows = ((lats + 90) / self.resolution).astype(np.int64)
+        np.clip(cols, 0, self.cols - 1, out=cols)
+        np.clip(rows, 0, self.rows - 1, out=rows)
+
+        cells = np.frombuffer(self.cells, dtype=self.cells.typecode)
+        features = np.array(
+            [
+                UNKNOWN_FEATURE if feature is None else feature
+                for feature in self.features
+            ],
+            dtype=np.int64,
+        )
+        return features[cells[rows * self.cols + cols]]
+
+    def counts(self):
+        """Number of empty, ambiguous and covered cells."""
+        empty = self.cells.count(EMPTY)
+        ambiguous = self.cells.count(AMBIGUOUS)
+        return {
+            "empty": empty,
+            "ambiguous": ambiguous,
+            "covered": len(self.cells) - empty - ambiguous,
+        }
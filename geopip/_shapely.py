@@ -22,33 +22,119 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
-from shapely.geometry import Point, shape
+import sys
+import threading
+
+import shapely
+from shapely.geometry import Point, box, mapping, shape
 from shapely.prepared import prep
 
+from ._geo_fkt import area, bbox, geometry_parts
+from ._memory import deep_size
+
+_LOCK = threading.Lock()
+
+# the index contains one shape per polygon of a MultiPolygon
+MULTIPOLYGON_PARTS = False
+
+# provides the vectorized `contains_xy()`
+VECTORIZED = True
+
+# estimated GEOS memory per coordinate: xy doubles and the segment index of
+# prepared geometries (built on the first point in polygon test)
+_COORDINATE_BYTES = 16
+_INDEX_BYTES = 48
+
+# huge MultiPolygons (many parts and coordinates) only test the parts near the
+# point: the prepared geometry tests all edges crossing the ray from the point
+_INDEXED_PARTS = 64
+_INDEXED_COORDINATES = 500000
+
+
+def _parts(geometry):
+    """STRtree and prepared parts of `geometry`, if it is a huge MultiPolygon."""
+    if (
+        geometry.geom_type != "MultiPolygon"
+        or len(geometry.geoms) < _INDEXED_PARTS
+        or shapely.get_num_coordinates(geometry) < _INDEXED_COORDINATES
+    ):
+        return None
+    parts = list(geometry.geoms)
+    return shapely.STRtree(parts), [prep(part) for part in parts]
+
 
-def prepare(feat):
+def prepare(feat, lazy=False):
     """Prepare geojson feature for further processing in `geopip._shapely.p_in_polygon()`
 
     Parameters:
         feat: Dict[str, Any]  Geojson feature (only Polygon and MultiPolygon will
                               be processed).
+        lazy: bool            Only compute `bounds` and `area` (in pure python), defer
+                              the shapely geometry and its preparation to the first
+                              `p_in_polygon()` call.
 
     Returns:
         List[Dict[str, Any]]  Prepared shapes for `geopip._shapely.p_in_polygon()`
     """
-    if feat["geometry"]["type"] in ("Polygon", "MultiPolygon"):
-        shp = shape(feat["geometry"])
+    geometry = feat["geometry"]
+    if geometry["type"] not in ("Polygon", "MultiPolygon"):
+        return []
+
+    if lazy:
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        else:
+            polygons = geometry["coordinates"]
         return [
-            {"shape": prep(shp), "properties": feat["properties"], "bounds": shp.bounds}
+            {
+                "shape": None,
+                "geometry": geometry,
+                "properties": feat["properties"],
+                "bounds": bbox(geometry),
+                "area": sum(area(polygon) for polygon in polygons),
+            }
         ]
-    else:
-        return []
+
+    shp = shape(geometry)
+    return [
+        {
+            "shape": prep(shp),
+            "parts": _parts(shp),
+            "properties": feat["properties"],
+            "bounds": shp.bounds,
+            "area": shp.area,
+        }
+    ]
+
+
+def materialize(shp):
+    """Prepare the `shape` of a lazily prepared shape dictionary (thread-safe).
+
+    The `geometry` of the shape is either a geojson geometry or a function
+    loading it.
+
+    Parameters:
+        shp: Dict[str, Any]  Shape dictionary from `geopip._shapely.prepare()`.
+
+    Returns:
+        PreparedGeometry  The prepared `shape`.
+    """
+    with _LOCK:
+        if shp["shape"] is None:
+            geometry = shp.pop("geometry")
+            if callable(geometry):
+                geometry = geometry()
+            geometry = shape(geometry)
+            shp["parts"] = _parts(geometry)  # before publishing the shape
+            shp["shape"] = prep(geometry)
+    return shp["shape"]
 
 
 def p_in_polygon(p, shp):
     """Test, whether point `p` is in shape `shp`.
 
-    Use the shapely implementation.
+    Use the shapely implementation (only the parts near `p` for MultiPolygons
+    with many parts).
 
     Parameters:
         p: Tuple[float, float]  Point (lng, lat) in WGS84.
@@ -57,4 +143,135 @@ def p_in_polygon(p, shp):
     Returns:
         boolean: True, if p in shp, False otherwise
     """
-    return shp["shape"].contains(Point(*p))
+    prepared = shp["shape"]
+    if prepared is None:
+        prepared = materialize(shp)
+    point = Point(*p)
+    parts = shp["parts"]
+    if parts is not None:
+        tree, prepared_parts = parts
+        return any(prepared_parts[idx].contains(point) for idx in tree.query(point))
+    return prepared.contains(point)
+
+
+def contains_xy(shp, lngs, lats):
+    """Vectorized `p_in_polygon()` for NumPy arrays of coordinates.
+
+    Parameters:
+        shp: Dict[str, Any]   Prepared shape dictionary from `geopip._shapely.prepare()`.
+        lngs: numpy.ndarray  Longitudes of the points.
+        lats: numpy.ndarray  Latitudes of the points.
+
+    Returns:
+        numpy.ndarray  Boolean array, True for points in shp.
+    """
+    prepared = shp["shape"]
+    if prepared is None:
+        prepared = materialize(shp)
+    return shapely.contains_xy(prepared.context, lngs, lats)
+
+
+def memory_usage(shp, seen):
+    """Approximate bytes of the coordinates and the geometry objects of `shp`.
+
+    The memory of GEOS is not visible to python; it is estimated from the number
+    of coordinates. Lazy shapes of binary files only hold a function loading the
+    geometry (the coordinates are in the file).
+
+    Parameters:
+        shp: Dict[str, Any]  Prepared shape dictionary from `geopip._shapely.prepare()`.
+        seen: Set[int]       `id`s of already counted objects (see `deep_size`).
+
+    Returns:
+        Tuple[int, int]  Bytes of the coordinates and of the geometry objects.
+    """
+    prepared = shp["shape"]
+    if prepared is None:
+        geometry = shp["geometry"]
+        if callable(geometry):
+            return 0, deep_size(geometry, seen)
+        coordinates = deep_size(geometry["coordinates"], seen)
+        return coordinates, deep_size(geometry, seen)
+
+    if id(prepared) in seen:
+        return 0, 0
+    seen.update((id(prepared), id(prepared.context)))
+    count = int(shapely.get_num_coordinates(prepared.context))
+    objects = sys.getsizeof(prepared) + sys.getsizeof(prepared.context)
+    if shp["parts"] is not None:
+        count *= 2  # copies of the parts
+        objects += sum(sys.getsizeof(part) for part in shp["parts"][1])
+    return count * _COORDINATE_BYTES, objects + count * _INDEX_BYTES
+
+
+def polygons(shp):
+    """Coordinates of the polygons of shape `shp`.
+
+    Parameters:
+        shp: Dict[str, Any]  Prepared shape dictionary from `geopip._shapely.prepare()`.
+
+    Returns:
+        List[List[List[Tuple[float, float]]]]  Polygons, i.e. lists of rings.
+    """
+    prepared = shp["shape"]
+    if prepared is None:
+        prepared = materialize(shp)
+    return geometry_parts(mapping(prepared.context))[2]
+
+
+def clip(shp, bounds):
+    """Clip shape `shp` to the rectangle `bounds` for `geopip._shapely.p_in_fragment()`.
+
+    Parameters:
+        shp: Dict[str, Any]                        Prepared shape dictionary from
+                                                   `geopip._shapely.prepare()`.
+        bounds: Tuple[float, float, float, float]  Rectangle (minlng, minlat, maxlng, maxlat).
+
+    Returns:
+        PreparedGeometry  The prepared clipped shape.
+    """
+    prepared = shp["shape"]
+    if prepared is None:
+        prepared = materialize(shp)
+    return prep(prepared.context.intersection(box(*bounds)))
+
+
+def p_in_fragment(p, fragment):
+    """Test, whether point `p` (within the clip rectangle) is in the clipped shape.
+
+    Parameters:
+        p: Tuple[float, float]       Point (lng, lat) in WGS84.
+        fragment: PreparedGeometry  Clipped shape from `geopip._shapely.clip()`.
+
+    Returns:
+        boolean: True, if p in the shape, False otherwise
+    """
+    return fragment.contains(Point(*p))
+
+
+def query_geometry(geometry):
+    """Prepare a geojson geometry for `geopip._shapely.intersects()`.
+
+    Parameters:
+        geometry: Dict[str, Any]  Geojson geometry.
+
+    Returns:
+        BaseGeometry  The shapely geometry.
+    """
+    return shape(geometry)
+
+
+def intersects(shp, query):
+    """Test, whether shape `shp` intersects the query geometry.
+
+    Parameters:
+        shp: Dict[str, Any]   Prepared shape dictionary from `geopip._shapely.prepare()`.
+        query: BaseGeometry  Query geometry from `geopip._shapely.query_geometry()`.
+
+    Returns:
+        boolean: True, if shp and the geometry intersect, False otherwise
+    """
+    prepared = shp["shape"]
+    if prepared is None:
+        prepared = materialize(shp)
+    return prepared.intersects(query)
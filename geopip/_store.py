@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Compact binary format of a `FeatureCollection` with a precomputed index.
+#
+# Layout (little endian):
+#
+#     b"GPIP" | uint32 version | uint32 len(meta) | meta (json) | padding | arrays
+#
+# The json `meta` contains the feature ids, the `properties`, the rows of removed
+# features (only their `properties` are kept), the layers of the features (see
+# `GeoPIP(layers=...)`), the tuned configuration (see `GeoPIP.tune`), the hits
+# of the features (see `GeoPIP.count_hits`) and the (offset, typecode,
+# length) of the flat arrays:
+#
+#     coords          d  lng, lat of all points
+#     rings           I  start point of every ring (+ end)
+#     parts           I  start ring of every polygon (+ end)
+#     features        I  start polygon of every feature (+ end)
+#     part_bounds     d  minlng, minlat, maxlng, maxlat of every polygon
+#     part_area       d  area of every polygon
+#     feature_bounds  d  minlng, minlat, maxlng, maxlat of every feature
+#     feature_area    d  area of every feature
+#     part_levels     B  level of the index key of every polygon
+#     part_codes      Q  code of the index key of every polygon (see `_hilbert`)
+#     feature_levels  B  level of the index key of every feature
+#     feature_codes   Q  code of the index key of every feature
+#
+# The arrays are read without copying from the underlying buffer.
+import json
+import struct
+import sys
+from array import array
+
+from . import _hilbert
+from ._geo_fkt import area, bbox
+
+MAGIC = b"GPIP"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sII")
+_ALIGN = 8
+
+
+def is_store(head):
+    """Test, whether the bytes `head` are the beginning of the binary format."""
+    return bytes(head[: len(MAGIC)]) == MAGIC
+
+
+def _polygons(geometry):
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def _add_keys(levels, codes, bounds):
+    """Append level and code of the index keys of all `bounds`."""
+    for key in _hilbert.bbox_keys(bounds):
+        level = _hilbert.level(key)
+        levels.append(level)
+        codes.append((key ^ _hilbert.TAGS[level]) << _hilbert.SHIFTS[level])
+
+
+def _meta(removed, layers, config, hits):
+    """Meta data of `dumps` (without the features)."""
+    meta = {"ids": [], "properties": []}
+    if removed:
+        meta["removed"] = list(removed)
+    if layers is not None:
+        meta["layers"] = {
+            "names": list(layers["names"]),
+            "features": list(layers["features"]),
+        }
+    if config is not None:
+        meta["config"] = dict(config)
+    if hits is not None:
+        meta["hits"] = list(hits)
+    return meta
+
+
+def dumps(features, removed=(), layers=None, config=None, hits=None):
+    """Serialize geojson features (only Polygon and MultiPolygon geometries).
+
+    Parameters:
+        features: Iterable[Dict[str, Any]]  Geojson features.
+        removed: List[int]                  Positions of features, that are
+                                            removed from the index (their rows
+                                            in `GeoPIP.properties` are kept).
+        layers: Dict[str, List]             `names` of the layers and position of
+                                            the layer of every feature.
+        config: Dict[str, Any]              Configuration applied when loading the
+                                            file (see `GeoPIP.configure`).
+        hits: List[int]                     Hits of every feature to order the
+                                            index by (see `GeoPIP.reorder`).
+
+    Returns:
+        bytes: The binary representation.
+    """
+    arrays = {
+        "coords": array("d"),
+        "rings": array("I", [0]),
+        "parts": array("I", [0]),
+        "features": array("I", [0]),
+        "part_bounds": array("d"),
+        "part_area": array("d"),
+        "feature_bounds": array("d"),
+        "feature_area": array("d"),
+        "part_levels": array("B"),
+        "part_codes": array("Q"),
+        "feature_levels": array("B"),
+        "feature_codes": array("Q"),
+    }
+    meta = _meta(removed, layers, config, hits)
+    part_bounds, feature_bounds = [], []
+
+    for feat in features:
+        polygons = _polygons(feat.get("geometry"))
+        for polygon in polygons:
+            for ring in polygon:
+                for lng, lat in ring:
+                    arrays["coords"].extend((lng, lat))
+                arrays["rings"].append(len(arrays["coords"]) // 2)
+            arrays["parts"].append(len(arrays["rings"]) - 1)
+
+            bounds = bbox({"type": "Polygon", "coordinates": polygon})
+            arrays["part_bounds"].extend(bounds)
+            arrays["part_area"].append(area(polygon))
+            part_bounds.append(bounds)
+        arrays["features"].append(len(arrays["parts"]) - 1)
+
+        if polygons:
+            bounds = bbox({"type": "MultiPolygon", "coordinates": polygons})
+            arrays["feature_bounds"].extend(bounds)
+            arrays["feature_area"].append(sum(area(polygon) for polygon in polygons))
+        else:
+            bounds = (-180.0, -90.0, 180.0, 90.0)  # root key
+            arrays["feature_bounds"].extend((0.0, 0.0, 0.0, 0.0))
+            arrays["feature_area"].append(0.0)
+        feature_bounds.append(bounds)
+        meta["ids"].append(feat.get("id"))
+        meta["properties"].append(feat.get("properties"))
+
+    _add_keys(arrays["part_levels"], arrays["part_codes"], part_bounds)
+    _add_keys(arrays["feature_levels"], arrays["feature_codes"], feature_bounds)
+
+    blobs = []
+    offset = 0
+    meta["arrays"] = {}
+    for name, values in arrays.items():
+        if sys.byteorder != "little":
+            values.byteswap()
+        meta["arrays"][name] = [offset, values.typecode, len(values)]
+        blob = values.tobytes()
+        blob += b"\0" * (-len(blob) % _ALIGN)
+        blobs.append(blob)
+        offset += len(blob)
+
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    head = _HEADER.pack(MAGIC, VERSION, len(meta_bytes)) + meta_bytes
+    head += b"\0" * (-len(head) % _ALIGN)
+
+    return head + b"".join(blobs)
+
+
+class Store(object):
+    """Read-only access to the binary format in a buffer (bytes, mmap, ...)."""
+
+    def __init__(self, buffer, owner=None):
+        """Parse the header of the binary format in `buffer`.
+
+        Parameters:
+            buffer: Buffer  Object supporting the buffer protocol.
+            owner: Any      Object owning `buffer` (kept alive until the arrays
+                            of the store are released).
+        """
+        view = memoryview(buffer).cast("B")
+        magic, version, meta_len = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a geopip binary file.")
+        if version != VERSION:
+            raise ValueError("Unsupported geopip binary version: {}".format(version))
+
+        start = _HEADER.size
+        self.meta = json.loads(bytes(view[start : start + meta_len]).decode("utf-8"))
+        start += meta_len
+        start += -start % _ALIGN
+
+        end = start
+        for name, (offset, typecode, length) in self.meta["arrays"].items():
+            size = length * array(typecode).itemsize
+            values = view[start + offset : start + offset + size].cast(typecode)
+            if sys.byteorder != "little":  # pragma: no cover
+                values = array(typecode, values)
+                values.byteswap()
+            setattr(self, "_" + name, values)
+            end = max(end, start + offset + size + (-size % _ALIGN))
+        self.buffer = view[:end]  # the binary format (without trailing bytes)
+        self._owner = owner
+
+    def __len__(self):
+        """Number of features."""
+        return len(self._features) - 1
+
+    def feature_parts(self, idx):
+        """Range of the polygons of feature `idx`."""
+        return range(self._features[idx], self._features[idx + 1])
+
+    def _polygon(self, part):
+        coords, rings = self._coords, self._rings
+        polygon = []
+        for ring in range(self._parts[part], self._parts[part + 1]):
+            start, end = 2 * rings[ring], 2 * rings[ring + 1]
+            lngs = coords[start:end:2].tolist()
+            lats = coords[start + 1 : end : 2].tolist()
+            polygon.append(list(zip(lngs, lats)))  # noqa: B905 (py3.9)
+        return polygon
+
+    def part_geometry(self, part):
+        """Geojson `Polygon` of polygon `part`."""
+        return {"type": "Polygon", "coordinates": self._polygon(part)}
+
+    def feature_geometry(self, idx):
+        """Geojson `Polygon` or `MultiPolygon` of feature `idx` (`None` if empty)."""
+        parts = self.feature_parts(idx)
+        if len(parts) == 0:
+            return None
+        if len(parts) == 1:
+            return self.part_geometry(parts[0])
+        return {
+            "type": "MultiPolygon",
+            "coordinates": [self._polygon(part) for part in parts],
+        }
+
+    def part_bounds(self, part):
+        """Bounding box of polygon `part`."""
+        return tuple(self._part_bounds[4 * part : 4 * part + 4])
+
+    def feature_bounds(self, idx):
+        """Bounding box of feature `idx`."""
+        return tuple(self._feature_bounds[4 * idx : 4 * idx + 4])
+
+    def part_key(self, part):
+        """Index key (see `_hilbert`) of polygon `part`."""
+        return _hilbert.key(self._part_codes[part], self._part_levels[part])
+
+    def feature_key(self, idx):
+        """Index key (see `_hilbert`) of feature `idx`."""
+        return _hilbert.key(self._feature_codes[idx], self._feature_levels[idx])
+
+    def part_area(self, part):
+        """Area of polygon `part`."""
+        return self._part_area[part]
+
+    def feature_area(self, idx):
+        """Area of feature `idx`."""
+        return self._feature_area[idx]
+
+    def feature(self, idx):
+        """Geojson feature `idx`."""
+        return {
+            "type": "Feature",
+            "id": self.meta["ids"][idx],
+            "properties": self.meta["properties"][idx],
+            "geometry": self.feature_geometry(idx),
+        }
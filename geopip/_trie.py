@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Adaptive trie over the 4 bit characters of geohash-hilbert codes.
+#
+# Every node is a geohash rectangle. Inner nodes are lists with the 16 child
+# nodes (indexed by the hex character). Leaves are tuples of (shape, covers,
+# fragment): the shapes intersecting the rectangle in search order, `covers`
+# is `True`, if the shape contains the complete rectangle, and `fragment` is
+# the shape clipped to the rectangle (if clipping is enabled). A cell is
+# refined until all its shapes cover it (or none is left) or the maximal depth
+# is reached, hence the trie only grows along the borders.
+from geohash_hilbert import decode_exactly
+
+from . import _hilbert
+from ._geo_fkt import bbox_intersects, in_bbox
+
+_HEX = "0123456789abcdef"
+_EPS = 1e-9  # cells are widened by this to be robust against rounding
+
+
+def _rectangle(code):
+    lng, lat, lng_err, lat_err = decode_exactly(code, bits_per_char=4)
+    return (
+        lng - lng_err - _EPS,
+        lat - lat_err - _EPS,
+        lng + lng_err + _EPS,
+        lat + lat_err + _EPS,
+    )
+
+
+def _clip(edge, rect):
+    """Test, whether the segment `edge` intersects the rectangle `rect` (Liang-Barsky)."""
+    x1, y1, x2, y2 = edge
+    minx, miny, maxx, maxy = rect
+    dx, dy = x2 - x1, y2 - y1
+    lo, hi = 0.0, 1.0
+    for p, q in ((-dx, x1 - minx), (dx, maxx - x1), (-dy, y1 - miny), (dy, maxy - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        elif p < 0:
+            lo = max(lo, q / p)
+        else:
+            hi = min(hi, q / p)
+        if lo > hi:
+            return False
+    return True
+
+
+def _edges(polygons):
+    return [
+        (ring[i][0], ring[i][1], ring[i + 1][0], ring[i + 1][1])
+        for polygon in polygons
+        for ring in polygon
+        for i in range(len(ring) - 1)
+    ]
+
+
+def search_order(shapes):
+    """All shapes of the index `shapes` in search order.
+
+    Shapes in deeper geohash rectangles first, within one rectangle ordered by
+    area. For every point, the shapes containing it are visited in the same
+    order as by `GeoPIP.search_all`.
+    """
+    return [
+        shp
+        for key in sorted(shapes, key=lambda key: (-_hilbert.level(key), key))
+        for shp in shapes[key]
+    ]
+
+
+class Trie(object):
+    """Adaptive trie over geohash-hilbert characters of the shapes of an index."""
+
+    def __init__(self, shapes, backend, max_depth, clip=False):
+        """Build the trie.
+
+        Parameters:
+            shapes: Dict[int, List[Dict[str, Any]]]  Index (key -> shapes).
+            backend: module  Implementation of the shapes (`_pure` or `_shapely`).
+            max_depth: int   Maximal depth (geohash length) of the trie.
+            clip: bool       Store the shapes of mixed leaves clipped to the leaf.
+        """
+        if max_depth < 0:
+            raise ValueError("Maximal depth must not be negative.")
+
+        self.max_depth = max_depth
+        self._backend = backend
+        self._clip = clip
+        self.counts = {
+            "nodes": 0,
+            "leaves": 0,
+            "mixed": 0,
+            "candidates": 0,
+            "edges": 0,
+        }
+
+        candidates = []
+        for order, shp in enumerate(search_order(shapes)):
+            edges = _edges(backend.polygons(shp))
+            candidates.append((order, shp, edges, len(edges)))
+        self.root = self._build("", _rectangle(""), candidates, [])
+
+    def _build(self, code, rect, partial, covering):
+        """Node for the rectangle of `code`.
+
+        Parameters:
+            partial: List[Tuple[int, Dict, List, int]]  (order, shape, edges, total
+                                                       edges) of shapes with edges
+                                                       in the parent.
+            covering: List[Tuple[int, Dict]]           (order, shape) of shapes
+                                                       covering the parent.
+        """
+        self.counts["nodes"] += 1
+        covering = list(covering)
+        remaining = []
+        for order, shp, edges, total in partial:
+            if not bbox_intersects(shp["bounds"], rect):
+                continue
+            cell_edges = [edge for edge in edges if _clip(edge, rect)]
+            if cell_edges:
+                remaining.append((order, shp, cell_edges, total))
+            else:
+                center = ((rect[0] + rect[2]) / 2, (rect[1] + rect[3]) / 2)
+                if self._backend.p_in_polygon(center, shp):
+                    covering.append((order, shp))
+
+        if remaining and len(code) < self.max_depth:
+            return [
+                self._build(code + c, _rectangle(code + c), remaining, covering)
+                for c in _HEX
+            ]
+
+        leaf = [(order, shp, True, None) for order, shp in covering]
+        for order, shp, edges, total in remaining:
+            if self._clip:
+                leaf.append((order, shp, False, self._backend.clip(shp, rect)))
+                self.counts["edges"] += len(edges)
+            else:
+                leaf.append((order, shp, False, None))
+                self.counts["edges"] += total
+        leaf.sort(key=lambda item: item[0])
+
+        self.counts["leaves"] += 1
+        self.counts["mixed"] += 1 if remaining else 0
+        self.counts["candidates"] += len(leaf)
+        return tuple(item[1:] for item in leaf)
+
+    def find(self, lng, lat, code=None):
+        """All shapes containing the point (lng, lat) in search order.
+
+        Parameters:
+            code: int  The (precomputed) `_hilbert.encode(lng, lat)`.
+
+        Returns:
+            Iterator[Dict[str, Any]]  Shapes containing the point.
+        """
+        node = self.root
+        if type(node) is list:
+            if code is None:
+                code = _hilbert.encode(lng, lat)
+            shift = _hilbert.BITS
+            while type(node) is list:
+                shift -= 4
+                node = node[(code >> shift) & 0xF]
+
+        p_in_polygon = self._backend.p_in_polygon
+        p_in_fragment = self._backend.p_in_fragment
+        for shp, covers, fragment in node:
+            if covers:
+                yield shp
+            elif in_bbox((lng, lat), shp["bounds"]):
+                if fragment is None:
+                    if p_in_polygon((lng, lat), shp):
+                        yield shp
+                elif p_in_fragment((lng, lat), fragment):
+                    yield shp
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# Enrich pandas (or geopandas) DataFrames with the properties of the features.
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+__all__ = ["enrich"]
+
+_GEO = None  # GeoPIP of the worker processes
+
+
+def _init_worker(geo):
+    global _GEO  # noqa: PLW0603
+    _GEO = geo
+
+
+def _search_chunk(chunk):
+    from . import instance  # noqa: PLC0415
+
+    geo = _GEO if _GEO is not None else instance()
+    lngs, lats = chunk
+    return geo.search_batch(lngs, lats)
+
+
+def _coordinates(df, lng, lat):
+    if lng is None and lat is None and hasattr(df, "geometry"):
+        # GeoDataFrame of points
+        return df.geometry.x.to_numpy(np.float64), df.geometry.y.to_numpy(np.float64)
+    lng = "lng" if lng is None else lng
+    lat = "lat" if lat is None else lat
+    return df[lng].to_numpy(np.float64), df[lat].to_numpy(np.float64)
+
+
+def enrich(  # noqa: PLR0913
+    df,
+    *,
+    lng=None,
+    lat=None,
+    fields=None,
+    geo=None,
+    default=None,
+    prefix="",
+    chunksize=100000,
+    processes=None,
+):
+    """Add the `properties` of the features containing the points as columns.
+
+    The points are searched with the vectorized `GeoPIP.search_batch` in chunks
+    of `chunksize` rows, optionally in `processes` worker processes, and every
+    property in `fields` becomes one column.
+
+    Parameters:
+        df: pandas.DataFrame  Table with the points.
+        lng: str              Column with the longitudes (default: `lng`).
+        lat: str              Column with the latitudes (default: `lat`). If
+                              `lng` and `lat` are not given and `df` is a
+                              GeoDataFrame, its point geometries are used.
+        fields: List[str]     Keys of the properties to add (default: all).
+        geo: GeoPIP           Features to search (default: `geopip.instance()`).
+        default: Any          Value for points outside of all features.
+        prefix: str           Prefix of the new column names.
+        chunksize: int        Number of rows searched at once.
+        processes: int        Number of worker processes (default: no workers).
+                              Workers attach to `geo` in shared memory (see
+                              `GeoPIP.to_shared_memory()`) or build the default
+                              instance themselves.
+
+    Returns:
+        pandas.DataFrame  Copy of `df` with the added columns.
+    """
+    from . import instance  # noqa: PLC0415
+
+    if chunksize <= 0:
+        raise ValueError("Chunk size must be positive.")
+
+    lngs, lats = _coordinates(df, lng, lat)
+    chunks = [
+        (lngs[start : start + chunksize], lats[start : start + chunksize])
+        for start in range(0, len(lngs), chunksize)
+    ]
+
+    if processes:
+        if geo is not None:
+            geo.to_shared_memory()  # pickled as name of the shared memory block
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker, initargs=(geo,)
+        ) as pool:
+            results = list(pool.map(_search_chunk, chunks))
+        geo = geo if geo is not None else instance()
+    else:
+        geo = geo if geo is not None else instance()
+        results = [geo.search_batch(lngs, lats) for lngs, lats in chunks]
+
+    indices = np.concatenate(results) if results else np.empty(0, dtype=np.int64)
+    if fields is None:
+        fields = geo.properties.keys
+
+    result = df.copy()
+    for key, values in geo.columns(
+        indices, fields, default=default, numpy=True
+    ).items():
+        result[prefix + key] = values
+    return result
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# The MIT License
+#
+# Copyright (c) 2017 Tammo Ippen, tammo.ippen@posteo.de
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# HTTP lookup service (asyncio, standard library only): `python -m geopip serve`.
+#
+#     GET  /search?lng=&lat=  `properties` of the found feature (or `null`)
+#     POST /batch             JSON `{"lng": [...], "lat": [...]}`, `[[lng, lat], ...]`
+#                             or NDJSON (`{"lng": .., "lat": ..}` or `[lng, lat]` per
+#                             line); answers with a JSON array or NDJSON lines
+#     GET  /metrics           Latency and batch size histograms (Prometheus format)
+#
+# Connections are kept alive (HTTP/1.1). Concurrent `/search` requests are
+# collected for up to `max_delay` seconds (or `max_batch` points) and looked up
+# with one vectorized `GeoPIP.search_batch`.
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+__all__ = ["Histogram", "Server", "serve"]
+
+_MIN_LNG = -180
+_MAX_LNG = 180
+_MIN_LAT = -90
+_MAX_LAT = 90
+
+_MAX_LINE = 8192
+_MAX_HEADERS = 100
+_MAX_BODY = 64 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    414: "URI Too Long",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+}
+
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+
+class HttpError(Exception):
+    """Error answered with `status` and a JSON `{"error": message}` body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Histogram(object):
+    """Cumulative histogram in the Prometheus exposition format."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last: +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Count one `value`."""
+        idx = 0
+        while idx < len(self.buckets) and value > self.buckets[idx]:
+            idx += 1
+        self.counts[idx] += 1
+        self.sum += value
+
+    def lines(self, name, labels=""):
+        """Lines of the `_bucket`, `_sum` and `_count` series of `name`."""
+        sep = "," if labels else ""
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):  # noqa: B905 (py3.9)
+            total += count
+            result.append(
+                '{}_bucket{{{}{}le="{}"}} {}'.format(name, labels, sep, bound, total)
+            )
+        labels = "{" + labels + "}" if labels else ""
+        result.append("{}_sum{} {!r}".format(name, labels, self.sum))
+        result.append("{}_count{} {}".format(name, labels, total))
+        return result
+
+
+def _point(lng, lat):
+    """Validated (lng, lat) floats."""
+    try:
+        lng, lat = float(lng), float(lat)
+    except (TypeError, ValueError):
+        raise HttpError(400, "Coordinates must be numbers.") from None
+    if not (_MIN_LNG <= lng <= _MAX_LNG):
+        raise HttpError(400, "Longitude must be between -180 and 180.")
+    if not (_MIN_LAT <= lat <= _MAX_LAT):
+        raise HttpError(400, "Latitude must be between -90 and 90.")
+    return lng, lat
+
+
+def _parse_points(body, ndjson):
+    """Points of a `/batch` body (see module documentation)."""
+    try:
+        if ndjson:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError:
+        raise HttpError(400, "Invalid JSON.") from None
+
+    if isinstance(items, dict):
+        lngs, lats = items.get("lng"), items.get("lat")
+        if not isinstance(lngs, list) or not isinstance(lats, list):
+            raise HttpError(400, "Arrays `lng` and `lat` required.")
+        if len(lngs) != len(lats):
+            raise HttpError(400, "Same number of longitudes and latitudes required.")
+        return [_point(lng, lat) for lng, lat in zip(lngs, lats)]  # noqa: B905 (py3.9)
+    if not isinstance(items, list):
+        raise HttpError(400, "Array of points required.")
+
+    points = []
+    for item in items:
+        if isinstance(item, dict):
+            points.append(_point(item.get("lng"), item.get("lat")))
+        elif isinstance(item, list) and len(item) == 2:  # noqa: PLR2004 (lng, lat)
+            points.append(_point(*item))
+        else:
+            raise HttpError(400, "Points must be `[lng, lat]` or `{lng, lat}`.")
+    return points
+
+
+async def _readline(reader, status, message):
+    """Next line of `reader`, raise `HttpError(status, message)` if it is too long."""
+    try:
+        return await reader.readline()
+    except ValueError:  # longer than the `limit` of the stream
+        raise HttpError(status, message) from None
+
+
+class Server(object):
+    """HTTP lookup service for one `GeoPIP` index."""
+
+    def __init__(self, geo=None, fields=None, max_batch=1024, max_delay=0.001):
+        """Create the service (see `Server.start()`).
+
+        Parameters:
+            geo: GeoPIP        Index to search (default: `geopip.instance()`).
+            fields: List[str]  Keys of the `properties` in the answers (default: all).
+            max_batch: int     Maximal number of `/search` points per lookup.
+            max_delay: float   Maximal time in seconds a `/search` waits for others.
+        """
+        if geo is None:
+            from . import instance  # noqa: PLC0415
+
+            geo = instance()
+        if max_batch <= 0:
+            raise ValueError("Batch size must be positive.")
+
+        self.geo = geo
+        self.fields = fields
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.latency = {}  # endpoint -> Histogram
+        self.batch_size = Histogram(_SIZE_BUCKETS)
+        self.responses = {}  # (endpoint, status) -> count
+        self._encoded = (None, {})  # (shapes, feature -> json of its properties)
+        self._pending = []  # (lng, lat, future) of `/search` requests
+        self._timer = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening.
+
+        Returns:
+            asyncio.base_events.Server  The listening server.
+        """
+        return await asyncio.start_server(self._connection, host, port, limit=_MAX_LINE)
+
+    def _encode(self, feature):
+        """Json of the `properties` of `feature` (-1: `null`)."""
+        if feature < 0:
+            return b"null"
+        # updates (e.g. `replace_feature`, `compact`) publish new shapes
+        shapes = self.geo._shapes
+        cached_shapes, cache = self._encoded
+        if cached_shapes is not shapes:
+            cache = {}
+            self._encoded = (shapes, cache)
+
+        encoded = cache.get(feature)
+        if encoded is None:
+            props = self.geo.properties.row(feature)
+            if self.fields is not None:
+                props = {key: props[key] for key in self.fields if key in props}
+            encoded = json.dumps(dict(props), separators=(",", ":")).encode("utf-8")
+            cache[feature] = encoded
+        return encoded
+
+    def _search(self, lng, lat):
+        """Future of the feature of one point, looked up in the next micro batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((lng, lat, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return future
+
+    def _flush(self):
+        """Look up all pending `/search` points at once (in the default executor)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        self.batch_size.observe(len(pending))
+        lngs = [lng for lng, _lat, _future in pending]
+        lats = [lat for _lng, lat, _future in pending]
+        lookup = asyncio.get_running_loop().run_in_executor(
+            None, self.geo.search_batch, lngs, lats
+        )
+
+        def resolve(lookup):
+            error = lookup.exception()
+            features = None if error is not None else lookup.result()
+            for idx, (_lng, _lat, future) in enumerate(pending):
+                if future.done():
+                    continue  # cancelled, e.g. closed connection
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(int(features[idx]))
+
+        lookup.add_done_callback(resolve)
+
+    async def _batch(self, body, ndjson):
+        points = _parse_points(body, ndjson)
+        self.batch_size.observe(len(points))
+        lngs = [lng for lng, _lat in points]
+        lats = [lat for _lng, lat in points]
+        features = await asyncio.get_running_loop().run_in_executor(
+            None, self.geo.search_batch, lngs, lats
+        )
+        encoded = [self._encode(int(feature)) for feature in features]
+        if ndjson:
+            return "application/x-ndjson", b"".join(line + b"\n" for line in encoded)
+        return "application/json", b"[" + b",".join(encoded) + b"]"
+
+    def _metrics(self):
+        lines = [
+            "# HELP geopip_request_duration_seconds Latency of the requests.",
+            "# TYPE geopip_request_duration_seconds histogram",
+        ]
+        for endpoint, histogram in sorted(self.latency.items()):
+            lines += histogram.lines(
+                "geopip_request_duration_seconds", 'endpoint="{}"'.format(endpoint)
+            )
+        lines += [
+            "# HELP geopip_batch_size Points per vectorized lookup.",
+            "# TYPE geopip_batch_size histogram",
+        ]
+        lines += self.batch_size.lines("geopip_batch_size")
+        lines += [
+            "# HELP geopip_responses_total Responses by endpoint and status.",
+            "# TYPE geopip_responses_total counter",
+        ]
+        for (endpoint, status), count in sorted(self.responses.items()):
+            lines.append(
+                'geopip_responses_total{{endpoint="{}",status="{}"}} {}'.format(
+                    endpoint, status, count
+                )
+            )
+        return "text/plain; version=0.0.4", ("\n".join(lines) + "\n").encode("utf-8")
+
+    async def _dispatch(self, method, target, headers, body):
+        """Content type and body of the answer to one request."""
+        url = urlsplit(target)
+        if url.path == "/search":
+            if method != "GET":
+                raise HttpError(405, "Use GET.")
+            query = parse_qs(url.query)
+            lng, lat = _point(query.get("lng", [None])[0], query.get("lat", [None])[0])
+            return "application/json", self._encode(await self._search(lng, lat))
+        if url.path == "/batch":
+            if method != "POST":
+                raise HttpError(405, "Use POST.")
+            ndjson = "ndjson" in headers.get("content-type", "")
+            return await self._batch(body, ndjson)
+        if url.path == "/metrics":
+            if method != "GET":
+                raise HttpError(405, "Use GET.")
+            return self._metrics()
+        raise HttpError(404, "Unknown endpoint.")
+
+    async def _read_request(self, reader):
+        """(method, target, version, headers, body) or `None` at the end of the stream."""
+        line = await _readline(reader, 414, "Request line too long.")
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Invalid request line.") from None
+
+        headers = {}
+        while True:
+            line = await _readline(reader, 431, "Header line too long.")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= _MAX_HEADERS:
+                raise HttpError(431, "Too many headers.")
+            name, _sep, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", ""):
+            raise HttpError(501, "Chunked requests are not supported.")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length.") from None
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length > _MAX_BODY:
+            raise HttpError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, version, headers, body
+
+    async def _answer(self, method, target, headers, body):
+        """(status, answer) of one request, errors are answered as JSON."""
+        try:
+            return 200, await self._dispatch(method, target, headers, body)
+        except HttpError as error:
+            return error.status, error
+        except ValueError as error:
+            return 400, error
+        except Exception:  # noqa: BLE001
+            # answer instead of dropping the connection without a response
+            return 500, HttpError(500, "Internal server error.")
+
+    async def _connection(self, reader, writer):
+        """Serve the requests of one (persistent) connection."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as error:
+                    await self._respond(writer, "-", error.status, error, False)
+                    return
+                except asyncio.IncompleteReadError:
+                    return  # connection closed
+                if request is None:
+                    return
+
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection != "close"
+                    if version == "HTTP/1.1"
+                    else connection == "keep-alive"
+                )
+                endpoint = urlsplit(target).path
+                start = time.perf_counter()
+                status, answer = await self._answer(method, target, headers, body)
+                if endpoint not in ("/search", "/batch", "/metrics"):
+                    endpoint = "other"
+                self.latency.setdefault(endpoint, Histogram(_LATENCY_BUCKETS)).observe(
+                    time.perf_counter() - start
+                )
+                await self._respond(writer, endpoint, status, answer, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, endpoint, status, answer, keep_alive):
+        if isinstance(answer, Exception):
+            body = json.dumps({"error": str(answer)}).encode("utf-8")
+            content_type = "application/json"
+        else:
+            content_type, body = answer
+        key = (endpoint, status)
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+        head = (
+            "HTTP/1.1 {} {}\r\n"
+            "Content-Type: {}\r\n"
+            "Content-Length: {}\r\n"
+            "Connection: {}\r\n\r\n"
+        ).format(
+            status,
+            _REASONS[status],
+            content_type,
+            len(body),
+            "keep-alive" if keep_alive else "close",
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def serve(geo=None, host="127.0.0.1", port=8080, **options):
+    """Run the lookup service until it is interrupted.
+
+    Parameters:
+        geo: GeoPIP  Index to search (default: `geopip.instance()`).
+        host: str    Interface to listen on.
+        port: int    Port to listen on.
+        options:     Further parameters of `Server`.
+    """
+    server = Server(geo, **options)
+
+    async def run():
+        listening = await server.start(host, port)
+        async with listening:
+            await listening.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
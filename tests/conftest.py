@@ -1,14 +1,39 @@
+import json
 import os
 from random import random
 
 import pytest
 
+from geopip._geopip import SHAPELY_AVAILABLE
+
 
 @pytest.fixture()
 def testdir():
     return os.path.dirname(os.path.realpath(__file__))
 
 
+@pytest.fixture()
+def collection(testdir):
+    with open(testdir + "/sample.geo.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(
+    params=[
+        "pure",
+        pytest.param(
+            "shapely",
+            marks=pytest.mark.skipif(
+                not SHAPELY_AVAILABLE, reason="No shapely available."
+            ),
+        ),
+    ]
+)
+def backend(request):
+    """Name of every available backend."""
+    return request.param
+
+
 @pytest.fixture()
 def rand_lng():
     return lambda: random() * 360 - 180
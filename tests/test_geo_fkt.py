@@ -1,12 +1,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import math
 from random import random
 
 import pytest
-from geohash_hilbert import decode_exactly
 
-from geopip._geo_fkt import bbox, bbox_hash, ccw, in_bbox, p_in_polygon, winding_number
+from geopip._geo_fkt import (
+    area,
+    bbox,
+    bbox_intersects,
+    ccw,
+    clip_polygon,
+    clip_ring,
+    convex_vertices,
+    geometry_bounds,
+    geometry_parts,
+    hole_index,
+    in_bbox,
+    p_in_convex,
+    p_in_polygon,
+    p_in_polygon_indexed,
+    polygon_intersects,
+    ring_area,
+    segments_intersect,
+    winding_number,
+)
 
 ################################################################################
 ################                      bbox                      ####
@@ -134,30 +153,24 @@ def test_in_bbox(rect):
 
 
 ################################################################################
-################                    bbox_hash                   ################
+################                      area                      ################
 ################################################################################
 
 
-def test_bbox_hash(rand_lng, rand_lat):
-    for _i in range(100):
-        lng1, lat1 = rand_lng(), rand_lat()
-        lng2, lat2 = rand_lng(), rand_lat()
-
-        min_lng = min(lng1, lng2)
-        min_lat = min(lat1, lat2)
+def test_ring_area(rect, triangle, trapezoid, star):
+    assert 1 == ring_area(rect)
+    assert 1 == ring_area(list(reversed(rect)))
+    assert 0.5 == ring_area(triangle)
+    assert 1 == ring_area(trapezoid)
+    assert 0 < ring_area(star) < 0.206 * 0.168  # smaller than its bbox
 
-        max_lng = max(lng1, lng2)
-        max_lat = max(lat1, lat2)
 
-        box = (min_lng, min_lat, max_lng, max_lat)
+def test_area_w_hole(rect):
+    hole = [(0.5, 0.1), (0.2, 0.2), (0.75, 0.2), (0.5, 0.1)]
 
-        code = bbox_hash(box)
-        lng, lat, lng_err, lat_err = decode_exactly(code, bits_per_char=4)
-
-        assert lat - lat_err <= min_lat
-        assert lng - lng_err <= min_lng
-        assert lat + lat_err >= max_lat
-        assert lng + lng_err >= max_lng
+    assert 1 == area([rect])
+    assert pytest.approx(1 - ring_area(hole)) == area([rect, hole])
+    assert pytest.approx(1 - ring_area(hole)) == area([rect, list(reversed(hole))])
 
 
 ################################################################################
@@ -304,3 +317,180 @@ def test_p_in_polygon_star(star, rand_lat, rand_lng):
         if not in_bbox(p, box):
             assert not p_in_polygon(p, star)
             assert not p_in_polygon(p, star_cw)
+
+
+def _regular(n, step=1):
+    """Ring of the regular `n`-gon around (0, 0) (a star polygon for `step` > 1)."""
+    ring = [
+        (math.cos(2 * math.pi * i * step / n), math.sin(2 * math.pi * i * step / n))
+        for i in range(n)
+    ]
+    return [*ring, ring[0]]
+
+
+def test_convex_vertices(rect, triangle, trapezoid, star):
+    assert [(1, 0), (1, 1), (0, 1), (0, 0)] == convex_vertices(rect)  # ccw
+    assert [(0, 0), (1, 0), (0.5, 1)] == convex_vertices(list(reversed(triangle)))
+    assert convex_vertices(trapezoid) is not None
+    assert 64 == len(convex_vertices(_regular(64)))
+
+    assert convex_vertices(star) is None
+    assert convex_vertices(_regular(5, step=2)) is None  # pentagram, winds twice
+    assert convex_vertices([(0, 0), (1, 0), (2, 0), (1, 1), (0, 0)]) is None
+    assert convex_vertices([(0, 0), (1, 0), (0, 0)]) is None
+
+
+def test_p_in_convex(rand_lat, rand_lng):
+    circle = _regular(64)
+    vertices = convex_vertices(circle)
+    assert p_in_convex((0, 0), vertices)  # on a diagonal
+    assert p_in_convex(circle[0], vertices) is None  # first vertex
+    assert p_in_convex((0.1, 0.1), vertices)
+    assert not p_in_convex((0.9, 0.9), vertices)
+    assert p_in_convex(circle[10], vertices) is None  # vertex
+
+    octagon = [(0, 0), (2, 0), (3, 1), (3, 2), (2, 3), (0, 3), (-1, 2), (-1, 1), (0, 0)]
+    assert p_in_convex((1, 0), convex_vertices(octagon)) is None  # edge
+    assert p_in_convex((2.5, 2.5), convex_vertices(octagon)) is None  # edge
+    assert p_in_convex((1, 1), convex_vertices(octagon))
+
+    for _i in range(1000):
+        p = (rand_lng() / 150, rand_lat() / 75)
+        inside = p_in_convex(p, vertices)
+        if inside is not None:
+            assert p_in_polygon(p, [circle]) == inside
+
+
+def test_p_in_polygon_indexed(rand_lat, rand_lng):
+    outer = [(0, 0), (0, 10), (10, 10), (10, 0), (0, 0)]
+    holes = [_regular(8) for _i in range(3)]
+    holes = [
+        [(x + 1.5 + 3 * i, y + 5) for x, y in ring] for i, ring in enumerate(holes)
+    ]
+    polygon = [outer, *holes]
+
+    minlng, minlat, width, height, cols, rows, cells = hole_index(polygon)
+    assert (0, 0, 10, 10) == (minlng, minlat, cols * width, rows * height)
+    assert 1 == cols == rows
+    assert 3 == len(cells[0])
+
+    polygon = [outer] + [
+        [(x + 1.5 + 3 * i, y + 1.5 + 3 * j) for x, y in _regular(8)]
+        for i in range(3)
+        for j in range(3)
+    ]
+    index = hole_index(polygon)
+    assert 3 == index[4] == index[5]
+    assert all(1 <= len(cell) <= 4 for cell in index[6])
+    assert not p_in_polygon_indexed((1.5, 1.5), polygon, index)
+    assert p_in_polygon_indexed((3, 3), polygon, index)
+    assert not p_in_polygon_indexed((11, 3), polygon, index)
+    for _i in range(1000):
+        p = (rand_lng() / 15, rand_lat() / 7.5)
+        assert p_in_polygon(p, polygon) == p_in_polygon_indexed(p, polygon, index)
+
+
+def test_bbox_intersects():
+    assert bbox_intersects((0, 0, 1, 1), (0.5, 0.5, 2, 2))
+    assert bbox_intersects((0, 0, 1, 1), (1, 1, 2, 2))  # touching
+    assert bbox_intersects((0, 0, 1, 1), (0.2, 0.2, 0.3, 0.3))
+    assert not bbox_intersects((0, 0, 1, 1), (1.1, 0, 2, 1))
+    assert not bbox_intersects((0, 0, 1, 1), (0, -1, 1, -0.1))
+
+
+def test_segments_intersect():
+    assert segments_intersect((0, 0), (1, 1), (0, 1), (1, 0))
+    assert segments_intersect((0, 0), (1, 1), (1, 1), (2, 0))  # common end point
+    assert segments_intersect((0, 0), (2, 0), (1, 0), (3, 0))  # collinear overlap
+    assert not segments_intersect((0, 0), (1, 0), (2, 0), (3, 0))  # collinear apart
+    assert not segments_intersect((0, 0), (1, 1), (0, 1), (0.4, 0.6))
+    assert not segments_intersect((0, 0), (1, 0), (0, 1), (1, 1))  # parallel
+
+
+def test_geometry_bounds():
+    assert (1, 2, 1, 2) == geometry_bounds({"type": "Point", "coordinates": [1, 2]})
+    assert (0, -1, 3, 2) == geometry_bounds(
+        {"type": "LineString", "coordinates": [[0, 2], [3, -1]]}
+    )
+    assert (0, 0, 2, 2) == geometry_bounds(
+        {
+            "type": "MultiPolygon",
+            "coordinates": [
+                [[[0, 0], [1, 0], [0, 1], [0, 0]]],
+                [[[1, 1], [2, 1], [1, 2], [1, 1]]],
+            ],
+        }
+    )
+    with pytest.raises(ValueError):
+        geometry_bounds({"type": "GeometryCollection", "geometries": []})
+
+
+def test_polygon_intersects(rect):
+    hole = [(0.4, 0.4), (0.6, 0.4), (0.6, 0.6), (0.4, 0.6), (0.4, 0.4)]
+    polygon = [rect, hole]
+
+    def intersects(geometry):
+        return polygon_intersects(
+            polygon, geometry_bounds(geometry), *geometry_parts(geometry)
+        )
+
+    # points: inside, in hole, outside
+    assert intersects({"type": "Point", "coordinates": [0.2, 0.2]})
+    assert not intersects({"type": "Point", "coordinates": [0.5, 0.5]})
+    assert not intersects({"type": "Point", "coordinates": [2, 2]})
+    # line crossing the border, line completely in the hole
+    assert intersects({"type": "LineString", "coordinates": [[-1, 0.2], [0.2, 0.2]]})
+    assert not intersects(
+        {"type": "LineString", "coordinates": [[0.45, 0.5], [0.55, 0.5]]}
+    )
+    # polygon containing the rect, polygon within the rect (not in the hole)
+    assert intersects(
+        {"type": "Polygon", "coordinates": [[[-1, -1], [2, -1], [2, 2], [-1, -1]]]}
+    )
+    assert intersects(
+        {
+            "type": "Polygon",
+            "coordinates": [[[0.1, 0.1], [0.2, 0.1], [0.2, 0.2], [0.1, 0.1]]],
+        }
+    )
+    assert not intersects(
+        {
+            "type": "Polygon",
+            "coordinates": [[[0.45, 0.45], [0.55, 0.45], [0.5, 0.55], [0.45, 0.45]]],
+        }
+    )
+
+
+def test_clip_ring(rect):
+    # completely inside
+    assert [(0, 0), (0, 1), (1, 1), (1, 0), (0, 0)] == clip_ring(rect, (-1, -1, 2, 2))
+    # completely outside
+    assert [] == clip_ring(rect, (2, 2, 3, 3))
+
+    clipped = clip_ring(rect, (0.5, -1, 2, 0.5))
+    assert clipped[0] == clipped[-1]
+    assert 0.25 == ring_area(clipped)
+    assert all(0.5 <= lng <= 1 and 0 <= lat <= 0.5 for lng, lat in clipped)
+
+
+def test_clip_polygon(rect, star, rand_lat, rand_lng):
+    hole = [(0.4, 0.4), (0.6, 0.4), (0.6, 0.6), (0.4, 0.6), (0.4, 0.4)]
+    bounds = (0.3, 0.3, 0.5, 0.5)
+    clipped = clip_polygon([rect, hole], bounds)
+    assert 2 == len(clipped)
+    assert clip_polygon([rect, hole], (2, 2, 3, 3)) is None
+    assert 1 == len(clip_polygon([rect, hole], (-1, -1, 0.2, 2)))  # hole dropped
+
+    # same result for all points within the bounds
+    for polygon, bounds in (
+        ([rect, hole], (0.3, 0.3, 0.5, 0.5)),
+        ([star], (-0.03, -0.03, 0.05, 0.05)),
+        ([star], (0.0, -0.1, 0.2, 0.1)),
+    ):
+        clipped = clip_polygon(polygon, bounds)
+        for _i in range(200):
+            p = (
+                bounds[0] + (bounds[2] - bounds[0]) * random(),
+                bounds[1] + (bounds[3] - bounds[1]) * random(),
+            )
+            assert p_in_polygon(p, polygon) == p_in_polygon(p, clipped)
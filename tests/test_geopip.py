@@ -1,12 +1,26 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import datetime
 import json
+import os
+import pickle
+import subprocess
+import sys
+from array import array
+from decimal import Decimal
 
 import pytest
 
 from geopip import search, search_all
-from geopip._geopip import SHAPELY_AVAILABLE, GeoPIP
+from geopip.__main__ import main
+from geopip._geo_fkt import bbox_intersects
+from geopip._geopip import (
+    SHAPELY_AVAILABLE,
+    FeatureRow,
+    GeoPIP,
+    _intersecting_pairs,
+)
 
 try:
     import shapely  # noqa: F401
@@ -14,12 +28,6 @@ except ImportError:
     pass
 
 
-@pytest.fixture()
-def collection(testdir):
-    with open(testdir + "/sample.geo.json", "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
 def test_default_init():
     geo = GeoPIP()
 
@@ -150,6 +158,173 @@ def _test_geo_locations(search_fkt, search_all_fkt):
     assert [] == list(search_all_fkt(32.1240234375, 43.29320031385282))  # black see
 
 
+def test_properties_projection(collection):
+    geo = GeoPIP(geojson_dict=collection, properties=["type", "missing"])
+
+    assert ["type"] == geo.properties.keys
+    assert 4 == len(geo.properties)
+    assert {"type": "triangle"} == geo.search(lng=0.5, lat=0.3)
+
+    geo = GeoPIP(properties=["ISO2", "NAME"])
+    assert {"ISO2": "DE", "NAME": "Germany"} == geo.search(lng=7, lat=51)
+    assert ["ISO2", "NAME"] == geo.properties.keys
+    assert len(set(geo.properties.column("ISO2"))) == len(geo.properties)
+
+
+def test_incremental_updates(collection):
+    features = collection["features"]
+    geo = GeoPIP(geojson_dict=dict(collection, features=features[:2]))  # star, rect
+    r0, r1, r2, r3, r4 = (FeatureRow(row) for row in range(5))
+
+    assert [r0, r1] == geo.feature_ids
+    assert [{"type": "rect"}] == list(geo.search_all(lng=0.5, lat=0.3))
+
+    geo.add_features(features[2:])  # triangle, trapezoid
+    assert [r0, r1, r2, r3] == geo.feature_ids
+    assert [{"type": "triangle"}, {"type": "rect"}, {"type": "trapezoid"}] == list(
+        geo.search_all(lng=0.5, lat=0.3)
+    )
+
+    geo.remove_features([r2, r1])
+    assert [r0, r3] == geo.feature_ids
+    assert [{"type": "trapezoid"}] == list(geo.search_all(lng=0.5, lat=0.3))
+    assert "800" not in geo.shapes  # empty buckets are removed
+
+    geo.replace_feature(r3, dict(features[1], id="ignored"))
+    assert [r0, r3] == geo.feature_ids
+    assert [{"type": "rect"}] == list(geo.search_all(lng=0.5, lat=0.3))
+    assert {"type": "star"} == geo.search(lng=0.0, lat=0.0)
+
+    geo.add_features([dict(features[3], id="trap")])
+    assert [r0, r3, "trap"] == geo.feature_ids
+    assert [{"type": "rect"}, {"type": "trapezoid"}] == list(
+        geo.search_all(lng=0.5, lat=0.3)
+    )
+
+    # failing updates leave the index untouched
+    shapes = geo.shapes
+    with pytest.raises(KeyError):
+        geo.remove_features([r0, "unknown"])
+    with pytest.raises(ValueError):
+        geo.add_features([dict(features[2], id="trap")])
+    assert shapes is geo.shapes
+    assert [r0, r3, "trap"] == geo.feature_ids
+    with pytest.raises(KeyError):
+        geo.replace_feature(r4, features[0])
+
+    # replacing reuses the row, compacting drops the rows of removed features
+    assert 6 == len(geo.properties)
+    for _i in range(10):
+        geo.replace_feature("trap", dict(features[3], id="trap"))
+    assert 6 == len(geo.properties)
+    geo.compact()
+    assert 3 == len(geo.properties)
+    assert [r0, r1, "trap"] == geo.feature_ids
+    assert [{"type": "rect"}, {"type": "trapezoid"}] == list(
+        geo.search_all(lng=0.5, lat=0.3)
+    )
+    assert [1, -1] == list(geo.search_batch([0.5, 2.0], [0.3, 2.0]))
+    geo.remove_features([r1])
+    assert [{"type": "trapezoid"}] == list(geo.search_all(lng=0.5, lat=0.3))
+
+
+def test_replace_feature(collection, backend):
+    features = collection["features"]
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    rect = FeatureRow(1)
+    held = geo.search(lng=0.9, lat=0.9)
+    assert {"type": "rect"} == held
+
+    # a failing replacement leaves the feature untouched
+    with pytest.raises(ValueError):
+        geo.replace_feature(
+            rect,
+            {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": "invalid"},
+                "properties": {"type": "rejected"},
+            },
+        )
+    assert {"type": "rect"} == geo.search(lng=0.9, lat=0.9)
+    assert {"type": "rect"} == geo.properties.row(1)
+
+    # results already returned keep the properties of the old feature
+    geo.replace_feature(rect, dict(features[1], properties={"type": "new"}))
+    assert {"type": "rect"} == held
+    assert {"type": "new"} == geo.search(lng=0.9, lat=0.9)
+    assert {"type": "new"} == geo.properties.row(1)
+
+
+def test_duplicate_ids(collection):
+    star, rect, triangle, trapezoid = collection["features"]
+    # repeated ids and ids colliding with rows are valid geojson
+    geo = GeoPIP(
+        geojson_dict=dict(
+            collection,
+            features=[
+                dict(star, id=1),
+                rect,
+                dict(triangle, id="x"),
+                dict(trapezoid, id="x"),
+            ],
+        )
+    )
+    assert [1, FeatureRow(1), "x", FeatureRow(3)] == geo.feature_ids
+    assert 3 == len(list(geo.search_all(lng=0.5, lat=0.3)))
+    assert geo.feature_ids == pickle.loads(pickle.dumps(geo)).feature_ids
+    with pytest.raises(ValueError):
+        geo.add_features([dict(star, id="x")])
+
+
+def test_updates_copy_on_write(collection):
+    geo = GeoPIP(geojson_dict=collection)
+    shapes = geo.shapes
+    bucket = shapes["800"]
+
+    # an ongoing search keeps its snapshot of the index
+    results = geo.search_all(lng=0.5, lat=0.3)
+    assert {"type": "triangle"} == next(results)
+
+    geo.remove_features([FeatureRow(1)])  # rect
+
+    assert [{"type": "rect"}, {"type": "trapezoid"}] == list(results)
+    assert 2 == len(bucket)
+    assert shapes is not geo.shapes
+    assert [{"type": "triangle"}, {"type": "trapezoid"}] == list(
+        geo.search_all(lng=0.5, lat=0.3)
+    )
+
+
+def test_backend(collection, backend, rand_lng, rand_lat):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+
+    assert backend == geo.backend
+    _test_sample_geojson(geo, rand_lng, rand_lat)
+
+
+def test_lazy(collection, backend, rand_lng, rand_lat):
+    geo = GeoPIP(geojson_dict=collection, backend=backend, lazy=True)
+
+    shapes = [shp for shps in geo.shapes.values() for shp in shps]
+    assert all(shp["shape"] is None for shp in shapes)
+
+    # only candidates with matching bbox get prepared
+    assert {"type": "star"} == geo.search(lng=0.0, lat=0.0)
+    assert ["star"] == [
+        shp["properties"]["type"] for shp in shapes if shp["shape"] is not None
+    ]
+
+    _test_sample_geojson(geo, rand_lng, rand_lat)
+
+    geo = GeoPIP(backend=backend, lazy=True)
+    _test_geo_locations(geo.search, geo.search_all)
+
+
+def test_invalid_backend(collection):
+    with pytest.raises(ValueError):
+        GeoPIP(geojson_dict=collection, backend="unknown")
+
+
 def test_invalid(collection):
     with pytest.raises(ValueError):
         GeoPIP(filename="xyz.json", geojson_dict=collection)
@@ -178,6 +353,27 @@ def test_env_init(testdir, rand_lng, rand_lat, monkeypatch):
     _test_sample_geojson(geo, rand_lng, rand_lat)
 
 
+def test_binary_init(testdir, tmp_path, rand_lng, rand_lat, monkeypatch):
+    out = str(tmp_path / "sample.geo.bin")
+    main(["pack", testdir + "/sample.geo.json", out])
+
+    for backend in ["pure", "shapely"] if SHAPELY_AVAILABLE else ["pure"]:
+        geo = GeoPIP(filename=out, backend=backend)
+        shapes = [shp for shps in geo.shapes.values() for shp in shps]
+        assert all(shp["shape"] is None for shp in shapes)  # lazy by default
+        _test_sample_geojson(geo, rand_lng, rand_lat)
+
+        geo = GeoPIP(filename=out, backend=backend, lazy=False)
+        shapes = [shp for shps in geo.shapes.values() for shp in shps]
+        assert all(shp["shape"] is not None for shp in shapes)
+        _test_sample_geojson(geo, rand_lng, rand_lat)
+
+    monkeypatch.setenv("REVERSE_GEOCODE_DATA", out)
+    geo = GeoPIP()
+    assert "<env = " + out + " >" in str(geo)
+    _test_sample_geojson(geo, rand_lng, rand_lat)
+
+
 def test_dict_init(collection, rand_lng, rand_lat):
     geo = GeoPIP(geojson_dict=collection)
 
@@ -195,15 +391,19 @@ def _test_sample_geojson(geo, rand_lng, rand_lat):
     assert "trapezoid" == geo.shapes[""][1]["properties"]["type"]
 
     assert 2 == len(geo.shapes["800"])
-    assert "rect" == geo.shapes["800"][0]["properties"]["type"]
-    assert "triangle" == geo.shapes["800"][1]["properties"]["type"]
+    assert "triangle" == geo.shapes["800"][0]["properties"]["type"]  # area 0.5
+    assert "rect" == geo.shapes["800"][1]["properties"]["type"]  # area 1
 
-    assert {"type": "rect"} == geo.search(
+    assert {"type": "triangle"} == geo.search(
         lng=0.5, lat=0.3
-    )  # first in '800' (most precise)
-    assert [{"type": "rect"}, {"type": "triangle"}, {"type": "trapezoid"}] == list(
+    )  # first in '800' (most precise), smallest area
+    assert [{"type": "triangle"}, {"type": "rect"}, {"type": "trapezoid"}] == list(
         geo.search_all(lng=0.5, lat=0.3)
     )
+    assert [{"type": "triangle"}, {"type": "rect"}] == list(
+        geo.search_all(lng=0.5, lat=0.3, limit=2)
+    )
+    assert [] == list(geo.search_all(lng=0.5, lat=0.3, limit=0))
 
     assert {"type": "star"} == geo.search(lng=0.0, lat=0.0)
 
@@ -224,3 +424,737 @@ def _test_sample_geojson(geo, rand_lng, rand_lat):
         lng, lat = rand_lng(), rand_lat()
         if not (-2 <= lng <= 2 and -2 <= lat <= 2):
             assert geo.search(lng, lat) is None
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_search_bbox(collection, backend, lazy):
+    geo = GeoPIP(geojson_dict=collection, backend=backend, lazy=lazy)
+
+    def types(found):
+        return sorted(props["type"] for props in found)
+
+    assert ["rect", "star", "trapezoid", "triangle"] == types(
+        geo.search_bbox(-1, -1, 1, 1)
+    )
+    assert ["rect", "trapezoid", "triangle"] == types(
+        geo.search_bbox(0.4, 0.4, 0.6, 0.6)
+    )
+    # within rect, outside of triangle and trapezoid
+    assert ["rect"] == types(geo.search_bbox(0.15, 0.8, 0.2, 0.9))
+    # in bbox of the star, but outside of it
+    assert [] == types(geo.search_bbox(0.06, 0.06, 0.07, 0.07))
+    # only the lower tip of the trapezoid
+    assert ["trapezoid"] == types(geo.search_bbox(0.4, -0.9, 0.6, -0.5))
+    assert [] == types(geo.search_bbox(10, 10, 20, 20))
+
+    with pytest.raises(ValueError):
+        list(geo.search_bbox(1, 0, 0, 1))
+    with pytest.raises(ValueError):
+        list(geo.search_bbox(0, -91, 1, 1))
+
+
+def test_search_geometry(collection, backend):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+
+    def types(geometry):
+        return sorted(props["type"] for props in geo.search_geometry(geometry))
+
+    assert ["rect", "trapezoid", "triangle"] == types(
+        {"type": "Point", "coordinates": [0.5, 0.3]}
+    )
+    # crosses the star and the trapezoid
+    assert ["star", "trapezoid"] == types(
+        {"type": "LineString", "coordinates": [[-0.5, 0.0], [0.3, -0.1]]}
+    )
+    assert ["rect"] == types(
+        {"type": "MultiPoint", "coordinates": [[0.15, 0.85], [5, 5]]}
+    )
+    # overlapping bounding boxes, but no intersection with the star
+    assert [] == types(
+        {
+            "type": "Polygon",
+            "coordinates": [[[-0.2, -0.2], [0.09, -0.2], [-0.2, 0.09], [-0.2, -0.2]]],
+        }
+    )
+    # polygon containing the star completely
+    star = collection["features"][0]["geometry"]["coordinates"][0]
+    assert ["star"] == types(
+        {
+            "type": "Polygon",
+            "coordinates": [[[1.01 * lng, 1.01 * lat] for lng, lat in star]],
+        }
+    )
+    with pytest.raises(ValueError):
+        list(geo.search_geometry({"type": "GeometryCollection", "geometries": []}))
+
+    geo = GeoPIP(backend=backend)
+    # germany, france and switzerland meet close to basel
+    found = {props["NAME"] for props in geo.search_bbox(7.5, 47.5, 7.7, 47.7)}
+    assert {"Germany", "France", "Switzerland"} == found
+
+
+def test_search_track(collection, backend, rand_lng, rand_lat):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+
+    # from the star over the trapezoid outside and into the triangle
+    track = [(0.0, 0.0), (0.01, 0.0), (0.3, 0.0), (0.3, -0.1), (2, 2), (0.5, 0.3)]
+    assert [geo.search(lng, lat) for lng, lat in track] == geo.search_track(track)
+    assert [
+        (0, 2, {"type": "star"}),
+        (2, 4, {"type": "trapezoid"}),
+        (4, 5, None),
+        (5, 6, {"type": "triangle"}),
+    ] == geo.search_track(iter(track), runs=True)
+
+    # the previous feature is kept, while it contains the points
+    assert [{"type": "rect"}, {"type": "rect"}] == geo.search_track(
+        [(0.15, 0.9), (0.5, 0.3)]
+    )
+    assert [{"type": "trapezoid"}, {"type": "trapezoid"}] == geo.search_track(
+        [(0.3, 0.0), (0.5, 0.3)]
+    )
+
+    assert [] == geo.search_track([])
+    assert [] == geo.search_track([], runs=True)
+    with pytest.raises(ValueError):
+        geo.search_track([(0, 0), (181, 0)])
+
+    # non-overlapping countries: same results as `search`
+    geo = GeoPIP(backend=backend)
+    lng, lat = 10.0, 50.0
+    track = []
+    for _i in range(500):
+        lng = min(max(lng + rand_lng() / 500, -180), 180)
+        lat = min(max(lat + rand_lat() / 500, -90), 90)
+        track.append((lng, lat))
+    assert [geo.search(lng, lat) for lng, lat in track] == geo.search_track(track)
+    runs = geo.search_track(track, runs=True)
+    assert 0 == runs[0][0]
+    assert len(track) == runs[-1][1]
+    assert all(runs[i][1] == runs[i + 1][0] for i in range(len(runs) - 1))
+
+
+def test_rasterize(collection, backend, rand_lng, rand_lat):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    exact = GeoPIP(geojson_dict=collection, backend=backend)
+
+    counts = geo.rasterize(0.05)
+    assert counts["covered"] > 0
+    assert counts["ambiguous"] > 0
+    assert 7200 * 3600 == sum(counts.values())
+    assert {"type": "rect"} == geo._raster[1].lookup(0.17, 0.92)
+
+    # raster or exact search: same results
+    _test_sample_geojson(geo, rand_lng, rand_lat)
+    for _i in range(1000):
+        lng, lat = rand_lng() / 90, rand_lat() / 45
+        assert exact.search(lng, lat) == geo.search(lng, lat)
+        assert list(exact.search_all(lng, lat)) == list(geo.search_all(lng, lat))
+
+    # updates discard the raster
+    geo.remove_features([FeatureRow(1)])  # rect
+    assert {"type": "triangle"} == geo.search(lng=0.5, lat=0.8)
+    assert geo.search(lng=0.2, lat=0.9) is None
+
+    with pytest.raises(ValueError):
+        geo.rasterize(0)
+
+
+@pytest.mark.parametrize("clip", [False, True])
+def test_build_trie(collection, backend, clip, rand_lng, rand_lat):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    exact = GeoPIP(geojson_dict=collection, backend=backend)
+
+    counts = geo.build_trie(max_depth=8, clip=clip)
+    assert counts["leaves"] > counts["mixed"] > 0
+    assert counts["nodes"] > counts["leaves"]
+
+    # trie or exact search: same results
+    _test_sample_geojson(geo, rand_lng, rand_lat)
+    for _i in range(1000):
+        lng, lat = rand_lng() / 90, rand_lat() / 45
+        assert exact.search(lng, lat) == geo.search(lng, lat)
+        assert list(exact.search_all(lng, lat)) == list(geo.search_all(lng, lat))
+
+    # together with the raster
+    geo.rasterize(0.1)
+    _test_sample_geojson(geo, rand_lng, rand_lat)
+
+    # updates discard the trie
+    geo.remove_features([FeatureRow(1)])  # rect
+    assert {"type": "triangle"} == geo.search(lng=0.5, lat=0.8)
+    assert geo.search(lng=0.2, lat=0.9) is None
+
+    geo = GeoPIP(backend=backend, lazy=True)
+    geo.build_trie(max_depth=3, clip=clip)
+    _test_geo_locations(geo.search, geo.search_all)
+
+
+@pytest.mark.parametrize("accelerate", [None, "raster", "trie"])
+def test_search_batch(collection, backend, accelerate, rand_lng, rand_lat):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    if accelerate == "raster":
+        geo.rasterize(0.05)
+    elif accelerate == "trie":
+        geo.build_trie(6)
+
+    lngs = [0.5, 0.0, 0.5, 2.0] + [rand_lng() / 90 for _i in range(200)]
+    lats = [0.3, 0.0, -0.5, 2.0] + [rand_lat() / 45 for _i in range(200)]
+
+    indices = geo.search_batch(lngs, lats)
+    assert [2, 0, 3, -1] == list(indices[:4])  # triangle, star, trapezoid, miss
+    for idx, lng, lat in zip(indices, lngs, lats):  # noqa: B905 (py3.9)
+        expected = geo.search(lng, lat)
+        assert expected == (None if idx < 0 else geo.properties.row(idx))
+    assert list(indices) == list(geo.search_batch(lngs, lats, ordered=False))
+
+    offsets, found = geo.search_all_batch(lngs, lats)
+    assert len(lngs) + 1 == len(offsets)
+    assert [2, 1, 3] == list(found[offsets[0] : offsets[1]])
+    assert [] == list(found[offsets[3] : offsets[4]])
+    for i, (lng, lat) in enumerate(zip(lngs, lats)):  # noqa: B905 (py3.9)
+        expected = list(geo.search_all(lng, lat))
+        rows = found[offsets[i] : offsets[i + 1]]
+        assert expected == [geo.properties.row(idx) for idx in rows]
+
+    assert {"type": ["triangle", "star", "trapezoid", "-"]} == geo.columns(
+        indices[:4], ["type"], default="-"
+    )
+    assert {"type": ["star"], "other": [None]} == geo.columns([0], ["type", "other"])
+
+    with pytest.raises(ValueError):
+        geo.search_batch([0, 1], [0])
+    with pytest.raises(ValueError):
+        geo.search_all_batch([0, 181], [0, 0])
+
+
+def test_search_batch_numpy(collection, monkeypatch):
+    np = pytest.importorskip("numpy")
+    geo = GeoPIP(geojson_dict=collection)
+
+    indices = geo.search_batch(np.array([0.5, 0.0, 2.0]), np.array([0.3, 0.0, 2.0]))
+    assert isinstance(indices, np.ndarray)
+    assert np.int64 == indices.dtype
+    assert [2, 0, -1] == indices.tolist()
+
+    offsets, found = geo.search_all_batch([0.5, 2.0], [0.3, 2.0])
+    assert [0, 3, 3] == offsets.tolist()
+    assert [2, 1, 3] == found.tolist()
+
+    columns = geo.columns(indices, ["type"], default="", numpy=True)
+    assert ["triangle", "star", ""] == columns["type"].tolist()
+
+    # without numpy
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    indices = geo.search_batch([0.5, 0.0, 2.0], [0.3, 0.0, 2.0])
+    assert isinstance(indices, array)
+    assert [2, 0, -1] == list(indices)
+    indices = geo.search_batch([0.5, 0.0, 2.0], [0.3, 0.0, 2.0], ordered=False)
+    assert [2, 0, -1] == list(indices)
+
+
+@pytest.mark.parametrize("trie", [False, True])
+def test_search_batch_many_features(backend, trie):
+    np = pytest.importorskip("numpy")
+    features = []
+    for idx in range(2500):  # 50 x 50 small squares
+        x, y = idx % 50 * 0.1, idx // 50 * 0.1
+        ring = [[x, y], [x + 0.08, y], [x + 0.08, y + 0.08], [x, y + 0.08], [x, y]]
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {"idx": idx},
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+            }
+        )
+    geo = GeoPIP(
+        geojson_dict={"type": "FeatureCollection", "features": features},
+        backend=backend,
+    )
+    if trie:
+        geo.build_trie(6)
+
+    rnd = np.random.default_rng(42)
+    # dense clusters (vectorized per rectangle) and scattered points
+    lngs = np.concatenate([rnd.uniform(1.0, 1.2, 500), rnd.uniform(-0.5, 5.5, 500)])
+    lats = np.concatenate([rnd.uniform(2.0, 2.2, 500), rnd.uniform(-0.5, 5.5, 500)])
+    expected = [geo.search(lng, lat) for lng, lat in zip(lngs, lats)]  # noqa: B905 (py3.9)
+    expected = [-1 if props is None else props["idx"] for props in expected]
+    assert expected == geo.search_batch(lngs, lats).tolist()
+    assert expected[:3] == geo.search_batch(lngs[:3], lats[:3]).tolist()
+    assert any(idx >= 0 for idx in expected[:500])
+
+
+def test_shared_memory(collection, backend):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    geo.remove_features([FeatureRow(1)])  # rect
+    geo.add_features([dict(collection["features"][1], id="rect")])
+    name = geo.to_shared_memory()
+    assert name == geo.to_shared_memory()
+
+    other = GeoPIP.attach(name, backend=backend)
+    assert backend == other.backend
+    assert geo.feature_ids == other.feature_ids
+    assert 5 == len(other.properties)  # rows of removed features are kept
+    assert [{"type": "triangle"}, {"type": "rect"}, {"type": "trapezoid"}] == list(
+        other.search_all(lng=0.5, lat=0.3)
+    )
+    assert [2, 0, -1] == list(other.search_batch([0.5, 0.0, 2.0], [0.3, 0.0, 2.0]))
+    assert {"type": "rect"} == other.search(lng=0.9, lat=0.9)
+
+    # pickles transfer the name of the block
+    data = pickle.dumps(geo)
+    assert name.encode("utf-8") in data
+    assert len(data) < 200
+    assert geo.feature_ids == pickle.loads(data).feature_ids
+    assert geo.feature_ids == pickle.loads(pickle.dumps(other)).feature_ids
+
+    # modifications require a new export
+    geo.remove_features(["rect"])
+    assert name.encode("utf-8") not in pickle.dumps(geo)
+    assert name != geo.to_shared_memory()
+    assert [{"type": "triangle"}, {"type": "trapezoid"}] == list(
+        pickle.loads(pickle.dumps(geo)).search_all(lng=0.5, lat=0.3)
+    )
+
+
+def test_shared_memory_subprocess(collection, backend):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    name = geo.to_shared_memory()
+
+    # the block outlives the attaching process
+    code = (
+        "from geopip._geopip import GeoPIP\n"
+        "geo = GeoPIP.attach({!r}, backend={!r})\n"
+        "assert geo.search(lng=0.9, lat=0.9) == {{'type': 'rect'}}\n"
+    ).format(name, backend)
+    subprocess.run([sys.executable, "-c", code], check=True)
+    other = GeoPIP.attach(name, backend=backend)
+    assert {"type": "rect"} == other.search(lng=0.9, lat=0.9)
+
+
+_SPAWN_SCRIPT = """
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from geopip._geopip import GeoPIP
+
+
+def search(geo):
+    return dict(geo.search(lng=0.9, lat=0.9))
+
+
+if __name__ == "__main__":
+    geo = GeoPIP(geojson_dict=json.loads(sys.argv[1]), backend=sys.argv[2])
+    geo.to_shared_memory()
+    with ProcessPoolExecutor(2, mp_context=get_context("spawn")) as pool:
+        found = list(pool.map(search, [geo] * 4))
+    assert [{"type": "rect"}] * 4 == found, found
+    del geo  # unlinks the block
+"""
+
+
+def test_shared_memory_spawn(collection, backend, tmp_path):
+    # spawned workers share the resource tracker of their parent
+    script = tmp_path / "spawn.py"
+    script.write_text(_SPAWN_SCRIPT)
+    root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    result = subprocess.run(
+        [sys.executable, str(script), json.dumps(collection), backend],
+        capture_output=True,
+        env=dict(os.environ, PYTHONPATH=root),
+        check=True,
+        text=True,
+    )
+    assert "" == result.stderr
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_pickle(collection, backend, lazy, rand_lng, rand_lat):
+    geo = GeoPIP(
+        geojson_dict=collection, backend=backend, lazy=lazy, properties=["type"]
+    )
+    geo.remove_features([FeatureRow(1)])  # rect
+    geo.rasterize(0.1)
+
+    other = pickle.loads(pickle.dumps(geo))
+    assert backend == other.backend
+    assert [FeatureRow(row) for row in (0, 2, 3)] == other.feature_ids
+    assert 4 == len(other.properties)
+    assert all(shp["shape"] is None for shps in other.shapes.values() for shp in shps)
+    for _i in range(100):
+        lng, lat = rand_lng() / 90, rand_lat() / 45
+        assert list(geo.search_all(lng, lat)) == list(other.search_all(lng, lat))
+
+    other.add_features([dict(collection["features"][1], id="rect")])
+    assert lazy == (other._features["rect"][1][0]["shape"] is None)
+    assert {"type": "rect"} == other.search(lng=0.9, lat=0.9)
+
+
+def test_pickle_values(collection, backend, tmp_path):
+    # properties and ids, that JSON cannot represent
+    values = {
+        "date": datetime.date(2020, 1, 31),
+        "decimal": Decimal("1.5"),
+        "set": {1, 2},
+        "tuple": (1, "a"),
+        "keys": {1: "a"},
+    }
+    features = collection["features"]
+    geo = GeoPIP(
+        geojson_dict=dict(
+            collection,
+            features=[dict(features[1], id=("rect", 1), properties=values)],
+        ),
+        backend=backend,
+    )
+
+    other = pickle.loads(pickle.dumps(geo))
+    assert [("rect", 1)] == other.feature_ids
+    assert values == other.search(lng=0.9, lat=0.9)
+    assert values == pickle.loads(pickle.dumps(other)).search(lng=0.9, lat=0.9)
+    with pytest.raises(TypeError):
+        other.save(str(tmp_path / "values.geo.bin"))  # JSON in binary files
+
+
+def test_pickle_binary():
+    geo = GeoPIP(backend="pure", properties=["NAME"])
+    data = pickle.dumps(geo)
+    assert geo._origin[1].buffer.tobytes() in data  # reuses the loaded binary
+
+    other = pickle.loads(data)
+    assert ["NAME"] == other.properties.keys
+    assert {"NAME": "Germany"} == other.search(lng=7, lat=51)
+
+
+def test_layers(collection, testdir, backend, rand_lng, rand_lat):
+    world = testdir + "/../geopip/globe.geo.bin"
+    geo = GeoPIP(
+        layers={"world": world, "sample": collection},
+        backend=backend,
+        properties=["NAME", "type"],
+    )
+    assert ["world", "sample"] == geo.layers
+    ids = [fid for fid in geo.feature_ids if fid[0] == "sample"]
+    assert [
+        ("sample", FeatureRow(row)) for row in range(246, 250)
+    ] == ids  # rows without id
+    assert {"world": None, "sample": {"type": "triangle"}} == geo.search_layers(
+        lng=0.5, lat=0.3
+    )
+    assert {"world": {"NAME": "Germany"}, "sample": None} == geo.search_layers(
+        lng=7, lat=51
+    )
+    assert dict.fromkeys(["world", "sample"]) == geo.search_layers(lng=-30, lat=0)
+
+    sample = GeoPIP(geojson_dict=collection, backend=backend)
+    for _i in range(100):
+        lng, lat = rand_lng() / 90, rand_lat() / 45
+        assert sample.search(lng, lat) == geo.search_layers(lng, lat)["sample"]
+
+    geo.add_features(
+        [
+            {
+                "type": "Feature",
+                "id": "box",
+                "properties": {"type": "box"},
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[[5, 50], [5, 52], [9, 52], [9, 50], [5, 50]]],
+                },
+            }
+        ],
+        layer="sample",
+    )
+    assert {"type": "box"} == geo.search_layers(lng=7, lat=51)["sample"]
+    geo.replace_feature(ids[1], collection["features"][2])  # triangle
+    assert {"type": "triangle"} == geo.search_layers(lng=0.5, lat=0.9)["sample"]
+    geo.rasterize(1)
+    assert {"world": {"NAME": "Germany"}, "sample": {"type": "box"}} == (
+        geo.search_layers(lng=7, lat=51)
+    )
+
+    other = pickle.loads(pickle.dumps(geo))
+    assert geo.layers == other.layers
+    assert geo.feature_ids == other.feature_ids
+    assert geo.search_layers(lng=7, lat=51) == other.search_layers(lng=7, lat=51)
+    other.add_features(collection["features"][:1], layer="world")
+    assert ("world", FeatureRow(len(geo.properties))) in other.feature_ids
+
+    with pytest.raises(ValueError):
+        geo.add_features(collection["features"][:1])  # no layer
+    with pytest.raises(ValueError):
+        geo.add_features(collection["features"][:1], layer="unknown")
+    with pytest.raises(ValueError):
+        sample.add_features(collection["features"][:1], layer="sample")
+    with pytest.raises(ValueError):
+        sample.search_layers(lng=0, lat=0)
+    with pytest.raises(ValueError):
+        GeoPIP(geojson_dict=collection, layers={"sample": collection})
+
+
+def _zones(customers, zones):
+    """Overlapping square zones of every customer around (0, 0)."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": "{}-{}".format(customer, zone),
+                "properties": {"customer_id": customer, "zone": zone},
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [
+                            [-zone - 1, -zone - 1],
+                            [-zone - 1, zone + 1],
+                            [zone + 1, zone + 1],
+                            [zone + 1, -zone - 1],
+                            [-zone - 1, -zone - 1],
+                        ]
+                    ],
+                },
+            }
+            for customer in range(customers)
+            for zone in range(zones)
+        ],
+    }
+
+
+def test_partition_by(backend, monkeypatch):
+    geo = GeoPIP(
+        geojson_dict=_zones(50, 3), backend=backend, partition_by="customer_id"
+    )
+    tests = []
+    p_in_polygon = geo._backend.p_in_polygon
+
+    def counting(p, shp):
+        tests.append(shp)
+        return p_in_polygon(p, shp)
+
+    monkeypatch.setattr(geo._backend, "p_in_polygon", counting)
+
+    assert {"customer_id": 42, "zone": 0} == geo.search(0, 0, where={"customer_id": 42})
+    assert all(shp["properties"]["customer_id"] == 42 for shp in tests)
+    assert 1 == len(tests)
+    assert [1, 2] == [
+        p["zone"] for p in geo.search_all(1.5, 1.5, where={"customer_id": 7})
+    ]
+    assert {"customer_id": 7, "zone": 2} == geo.search(
+        0, 0, where={"customer_id": 7, "zone": 2}
+    )
+    assert geo.search(0, 0, where={"customer_id": 50}) is None
+    assert geo.search(5, 5, where={"customer_id": 1}) is None
+
+    # filters without partition
+    assert {"customer_id": 3, "zone": 1} == geo.search(
+        1.5, 0, where={"zone": 1, "customer_id": 3}
+    )
+    assert [7] * 2 == [
+        p["customer_id"] for p in geo.search_all(1.5, 0, where={"customer_id": 7})
+    ]
+    assert 50 == len(list(geo.search_all(0, 0, where={"zone": 2})))
+
+    # modifications update the partitions
+    geo.remove_features(["42-0"])
+    assert {"customer_id": 42, "zone": 1} == geo.search(0, 0, where={"customer_id": 42})
+    geo.remove_features(["42-1", "42-2"])
+    assert geo.search(0, 0, where={"customer_id": 42}) is None
+    assert 42 not in geo._partitions
+    geo.add_features(_zones(43, 1)["features"][42:])
+    assert {"customer_id": 42, "zone": 0} == geo.search(0, 0, where={"customer_id": 42})
+
+    other = pickle.loads(pickle.dumps(geo))
+    assert {"customer_id": 42, "zone": 0} == other.search(
+        0, 0, where={"customer_id": 42}
+    )
+    assert geo._partitions.keys() == other._partitions.keys()
+
+    with pytest.raises(ValueError):
+        GeoPIP(
+            geojson_dict=_zones(1, 1), partition_by="customer_id", properties=["zone"]
+        )
+
+
+def test_memory_usage(collection, testdir, tmp_path, backend, capsys):
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    usage = geo.memory_usage()
+    assert [
+        "coordinates",
+        "geometries",
+        "bounds",
+        "index",
+        "properties",
+        "store",
+        "raster",
+        "trie",
+        "total",
+    ] == list(usage)
+    assert sum(usage.values()) == 2 * usage["total"]
+    assert all(usage[part] > 0 for part in ["coordinates", "bounds", "index"])
+    assert 0 == usage["store"] == usage["raster"] == usage["trie"]
+
+    geo.rasterize(0.1)
+    geo.build_trie(4)
+    usage = geo.memory_usage()
+    assert usage["raster"] > 0
+    assert usage["trie"] > 0
+
+    out = str(tmp_path / "sample.geo.bin")
+    main(["pack", testdir + "/sample.geo.json", out])
+    lazy = GeoPIP(filename=out, backend=backend).memory_usage()
+    assert 0 == lazy["coordinates"]  # in the file
+    assert lazy["store"] > 0
+    eager = GeoPIP(filename=out, backend=backend, lazy=False).memory_usage()
+    assert eager["coordinates"] > 0
+    assert eager["total"] > lazy["total"]
+
+    assert 0 == main(["memory", out, "--backend", backend, "--eager", "--json"])
+    assert eager == json.loads(capsys.readouterr().out)
+    assert 0 == main(["memory", out, "--backend", backend])
+    assert "coordinates" in capsys.readouterr().out
+
+
+def test_tune(collection, testdir, tmp_path, capsys):
+    geo = GeoPIP(geojson_dict=collection, backend="pure")
+    lngs = [-180 + 360 * i / 97 for i in range(97)]
+    lats = [-60 + 140 * (i * 37 % 97) / 97 for i in range(97)]
+    points = list(zip(lngs, lats))  # noqa: B905 (py3.9)
+    candidates = [{}, {"raster": 1.0}, {"trie": {"max_depth": 2, "clip": False}}]
+
+    config, results = geo.tune(
+        lngs, lats, backends=["pure"], candidates=candidates, repeat=1
+    )
+    assert 3 == len(results)
+    assert config == results[0]["config"]
+    assert ["backend", "raster", "trie"] == sorted(config)
+    speeds = [result["points_per_second"] for result in results]
+    assert speeds == sorted(speeds, reverse=True)
+
+    smallest = min(result["memory"] for result in results)
+    config, _results = geo.tune(
+        lngs,
+        lats,
+        memory_budget=smallest,
+        backends=["pure"],
+        candidates=candidates,
+        repeat=1,
+    )
+    assert smallest == next(r["memory"] for r in results if r["config"] == config)
+    with pytest.raises(ValueError):
+        geo.tune(lngs, lats, memory_budget=1, backends=["pure"], candidates=candidates)
+    with pytest.raises(ValueError):
+        geo.tune(lngs, lats[:-1])
+
+    config = {"backend": "pure", "raster": 1.0, "trie": {"max_depth": 2, "clip": True}}
+    out = str(tmp_path / "tuned.geo.bin")
+    geo.save(out, config=config)
+    tuned = GeoPIP(filename=out)
+    assert "pure" == tuned.backend
+    assert tuned.memory_usage()["raster"] > 0
+    assert tuned.memory_usage()["trie"] > 0
+    assert [geo.search(*p) for p in points] == [tuned.search(*p) for p in points]
+
+    tuned.configure({"backend": "pure"})
+    assert 0 == tuned.memory_usage()["raster"] == tuned.memory_usage()["trie"]
+    with pytest.raises(ValueError):
+        tuned.configure({"backend": "other"})
+
+    sample = tmp_path / "sample.csv"
+    sample.write_text("lng,lat\n" + "".join("{},{}\n".format(*p) for p in points))
+    out = str(tmp_path / "cli.geo.bin")
+    args = ["tune", testdir + "/sample.geo.json", out, "--sample", str(sample)]
+    assert 0 == main([*args, "--backend", "pure", "--memory-budget", "1G", "--json"])
+    config = json.loads(capsys.readouterr().out)["config"]
+    assert "pure" == config["backend"]
+    assert GeoPIP(filename=out).search(lngs[0], lats[0]) == geo.search(lngs[0], lats[0])
+
+
+def _rect_feature(fid, minlng, minlat, maxlng, maxlat):
+    ring = [
+        [minlng, minlat],
+        [maxlng, minlat],
+        [maxlng, maxlat],
+        [minlng, maxlat],
+        [minlng, minlat],
+    ]
+    return {
+        "type": "Feature",
+        "id": fid,
+        "properties": {"name": fid},
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+    }
+
+
+def test_count_hits(collection, tmp_path, backend):
+    rects = {
+        "type": "FeatureCollection",
+        "features": [
+            _rect_feature("a", -10, -10, 1, 1),  # large
+            _rect_feature("b", 5, -1, 6, 1),  # small, apart from a
+            _rect_feature("c", -1, -1, 0.5, 0.5),  # small, within a
+        ],
+    }
+    geo = GeoPIP(geojson_dict=rects, backend=backend)
+
+    def order(geo):
+        return [shp["properties"]["name"] for shp in geo.shapes[""]]
+
+    assert ["b", "c", "a"] == order(geo)  # by area
+
+    geo.count_hits()
+    for _i in range(5):
+        assert {"name": "a"} == dict(geo.search(-5, -5))
+    assert {"a": 5} == geo.hit_counts()
+    assert ["b", "c", "a"] == order(geo)  # searches never reorder
+    geo.reorder()
+    # a is hit most, but must stay behind c
+    assert ["c", "a", "b"] == order(geo)
+    assert {"name": "c"} == dict(geo.search(0, 0))
+    assert {"name": "b"} == dict(geo.search(5.5, 0))
+    assert ["c", "a"] == [p["name"] for p in geo.search_all(0, 0)]
+
+    out = str(tmp_path / "hits.geo.bin")
+    geo.save(out, hits=geo.hit_counts())
+    loaded = GeoPIP(filename=out, backend=backend)
+    assert ["c", "a", "b"] == order(loaded)
+    assert {"a": 5, "b": 1, "c": 1} == loaded.hit_counts()
+
+    geo.reorder({"b": 3})
+    assert ["b", "c", "a"] == order(geo)
+    with pytest.raises(KeyError):
+        geo.reorder({"x": 1})
+    geo.count_hits(False)
+    geo.search(-5, -5)
+    assert {"b": 3} == geo.hit_counts()
+
+    # hits never change the results
+    geo = GeoPIP(geojson_dict=collection, backend=backend)
+    points = [
+        (-180 + 360 * i / 211, -60 + 140 * (i * 89 % 211) / 211) for i in range(211)
+    ]
+    expected = [geo.search(*p) for p in points]
+    geo.reorder({fid: i * 5 % 7 for i, fid in enumerate(geo.feature_ids)})
+    assert expected == [geo.search(*p) for p in points]
+
+
+def test_intersecting_pairs():
+    boxes = [
+        (0, 0, 2, 2),
+        (-1, -1, 0, 0),  # touches 0
+        (3, 0, 4, 1),
+        (1, 3, 5, 4),  # apart in latitude
+        (1.5, 0.5, 3, 0.6),  # touches 2
+    ]
+    expected = {
+        (j, i)
+        for i in range(len(boxes))
+        for j in range(i)
+        if bbox_intersects(boxes[j], boxes[i])
+    }
+    assert {(0, 1), (0, 4), (2, 4)} == expected
+    pairs = list(_intersecting_pairs(boxes))
+    assert len(expected) == len(pairs)
+    assert expected == set(pairs)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+from geohash_hilbert import decode_exactly, encode
+
+from geopip import _hilbert
+
+
+def _geohash(lng, lat):
+    return encode(lng=lng, lat=lat, precision=16, bits_per_char=4)
+
+
+def test_encode(rand_lng, rand_lat):
+    points = [(rand_lng(), rand_lat()) for _i in range(200)]
+    points += [(-180, -90), (180, 90), (0, 0), (180, -90), (-0.0, 1e-300)]
+    for lng, lat in points:
+        assert int(_geohash(lng, lat), 16) == _hilbert.encode(lng, lat)
+
+
+def test_encode_numpy(rand_lng, rand_lat):
+    pytest.importorskip("numpy")
+    points = [(rand_lng(), rand_lat()) for _i in range(200)] + [(180, 90)]
+    lngs = [lng for lng, _lat in points]
+    lats = [lat for _lng, lat in points]
+
+    codes = _hilbert.encode_numpy(lngs, lats)
+    assert "uint64" == codes.dtype.name
+    assert [_hilbert.encode(lng, lat) for lng, lat in points] == codes.tolist()
+
+
+def test_keys():
+    assert 1 == _hilbert.from_geohash("")
+    assert "" == _hilbert.geohash(1)
+    assert 0 == _hilbert.level(1)
+
+    key = _hilbert.from_geohash("0800")
+    assert 0x10800 == key
+    assert 4 == _hilbert.level(key)
+    assert "0800" == _hilbert.geohash(key)
+    assert key == _hilbert.key(0x0800 << 48 | 0xABC, 4)
+
+    code = int("f" * 16, 16)
+    assert "f" * 16 == _hilbert.geohash(_hilbert.key(code, 16))
+
+
+def test_bbox_key(rand_lng, rand_lat):
+    boxes = []
+    for _i in range(100):
+        lng1, lat1 = rand_lng(), rand_lat()
+        lng2, lat2 = rand_lng(), rand_lat()
+        scale = 10 ** (-8 * abs(lat1) / 90)  # also small boxes
+        boxes.append(
+            (
+                scale * min(lng1, lng2),
+                scale * min(lat1, lat2),
+                scale * max(lng1, lng2),
+                scale * max(lat1, lat2),
+            )
+        )
+    boxes += [(0, 0, 0, 0), (-200, -100, 200, 100)]
+
+    assert [_hilbert.bbox_key(box) for box in boxes] == _hilbert.bbox_keys(boxes)
+    for box in boxes:
+        minlng, minlat = max(-180, box[0]), max(-90, box[1])
+        maxlng, maxlat = min(180, box[2]), min(90, box[3])
+        code = _hilbert.geohash(_hilbert.bbox_key((minlng, minlat, maxlng, maxlat)))
+
+        # longest common prefix of the corners
+        ll, ur = _geohash(minlng, minlat), _geohash(maxlng, maxlat)
+        assert ll.startswith(code)
+        assert ur.startswith(code)
+        assert len(code) == 16 or ll[len(code)] != ur[len(code)]
+
+        lng, lat, lng_err, lat_err = decode_exactly(code, bits_per_char=4)
+        assert lat - lat_err <= minlat
+        assert lng - lng_err <= minlng
+        assert lat + lat_err >= maxlat
+        assert lng + lng_err >= maxlng
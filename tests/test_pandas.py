@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import pytest
+
+import geopip
+from geopip._geopip import GeoPIP
+
+pd = pytest.importorskip("pandas")
+
+
+def _values(column):
+    return [None if pd.isna(value) else value for value in column]
+
+
+@pytest.fixture()
+def geo(testdir):
+    with open(testdir + "/sample.geo.json", "r", encoding="utf-8") as f:
+        return GeoPIP(geojson_dict=json.load(f))
+
+
+@pytest.fixture()
+def df():
+    return pd.DataFrame(
+        {
+            "lon": [0.5, 0.0, 2.0, 0.5],
+            "lat": [0.3, 0.0, 2.0, -0.5],
+            "value": [1, 2, 3, 4],
+        },
+        index=[10, 11, 12, 13],
+    )
+
+
+def test_enrich(geo, df):
+    result = geopip.enrich(df, lng="lon", lat="lat", geo=geo)
+    assert ["lon", "lat", "value", "type"] == list(result.columns)
+    assert [10, 11, 12, 13] == list(result.index)
+    assert ["triangle", "star", None, "trapezoid"] == _values(result["type"])
+    assert "type" not in df.columns  # copy
+
+    result = geopip.enrich(
+        df, lng="lon", lat="lat", geo=geo, fields=["type"], prefix="geo_", default=""
+    )
+    assert ["triangle", "star", "", "trapezoid"] == result["geo_type"].tolist()
+
+    # chunks
+    chunked = geopip.enrich(df, lng="lon", lat="lat", geo=geo, chunksize=3)
+    assert _values(result["geo_type"]) == _values(chunked["type"].fillna(""))
+
+
+def test_enrich_processes(geo, df):
+    result = geopip.enrich(df, lng="lon", lat="lat", geo=geo, processes=2, chunksize=1)
+    assert ["triangle", "star", None, "trapezoid"] == _values(result["type"])
+
+
+def test_enrich_default_instance():
+    df = pd.DataFrame({"lng": [4.910248, 0.0], "lat": [50.850981, 0.0]})
+    result = geopip.enrich(df, fields=["ISO2"])
+    assert ["BE", None] == _values(result["ISO2"])
+
+    assert 0 == len(geopip.enrich(df.iloc[:0], fields=["ISO2"]))
+
+    with pytest.raises(ValueError):
+        geopip.enrich(df, chunksize=0)
+    with pytest.raises(KeyError):
+        geopip.enrich(df, lng="lon")
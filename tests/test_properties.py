@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pickle
+
+import pytest
+
+from geopip._properties import PropertyTable, PropertyView
+
+
+def test_table_rows():
+    table = PropertyTable()
+
+    assert 0 == table.append({"a": 1, "b": "x"})
+    assert 1 == table.append({"b": "y", "c": [1, 2]})
+    assert 2 == table.append(None)
+
+    assert 3 == len(table)
+    assert ["a", "b", "c"] == table.keys
+
+    assert {"a": 1, "b": "x"} == table.row(0)
+    assert {"b": "y", "c": [1, 2]} == table.row(1)
+    assert {} == table.row(2)
+
+    with pytest.raises(IndexError):
+        table.row(3)
+
+
+def test_table_projection():
+    table = PropertyTable(["a", "c"])
+    table.append({"a": 1, "b": "x"})
+    table.append({"b": "y", "c": 3})
+
+    assert ["a", "c"] == table.keys
+    assert {"a": 1} == table.row(0)
+    assert {"c": 3} == table.row(1)
+
+
+def test_table_columns():
+    table = PropertyTable()
+    table.append({"a": 1})
+    table.append({"b": 2})
+
+    assert [1, None] == table.column("a")
+    assert [None, 2] == table.column("b")
+    assert [-1, -1] == table.column("z", default=-1)
+
+
+def test_table_interning():
+    table = PropertyTable()
+    table.append({"name": "".join(["Ger", "many"])})
+    table.append({"name": "".join(["Germ", "any"])})
+
+    assert table.row(0)["name"] is table.row(1)["name"]
+
+
+def test_view():
+    table = PropertyTable()
+    table.append({"a": 1, "b": None})
+    table.append({"b": 2})
+
+    view = table.row(0)
+    assert isinstance(view, PropertyView)
+    assert 2 == len(view)
+    assert ["a", "b"] == list(view)
+    assert view["b"] is None
+    assert "a" in view
+    assert "c" not in view
+    assert view.get("c") is None
+    assert {"a": 1, "b": None} == dict(view)
+    assert "{'a': 1, 'b': None}" == repr(view)
+
+    with pytest.raises(KeyError):
+        table.row(1)["a"]
+
+    with pytest.raises(TypeError):
+        view["a"] = 2
+
+
+def test_stage():
+    table = PropertyTable()
+    table.append({"a": 1})
+    view = table.row(0)
+
+    staged = table.stage(0, {"b": 2})
+    assert {"b": 2} == staged
+    assert {"a": 1} == table.row(0)  # unchanged until committed
+    table.commit(staged)
+    assert {"b": 2} == table.row(0)
+    assert {"a": 1} == view  # views keep their properties
+
+    with pytest.raises(IndexError):
+        table.stage(1, {})
+
+
+def test_pickle():
+    table = PropertyTable()
+    table.append({"a": 1})
+    table.append({"b": 2})
+
+    view = pickle.loads(pickle.dumps(table.row(1)))
+    assert {"b": 2} == view
+    assert {"a": 1} == view._table.row(0)
+
+
+def test_nbytes():
+    table = PropertyTable()
+    empty = table.nbytes
+    table.append({"name": "a" * 1000})
+    one = table.nbytes
+    assert one > empty + 1000
+    table.append({"name": "a" * 1000})  # interned, counted once
+    assert one <= table.nbytes < one + 1000
+
+
+def test_sparse():
+    # large vocabulary, few keys per row (e.g. OpenStreetMap tags)
+    table = PropertyTable()
+    for row in range(2000):
+        table.append({"tag{}".format((row * 8 + i) % 3000): i for i in range(8)})
+    assert 3000 == len(table.keys)
+    assert {"tag{}".format(8 + i): i for i in range(8)} == table.row(1)
+    assert [None, 0] == table.column("tag8")[:2]
+    # rows only pay for their own keys, not for all 3000 columns
+    assert table.nbytes < 2000 * 8 * 100
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import math
 from random import random
 
 from geopip._geo_fkt import in_bbox
+from geopip._geo_fkt import p_in_polygon as pure_p_in_polygon
 from geopip._pure import p_in_polygon, prepare
 
 ################################################################################
@@ -35,10 +37,14 @@ def test_prepare_polygon(rect):
     p_rect = prepare(rect_feature)
 
     assert 1 == len(p_rect)
-    assert {"shape", "properties", "bounds"} == set(p_rect[0].keys())
+    assert {"shape", "properties", "bounds", "area", "convex", "holes"} == set(
+        p_rect[0].keys()
+    )
     assert rect_poly == p_rect[0]["shape"]
     assert (0, 0, 1, 1) == p_rect[0]["bounds"]
+    assert 1 == p_rect[0]["area"]
     assert {"a": 1} == p_rect[0]["properties"]
+    assert p_rect[0]["convex"] is None  # too small for the convex test
 
 
 def test_prepare_single_multypolygon(rect):
@@ -49,9 +55,12 @@ def test_prepare_single_multypolygon(rect):
     p_rect = prepare(rect_feature)
 
     assert 1 == len(p_rect)
-    assert {"shape", "properties", "bounds"} == set(p_rect[0].keys())
+    assert {"shape", "properties", "bounds", "area", "convex", "holes"} == set(
+        p_rect[0].keys()
+    )
     assert rect_poly == p_rect[0]["shape"]
     assert (0, 0, 1, 1) == p_rect[0]["bounds"]
+    assert 1 == p_rect[0]["area"]
     assert {"a": 1} == p_rect[0]["properties"]
 
 
@@ -67,21 +76,30 @@ def test_prepare_many_multypolygon(rect, triangle, trapezoid):
     assert 3 == len(prepared)
 
     # triangle
-    assert {"shape", "properties", "bounds"} == set(prepared[0].keys())
+    assert {"shape", "properties", "bounds", "area", "convex", "holes"} == set(
+        prepared[0].keys()
+    )
     assert triangle_poly == prepared[0]["shape"]
     assert (0, 0, 1, 1) == prepared[0]["bounds"]
+    assert 0.5 == prepared[0]["area"]
     assert {"a": 1} == prepared[0]["properties"]
 
     # rect
-    assert {"shape", "properties", "bounds"} == set(prepared[1].keys())
+    assert {"shape", "properties", "bounds", "area", "convex", "holes"} == set(
+        prepared[1].keys()
+    )
     assert rect_poly == prepared[1]["shape"]
     assert (0, 0, 1, 1) == prepared[1]["bounds"]
+    assert 1 == prepared[1]["area"]
     assert {"a": 1} == prepared[1]["properties"]
 
     # trapezoid
-    assert {"shape", "properties", "bounds"} == set(prepared[2].keys())
+    assert {"shape", "properties", "bounds", "area", "convex", "holes"} == set(
+        prepared[2].keys()
+    )
     assert trapezoid_poly == prepared[2]["shape"]
     assert (0, -1, 1, 1) == prepared[2]["bounds"]
+    assert 1 == prepared[2]["area"]
     assert {"a": 1} == prepared[2]["properties"]
 
 
@@ -166,3 +184,75 @@ def test_p_in_polygon_star(star, rand_lat, rand_lng):
         if not in_bbox(p, box):
             assert not p_in_polygon(p, p_star)
             assert not p_in_polygon(p, p_star_cw)
+
+
+def test_prepare_lazy(rect, triangle):
+    mpoly = {"type": "MultiPolygon", "coordinates": [[triangle], [rect]]}
+    feature = {"geometry": mpoly, "properties": {"a": 1}, "type": "Feature"}
+
+    prepared = prepare(feature, lazy=True)
+
+    assert 2 == len(prepared)
+    for shp in prepared:
+        assert {"shape", "geometry", "properties", "bounds", "area"} == set(shp.keys())
+        assert shp["shape"] is None
+    assert (0, 0, 1, 1) == prepared[0]["bounds"]
+    assert 0.5 == prepared[0]["area"]
+
+    assert p_in_polygon((0.5, 0.3), prepared[0])
+    assert {"shape", "properties", "bounds", "area", "convex", "holes"} == set(
+        prepared[0].keys()
+    )
+    assert {"type": "Polygon", "coordinates": [triangle]} == prepared[0]["shape"]
+    assert not p_in_polygon((0.9, 0.9), prepared[0])
+    assert prepared[1]["shape"] is None
+
+
+def test_p_in_polygon_convex(rand_lat, rand_lng):
+    ring = [(math.cos(i * math.pi / 32), math.sin(i * math.pi / 32)) for i in range(64)]
+    circle = {"type": "Polygon", "coordinates": [[*ring, ring[0]]]}
+    feature = {"geometry": circle, "properties": {}, "type": "Feature"}
+
+    p_circle = prepare(feature)[0]
+    assert 64 == len(p_circle["convex"])
+    lazy = prepare(feature, lazy=True)[0]
+    assert p_in_polygon((0, 0), lazy)
+    assert 64 == len(lazy["convex"])
+
+    p_circle_w_hole = prepare(
+        dict(feature, geometry=dict(circle, coordinates=[*circle["coordinates"], ring]))
+    )[0]
+    assert p_circle_w_hole["convex"] is None
+
+    for p in [*ring, (0, 0), (1, 0.001), (0.999, 0)]:
+        assert pure_p_in_polygon(p, circle["coordinates"]) == p_in_polygon(p, p_circle)
+    for _i in range(1000):
+        p = (rand_lng() / 150, rand_lat() / 75)
+        assert pure_p_in_polygon(p, circle["coordinates"]) == p_in_polygon(p, p_circle)
+
+
+def test_p_in_polygon_many_holes(rect, rand_lat, rand_lng):
+    outer = [(-1, -1), (-1, 6), (6, 6), (6, -1), (-1, -1)]
+    holes = [
+        [(x + lng * 0.8, y + lat * 0.8) for lng, lat in rect]
+        for x in range(5)
+        for y in range(5)
+    ]
+    polygon = {"type": "Polygon", "coordinates": [outer, *holes]}
+    feature = {"geometry": polygon, "properties": {}, "type": "Feature"}
+
+    shp = prepare(feature)[0]
+    lazy = prepare(feature, lazy=True)[0]
+    assert shp["holes"] is not None
+    for p in [(0.5, 0.5), (0.9, 0.9), (4.1, 4.1), (-0.5, 5.5), (6.5, 0)]:
+        expected = pure_p_in_polygon(p, polygon["coordinates"])
+        assert expected == p_in_polygon(p, shp) == p_in_polygon(p, lazy)
+    for _i in range(1000):
+        p = (rand_lng() / 25, rand_lat() / 12)
+        assert pure_p_in_polygon(p, polygon["coordinates"]) == p_in_polygon(p, shp)
+    assert lazy["holes"] is not None
+
+    few = prepare(
+        dict(feature, geometry=dict(polygon, coordinates=[outer, *holes[:5]]))
+    )
+    assert few[0]["holes"] is None
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+
+from geopip._raster import AMBIGUOUS, AMBIGUOUS_CELL, EMPTY, Raster
+
+
+def test_raster_rect(rect):
+    raster = Raster(0.25, 1)
+    assert (1440, 720) == (raster.cols, raster.rows)
+    assert "H" == raster.cells.typecode
+    assert 2 * 1440 * 720 == raster.nbytes
+
+    raster.add(0, {"type": "rect"}, [[rect]])
+    # the cells of the rect: 4 interior, 12 border + neighbours touching the border
+    assert {"type": "rect"} == raster.lookup(0.3, 0.3)
+    assert {"type": "rect"} == raster.lookup(0.6, 0.7)
+    assert AMBIGUOUS_CELL is raster.lookup(0.1, 0.1)
+    assert AMBIGUOUS_CELL is raster.lookup(0.9, 0.5)
+    assert AMBIGUOUS_CELL is raster.lookup(-0.1, 0.5)  # touches the left border
+    assert raster.lookup(-0.3, 0.5) is None
+    assert raster.lookup(10, 10) is None
+
+    counts = raster.counts()
+    assert 4 == counts["covered"]
+    assert len(raster.cells) == sum(counts.values())
+
+
+def test_raster_hole_and_overlap():
+    outer = [(0, 0), (0, 4), (4, 4), (4, 0), (0, 0)]
+    hole = [(1, 1), (3, 1), (3, 3), (1, 3), (1, 1)]
+    raster = Raster(0.25, 2)
+    raster.add(0, {"type": "frame"}, [[outer, hole]])
+
+    assert {"type": "frame"} == raster.lookup(0.4, 0.4)
+    assert {"type": "frame"} == raster.lookup(3.3, 2.1)
+    assert raster.lookup(2, 2) is None  # in the hole
+    assert AMBIGUOUS_CELL is raster.lookup(1.2, 1.2)  # hole border
+
+    # second feature overlapping the frame: its border and the overlap
+    # are ambiguous
+    square = [(3, 3), (8, 3), (8, 8), (3, 8), (3, 3)]
+    raster.add(1, {"type": "square"}, [[square]])
+    assert {"type": "square"} == raster.lookup(6, 6)
+    assert {"type": "frame"} == raster.lookup(0.4, 0.4)
+    assert AMBIGUOUS_CELL is raster.lookup(3.7, 3.7)
+
+    assert {EMPTY, AMBIGUOUS, 2, 3} == set(raster.cells)
+
+
+def test_raster_typecode():
+    assert "H" == Raster(10, 0xFFFF - 2).cells.typecode
+    assert "I" == Raster(10, 0xFFFF - 1).cells.typecode
+
+
+def test_raster_invalid():
+    with pytest.raises(ValueError):
+        Raster(0, 1)
+    with pytest.raises(ValueError):
+        Raster(-1, 1)
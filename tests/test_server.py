@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import asyncio
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from geopip._geopip import FeatureRow, GeoPIP
+from geopip.server import Histogram, Server
+
+
+@pytest.fixture()
+def server(collection):
+    service = Server(GeoPIP(geojson_dict=collection), max_batch=8, max_delay=0.01)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    listening = asyncio.run_coroutine_threadsafe(
+        service.start("127.0.0.1", 0), loop
+    ).result()
+    service.port = listening.sockets[0].getsockname()[1]
+    yield service
+
+    async def shutdown():
+        listening.close()
+        connections = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _request(conn, method, url, body=None, headers=None):
+    conn.request(method, url, body=body, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, response.getheader("Content-Type"), response.read()
+
+
+def test_search(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    # all requests over one persistent connection
+    assert (200, "application/json", b'{"type":"triangle"}') == _request(
+        conn, "GET", "/search?lng=0.5&lat=0.3"
+    )
+    assert b"null" == _request(conn, "GET", "/search?lng=2&lat=2")[2]
+
+    status, _type, body = _request(conn, "GET", "/search?lng=200&lat=0")
+    assert 400 == status
+    assert "Longitude" in json.loads(body)["error"]
+    assert 400 == _request(conn, "GET", "/search?lng=a&lat=0")[0]
+    assert 400 == _request(conn, "GET", "/search?lng=0")[0]
+    assert 405 == _request(conn, "POST", "/search?lng=0&lat=0", body=b"")[0]
+    assert 404 == _request(conn, "GET", "/unknown")[0]
+    conn.close()
+
+
+def test_search_micro_batches(server):
+    points = [(0.5, 0.3), (0.0, 0.0), (0.5, -0.5), (2.0, 2.0)] * 8
+
+    def search(point):
+        conn = http.client.HTTPConnection("127.0.0.1", server.port)
+        body = _request(conn, "GET", "/search?lng={}&lat={}".format(*point))[2]
+        conn.close()
+        return json.loads(body)
+
+    with ThreadPoolExecutor(16) as pool:
+        found = list(pool.map(search, points))
+    assert [
+        {"type": "triangle"},
+        {"type": "star"},
+        {"type": "trapezoid"},
+        None,
+    ] * 8 == (found)
+    assert 32 == server.batch_size.sum  # points
+    assert 32 > sum(server.batch_size.counts)  # batches
+
+
+def test_batch(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    expected = [{"type": "triangle"}, {"type": "star"}, None]
+
+    body = json.dumps({"lng": [0.5, 0.0, 2.0], "lat": [0.3, 0.0, 2.0]})
+    status, content_type, answer = _request(conn, "POST", "/batch", body=body)
+    assert (200, "application/json") == (status, content_type)
+    assert expected == json.loads(answer)
+
+    body = json.dumps([[0.5, 0.3], [0.0, 0.0], [2.0, 2.0]])
+    assert expected == json.loads(_request(conn, "POST", "/batch", body=body)[2])
+
+    body = '{"lng": 0.5, "lat": 0.3}\n[0.0, 0.0]\n\n{"lng": 2, "lat": 2}\n'
+    status, content_type, answer = _request(
+        conn,
+        "POST",
+        "/batch",
+        body=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert (200, "application/x-ndjson") == (status, content_type)
+    assert expected == [json.loads(line) for line in answer.splitlines()]
+
+    assert b"[]" == _request(conn, "POST", "/batch", body=b"[]")[2]
+    assert 400 == _request(conn, "POST", "/batch", body=b"[[0, 100]]")[0]
+    assert 400 == _request(conn, "POST", "/batch", body=b'{"lng": [0]}')[0]
+    assert 400 == _request(conn, "POST", "/batch", body=b"[1, 2]")[0]
+    assert 400 == _request(conn, "POST", "/batch", body=b"{")[0]
+    assert 405 == _request(conn, "GET", "/batch")[0]
+    conn.close()
+
+
+def test_fields(collection):
+    server = Server(GeoPIP(geojson_dict=collection), fields=["other"])
+    assert b"{}" == server._encode(0)
+    assert b"null" == server._encode(-1)
+
+
+def test_metrics(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    _request(conn, "GET", "/search?lng=0.5&lat=0.3")
+    _request(conn, "POST", "/batch", body=b"[[0, 0], [1, 1]]")
+    _request(conn, "GET", "/search?lng=500&lat=0")
+
+    status, content_type, body = _request(conn, "GET", "/metrics")
+    assert 200 == status
+    assert content_type.startswith("text/plain")
+    lines = body.decode("utf-8").splitlines()
+    assert 'geopip_request_duration_seconds_count{endpoint="/search"} 2' in lines
+    assert 'geopip_request_duration_seconds_count{endpoint="/batch"} 1' in lines
+    assert 'geopip_batch_size_bucket{le="2"} 2' in lines
+    assert 'geopip_responses_total{endpoint="/search",status="400"} 1' in lines
+    conn.close()
+
+
+def test_connection_close(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    conn.request("GET", "/search?lng=0&lat=0", headers={"Connection": "close"})
+    response = conn.getresponse()
+    assert "close" == response.getheader("Connection")
+    assert b'{"type":"star"}' == response.read()
+    conn.close()
+
+
+def test_internal_error(server, monkeypatch):
+    def fail(_found):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server, "_encode", fail)
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    status, content_type, body = _request(conn, "GET", "/search?lng=0&lat=0")
+    assert (500, "application/json") == (status, content_type)
+    assert {"error": "Internal server error."} == json.loads(body)
+    # the connection stays usable
+    assert 200 == _request(conn, "GET", "/metrics")[0]
+    assert (("/search", 500), 1) in server.responses.items()
+    conn.close()
+
+
+def test_invalid_content_length(server):
+    with socket.create_connection(("127.0.0.1", server.port)) as sock:
+        sock.sendall(b"POST /batch HTTP/1.1\r\nContent-Length: -1\r\n\r\n")
+        response = sock.makefile("rb").read()
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert response.endswith(b'{"error": "Invalid Content-Length."}')
+
+
+def test_updates(server, collection):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    body = b"[[0.9, 0.9], [0.0, 0.0]]"
+    assert (
+        b'[{"type":"rect"},{"type":"star"}]'
+        == _request(conn, "POST", "/batch", body=body)[2]
+    )
+
+    rect = dict(collection["features"][1], properties={"type": "new"})
+    server.geo.replace_feature(FeatureRow(1), rect)  # keeps the row
+    assert b'{"type":"new"}' == _request(conn, "GET", "/search?lng=0.9&lat=0.9")[2]
+
+    server.geo.remove_features([FeatureRow(0)])
+    server.geo.compact()  # renumbers the rows
+    assert b'[{"type":"new"},null]' == _request(conn, "POST", "/batch", body=body)[2]
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    ("request_head", "status"),
+    [
+        (b"GET /search?lng=" + b"0" * 10000 + b" HTTP/1.1\r\n\r\n", b"414"),
+        (b"GET /metrics HTTP/1.1\r\nX-Long: " + b"a" * 10000 + b"\r\n\r\n", b"431"),
+    ],
+    ids=["request line", "header"],
+)
+def test_long_lines(server, request_head, status):
+    with socket.create_connection(("127.0.0.1", server.port)) as sock:
+        sock.sendall(request_head)
+        response = sock.makefile("rb").read()
+    assert response.startswith(b"HTTP/1.1 " + status + b" ")
+
+
+def test_histogram():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert [
+        'h_bucket{le="1"} 2',
+        'h_bucket{le="10"} 3',
+        'h_bucket{le="+Inf"} 4',
+        "h_sum 56.5",
+        "h_count 4",
+    ] == histogram.lines("h")
+    assert 'h_bucket{a="b",le="1"} 2' == histogram.lines("h", 'a="b"')[0]
@@ -8,7 +8,7 @@ import pytest
 from geopip._geo_fkt import in_bbox
 
 try:
-    from shapely.geometry import shape
+    from shapely.geometry import Point, shape
     from shapely.prepared import PreparedGeometry
 
     from geopip._shapely import p_in_polygon, prepare
@@ -48,10 +48,11 @@ def test_prepare_polygon(rect):
     p_rect = prepare(rect_feature)
 
     assert 1 == len(p_rect)
-    assert {"shape", "properties", "bounds"} == set(p_rect[0].keys())
+    assert {"shape", "parts", "properties", "bounds", "area"} == set(p_rect[0].keys())
     assert isinstance(p_rect[0]["shape"], PreparedGeometry)
     assert p_rect[0]["shape"].covers(shape(rect_poly))
     assert (0, 0, 1, 1) == p_rect[0]["bounds"]
+    assert 1 == p_rect[0]["area"]
     assert {"a": 1} == p_rect[0]["properties"]
 
 
@@ -64,10 +65,11 @@ def test_prepare_single_multypolygon(rect):
     p_rect = prepare(rect_feature)
 
     assert 1 == len(p_rect)
-    assert {"shape", "properties", "bounds"} == set(p_rect[0].keys())
+    assert {"shape", "parts", "properties", "bounds", "area"} == set(p_rect[0].keys())
     assert isinstance(p_rect[0]["shape"], PreparedGeometry)
     assert p_rect[0]["shape"].covers(shape(rect_poly))
     assert (0, 0, 1, 1) == p_rect[0]["bounds"]
+    assert 1 == p_rect[0]["area"]
     assert {"a": 1} == p_rect[0]["properties"]
 
 
@@ -80,10 +82,11 @@ def test_prepare_many_multypolygon(rect, triangle, trapezoid):
 
     assert 1 == len(prepared)
 
-    assert {"shape", "properties", "bounds"} == set(prepared[0].keys())
+    assert {"shape", "parts", "properties", "bounds", "area"} == set(prepared[0].keys())
     assert isinstance(prepared[0]["shape"], PreparedGeometry)
     # assert prepared[0]['shape'].covers(shape(mpoly))
     assert (0, -1, 1, 1) == prepared[0]["bounds"]
+    assert 2.5 == prepared[0]["area"]
     assert {"a": 1} == prepared[0]["properties"]
 
 
@@ -171,3 +174,52 @@ def test_p_in_polygon_star(star, rand_lat, rand_lng):
         if not in_bbox(p, box):
             assert not p_in_polygon(p, p_star)
             assert not p_in_polygon(p, p_star_cw)
+
+
+@pytest.mark.skipif(not SHAPELY_ENABLED, reason="No shapely available.")
+def test_prepare_lazy(rect, triangle):
+    mpoly = {"type": "MultiPolygon", "coordinates": [[triangle], [rect]]}
+    feature = {"geometry": mpoly, "properties": {"a": 1}, "type": "Feature"}
+
+    prepared = prepare(feature, lazy=True)
+
+    assert 1 == len(prepared)
+    shp = prepared[0]
+    assert {"shape", "geometry", "properties", "bounds", "area"} == set(shp.keys())
+    assert shp["shape"] is None
+    assert (0, 0, 1, 1) == shp["bounds"]
+    assert 1.5 == shp["area"]
+
+    assert p_in_polygon((0.9, 0.9), shp)
+    assert {"shape", "parts", "properties", "bounds", "area"} == set(shp.keys())
+    assert isinstance(shp["shape"], PreparedGeometry)
+    assert not p_in_polygon((1.5, 0.9), shp)
+
+
+@pytest.mark.skipif(not SHAPELY_ENABLED, reason="No shapely available.")
+def test_p_in_polygon_many_parts(rect, rand_lat, rand_lng, monkeypatch):
+    from geopip import _shapely  # noqa: PLC0415
+
+    monkeypatch.setattr(_shapely, "_INDEXED_PARTS", 10)
+    monkeypatch.setattr(_shapely, "_INDEXED_COORDINATES", 100)
+    squares = [
+        [[(x + lng * 0.8, y + lat * 0.8) for lng, lat in rect]]
+        for x in range(5)
+        for y in range(5)
+    ]
+    mpoly = {"type": "MultiPolygon", "coordinates": squares}
+    feature = {"geometry": mpoly, "properties": {}, "type": "Feature"}
+
+    shp = prepare(feature)[0]
+    lazy = prepare(feature, lazy=True)[0]
+    assert 25 == len(shp["parts"][1])
+    full = shape(mpoly)
+    for _i in range(1000):
+        p = (rand_lng() / 30, rand_lat() / 15)
+        expected = full.contains(Point(*p))
+        assert expected == p_in_polygon(p, shp)
+        assert expected == p_in_polygon(p, lazy)
+    assert 25 == len(lazy["parts"][1])
+
+    few = prepare(dict(feature, geometry=dict(mpoly, coordinates=squares[:9])))[0]
+    assert few["parts"] is None
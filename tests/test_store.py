@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import importlib.resources
+import json
+import os
+import struct
+import subprocess
+import sys
+
+import pytest
+
+from geopip.__main__ import main
+from geopip._hilbert import bbox_key
+from geopip._store import MAGIC, Store, dumps, is_store
+
+
+def _normalized(geojson):
+    return json.loads(json.dumps(geojson))
+
+
+def test_roundtrip(collection, rect, triangle):
+    features = collection["features"] + [
+        {
+            "type": "Feature",
+            "id": "mp",
+            "properties": {"a": [1, 2]},
+            "geometry": {"type": "MultiPolygon", "coordinates": [[rect], [triangle]]},
+        },
+        {
+            "type": "Feature",
+            "properties": None,
+            "geometry": {"type": "LineString", "coordinates": rect},
+        },
+    ]
+
+    data = dumps(features)
+    assert is_store(data)
+    assert 0 == len(data) % 8
+
+    store = Store(data)
+    assert 6 == len(store)
+    assert [None, None, None, None, "mp", None] == store.meta["ids"]
+
+    for idx, feat in enumerate(features[:5]):
+        assert _normalized(dict(feat, id=feat.get("id"))) == _normalized(
+            store.feature(idx)
+        )
+    assert store.feature(5)["geometry"] is None
+    assert range(6, 6) == store.feature_parts(5)
+
+    assert range(4, 6) == store.feature_parts(4)
+    assert (0, 0, 1, 1) == store.feature_bounds(4)
+    assert 1.5 == store.feature_area(4)
+    assert 0.5 == store.part_area(5)
+    assert _normalized({"type": "Polygon", "coordinates": [rect]}) == _normalized(
+        store.part_geometry(4)
+    )
+    assert bbox_key((0, 0, 1, 1)) == store.feature_key(4)
+    assert bbox_key((0, 0, 1, 1)) == store.part_key(5)
+    assert "removed" not in store.meta
+    assert [1] == Store(dumps(features, removed=[1])).meta["removed"]
+    assert "config" not in store.meta
+    config = {"backend": "pure", "raster": 0.5, "trie": None}
+    assert config == Store(dumps(features, config=config)).meta["config"]
+    assert "hits" not in store.meta
+    assert [0, 3, 1] == Store(dumps(features, hits=[0, 3, 1])).meta["hits"]
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        Store(b"GEOJ" + b"\0" * 12)
+
+    data = bytearray(dumps([]))
+    struct.pack_into("<I", data, len(MAGIC), 99)
+    with pytest.raises(ValueError):
+        Store(data)
+
+    assert not is_store(b'{"type": "FeatureCollection"}')
+
+
+def test_package_data_up_to_date():
+    files = importlib.resources.files("geopip")
+    data = json.loads(files.joinpath("globe.geo.json").read_bytes())
+
+    assert dumps(data["features"]) == files.joinpath("globe.geo.bin").read_bytes()
+
+
+def test_cli_pack(testdir, tmp_path):
+    out = str(tmp_path / "sample.geo.bin")
+    assert 0 == main(["pack", testdir + "/sample.geo.json", out])
+
+    with open(out, "rb") as f:
+        store = Store(f.read())
+    assert 4 == len(store)
+    assert {"type": "star"} == store.meta["properties"][0]
+
+    assert 0 == main(["pack", testdir + "/sample.geo.json", out, "--properties", "x"])
+    with open(out, "rb") as f:
+        assert [{}] * 4 == Store(f.read()).meta["properties"]
+
+
+def test_import_is_lazy():
+    code = (
+        "import sys, geopip; "
+        "assert 'shapely' not in sys.modules; "
+        "assert 'geopip._geopip' not in sys.modules; "
+        "assert geopip.GeoPIP.__name__ == 'GeoPIP'"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    subprocess.check_call([sys.executable, "-c", code], env=env)
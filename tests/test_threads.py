@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import geopip
+from geopip._geopip import FeatureRow, GeoPIP
+
+
+def test_instance_single_build(monkeypatch):
+    built = []
+
+    class SlowGeoPIP(object):
+        def __init__(self):
+            time.sleep(0.05)  # widen the race window
+            built.append(self)
+
+    monkeypatch.setattr(geopip._geopip, "GeoPIP", SlowGeoPIP)
+    monkeypatch.setattr(geopip, "_INSTANCE", None)
+
+    barrier = threading.Barrier(8)
+
+    def get():
+        barrier.wait()
+        return geopip.instance()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(lambda _i: get(), range(8)))
+
+    assert 1 == len(built)
+    assert all(inst is built[0] for inst in instances)
+
+
+def test_concurrent_readers(testdir):
+    with open(testdir + "/sample.geo.json", "r", encoding="utf-8") as f:
+        collection = json.load(f)
+    rect = collection["features"][1] = dict(collection["features"][1], id="rect")
+    geo = GeoPIP(geojson_dict=collection)
+
+    expected = {
+        (0.5, 0.3): [
+            [{"type": "triangle"}, {"type": "rect"}, {"type": "trapezoid"}],
+            [{"type": "triangle"}, {"type": "trapezoid"}],
+        ],
+        (0.0, 0.0): [[{"type": "star"}]],
+        (5.0, 5.0): [[]],
+    }
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            geo.remove_features(["rect"])
+            geo.replace_feature(FeatureRow(2), collection["features"][2])
+            geo.add_features([rect])
+
+    def reader(_i):
+        for _j in range(300):
+            for (lng, lat), results in expected.items():
+                assert list(geo.search_all(lng, lat)) in results
+        return True
+
+    w = threading.Thread(target=writer)
+    w.start()
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assert all(pool.map(reader, range(4)))
+    finally:
+        stop.set()
+        w.join()
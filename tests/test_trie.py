@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from random import random
+
+import pytest
+from geohash_hilbert import encode
+
+from geopip import _pure
+from geopip._hilbert import bbox_key
+from geopip._trie import Trie, _clip
+
+
+def _index(*rings):
+    shapes = {}
+    for i, ring in enumerate(rings):
+        feature = {"geometry": {"type": "Polygon", "coordinates": [ring]}}
+        for shp in _pure.prepare(dict(feature, properties={"idx": i})):
+            shapes.setdefault(bbox_key(shp["bounds"]), []).append(shp)
+    for shps in shapes.values():
+        shps.sort(key=lambda shp: shp["area"])
+    return shapes
+
+
+def _trie(shapes, max_depth, clip=False):
+    return Trie(shapes, _pure, max_depth, clip=clip)
+
+
+def test_clip():
+    rect = (0, 0, 1, 1)
+    assert _clip((0.2, 0.2, 0.3, 0.3), rect)  # inside
+    assert _clip((-1, 0.5, 2, 0.5), rect)  # crossing
+    assert _clip((-1, 1, 0, 1), rect)  # touching a corner
+    assert not _clip((-1, 2, 2, 2), rect)
+    assert not _clip((-1, 0.5, 0.6, 2), rect)  # passing the corner
+    assert not _clip((2, 0, 2, 1), rect)  # vertical outside
+
+
+def test_trie_depth_zero(rect):
+    trie = _trie(_index(rect), 0)
+    assert isinstance(trie.root, tuple)
+    assert {
+        "nodes": 1,
+        "leaves": 1,
+        "mixed": 1,
+        "candidates": 1,
+        "edges": 4,
+    } == trie.counts
+    assert [{"idx": 0}] == [shp["properties"] for shp in trie.find(0.5, 0.5)]
+    assert [] == list(trie.find(2, 2))
+
+
+def test_trie(rect, trapezoid):
+    big = [(-50, -50), (50, -50), (50, 50), (-50, 50), (-50, -50)]
+    trie = _trie(_index(big, rect, trapezoid), 4)
+
+    # rect and trapezoid in deeper buckets come first
+    assert [1, 2, 0] == [shp["properties"]["idx"] for shp in trie.find(0.5, 0.4)]
+    assert [2, 0] == [shp["properties"]["idx"] for shp in trie.find(0.5, -0.5)]
+    assert [0] == [shp["properties"]["idx"] for shp in trie.find(-20, 30)]
+    assert [] == [shp["properties"]["idx"] for shp in trie.find(100, 30)]
+
+    # within the big square (far from the borders) leaves are fully covered
+    node = trie.root
+    for c in encode(lng=-20, lat=30, precision=4, bits_per_char=4):
+        if isinstance(node, tuple):
+            break
+        node = node[int(c, 16)]
+    assert [({"idx": 0}, True)] == [
+        (shp["properties"], covers) for shp, covers, _fragment in node
+    ]
+    assert trie.counts["leaves"] > trie.counts["mixed"] > 0
+
+    with pytest.raises(ValueError):
+        _trie({}, -1)
+
+
+@pytest.mark.parametrize("clip", [False, True])
+def test_trie_clip(rect, star, clip):
+    hole = [(0.4, 0.4), (0.6, 0.4), (0.6, 0.6), (0.4, 0.6), (0.4, 0.4)]
+    shapes = _index(rect, star)
+    shapes[bbox_key((0, 0, 1, 1))][0]["shape"]["coordinates"].append(hole)
+    trie = _trie(shapes, 6, clip=clip)
+    full = _trie(shapes, 0)
+
+    points = [(0.5, 0.5), (0.3, 0.3), (0.41, 0.59), (0.0, 0.0), (0.05, 0.0)]
+    points += [(1.2 * random() - 0.1, 1.2 * random() - 0.1) for _i in range(500)]
+    for lng, lat in points:
+        assert list(full.find(lng, lat)) == list(trie.find(lng, lat))
+
+    # clipped fragments only contain the edges near the leaves
+    fragments = [fragment for fragment in _leaves(trie.root) if fragment is not None]
+    assert bool(fragments) == clip
+    if clip:
+        assert trie.counts["edges"] < full.counts["edges"] * trie.counts["mixed"]
+
+
+def _leaves(node):
+    if isinstance(node, list):
+        for child in node:
+            yield from _leaves(child)
+    else:
+        for _shp, _covers, fragment in node:
+            yield fragment